@@ -10,6 +10,19 @@ os.environ['TF_CPP_MIN_LOG_LEVEL'] = '2'
 from tensorflow.python.framework import ops
 ops.reset_default_graph()
 
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from rl_common.numpy_policy import NumpyPolicy
+from rl_common.subproc_vec_env import SubprocVecEnv
+from rl_common.returns import discount_cumsum, normalize
+from rl_common.rollout_buffer import RolloutBuffer
+from rl_common.sampling import sample_action
+from rl_common.callables import feed_callable
+from rl_common.vec_env import make_vec_env
+from rl_common.sync_a2c import SyncA2C
+from rl_common.checkpoint import AsyncCheckpointer
+from rl_common.weight_export import export_weights, WEIGHTS_FILE
+from rl_common.trajectory_recorder import TrajectoryWriter
+
 env_name = "CartPole-v1"
 env = gym.make(env_name)
 env.seed(1)     # reproducible, general Policy gradient has high variance
@@ -19,6 +32,34 @@ env.seed(1)     # reproducible, general Policy gradient has high variance
 state_size = env.observation_space.shape[0]
 action_size = env.action_space.n
 
+# act with a NumPy snapshot of the networks instead of a session call per step
+USE_NUMPY_POLICY = False
+
+# after training, write model_path/policy.weights for rl_common.weight_export.load_policy
+EXPORT_WEIGHTS = False
+
+# record the rollout loop to model_path/trajectories (rl_common.trajectory_recorder)
+USE_TRAJECTORY_RECORDER = False
+RECORD_CHUNK_SIZE = 16384
+RECORD_BUFFERS = 2
+
+# seed of the action sampler (the graph op, or the RandomState of the NumPy policy), None for a random one
+ACTION_SEED = None
+
+# step the environment in a child process, observations come back through shared memory
+USE_SUBPROC_ENV = False
+
+# SYNC_NUM_ENVS vectorized environments in lockstep, one update per rollout (rl_common.sync_a2c)
+USE_SYNC_A2C = False
+SYNC_NUM_ENVS = 16
+SYNC_N_STEPS = 5
+
+# checkpoint while training, written by a background thread (rl_common.checkpoint)
+USE_PERIODIC_CHECKPOINTS = False
+CHECKPOINT_EVERY_UPDATES = None
+CHECKPOINT_EVERY_SECONDS = 60.
+CHECKPOINT_KEEP = 3
+
 game_name =  sys.argv[0][:-3]
 
 model_path = "save_model/" + game_name
@@ -36,14 +77,16 @@ def train_model(agent, x, y, adv):
     Args:
         agent(ActorCritic): 학습될 네트워크
         x(np.array): State가 저장되어있는 array
-        y(np.array): Action(one_hot)이 저장되어있는 array
+        y(np.array): Action index가 저장되어있는 array
         adv(np.array) : Discounted reward가 저장되어있는 array
         
     Returns:
         l(float): 네트워크에 의한 loss
     '''
-    l,_ = agent.sess.run([agent.loss, agent.train_op], feed_dict={agent.state: x, agent.action: y, agent.q_target : adv})
-    agent.episode_memory = []
+    l,_ = agent.train_fn({agent.state: x, agent.action: y, agent.q_target: adv})
+    if agent.numpy_policy is not None:
+        agent.numpy_policy.sync()
+    agent.buffer.clear()
     return l
 
 # This is REINFORCE agent for the Cartpole
@@ -70,15 +113,35 @@ class ActorCritic:
         self.hidden1, self.hidden2 = 64, 64
         
         self.ep_trial_step = 500
-        # lists for the states, actions and rewards
-        self.episode_memory = []
+        # preallocated states, actions and rewards
+        self.buffer = RolloutBuffer(self.ep_trial_step, self.state_size)
         
         self.build_model()
 
+        # kernels and biases of the actor (and critic) MLPs in creation order: the weights of the
+        # NumPy policy and of the weight export
+        actor_params = tf.get_collection(tf.GraphKeys.TRAINABLE_VARIABLES, scope='fc[12]_a')
+        critic_params = tf.get_collection(tf.GraphKeys.TRAINABLE_VARIABLES, scope='fc[12]_c')
+        self.mlp_params = (actor_params, critic_params)
+        self.numpy_policy = None
+        if USE_NUMPY_POLICY:
+            self.numpy_policy = NumpyPolicy(self.sess, *self.mlp_params)
+
+        # actions are picked in the graph, the argmax instead of a sample when greedy is set (evaluation)
+        self.greedy = False
+        self.random = np.random.RandomState(ACTION_SEED)     # draws of the NumPy policy
+        self.sampled_action, self.greedy_action = sample_action(self.actor_predict, ACTION_SEED)
+
+        # compiled handles for the hot session calls
+        self.act_fn = self.sess.make_callable(self.sampled_action, [self.state])
+        self.greedy_act_fn = self.sess.make_callable(self.greedy_action, [self.state])
+        self.train_fn = feed_callable(self.sess, [self.loss, self.train_op],
+                                      [self.state, self.action, self.q_target])
+
     def build_model(self):
         # with tf.variable_scope('input'):
         self.state = tf.placeholder(tf.float32, [None, self.state_size], name="states")
-        self.action = tf.placeholder(tf.float32, [None, self.action_size], name="action")
+        self.action = tf.placeholder(tf.int32, [None, ], name="action")
         self.q_target = tf.placeholder(tf.float32, name="q_target")
             
         w_init, b_init = tf.random_normal_initializer(mean=0, stddev=0.3), tf.constant_initializer(0.1)
@@ -86,7 +149,7 @@ class ActorCritic:
         actor_hidden = tf.layers.dense(inputs=self.state, units = self.hidden1, activation=tf.nn.tanh,  # tanh activation
             kernel_initializer = w_init, bias_initializer = b_init, name='fc1_a')
 
-        actor_predict = tf.layers.dense(inputs=actor_hidden, units = self.action_size, activation=None,
+        self.actor_predict = tf.layers.dense(inputs=actor_hidden, units = self.action_size, activation=None,
             kernel_initializer = w_init, bias_initializer = b_init, name='fc2_a')
 
         # Critic network
@@ -96,14 +159,14 @@ class ActorCritic:
         critic_predict = tf.layers.dense(inputs=critic_hidden, units = self.value_size, activation=None,
             kernel_initializer = w_init, bias_initializer = b_init, name='fc2_c')
         
-        self.policy = tf.nn.softmax(actor_predict, name='act_prob')  # use softmax to convert to probability
+        self.policy = tf.nn.softmax(self.actor_predict, name='act_prob')  # use softmax to convert to probability
         self.value = critic_predict
         
         # A_t = R_t - V(S_t)
         self.td_error = self.q_target - self.value
         
         # Policy loss
-        self.log_p = self.action * tf.log(tf.clip_by_value(self.policy,1e-10,1.))
+        self.log_p = tf.one_hot(self.action, self.action_size, dtype=tf.float32) * tf.log(tf.clip_by_value(self.policy,1e-10,1.))
         self.log_lik = self.log_p * tf.stop_gradient(self.td_error)
         self.actor_loss = -tf.reduce_mean(tf.reduce_sum(self.log_lik, axis=1))
         
@@ -123,37 +186,28 @@ class ActorCritic:
     def get_action(self, state):
         # Reshape observation to (num_features, 1)
         state_t = np.reshape(state, [1, self.state_size])
-        # Run forward propagation to get softmax probabilities
-        prob_weights = self.sess.run(self.policy, feed_dict={self.state: state_t})
-
-        # Select action using a biased sample
-        # this will return the index of the action we've sampled
-        action = np.random.choice(np.arange(self.action_size), p=prob_weights[0])
-
-        return action
+        # one action index, sampled (or the argmax when greedy) in the graph
+        if self.numpy_policy is not None:
+            action = self.numpy_policy.sample(state_t, self.random, self.greedy)[0]
+        elif self.greedy:
+            action = self.greedy_act_fn(state_t)
+        else:
+            action = self.act_fn(state_t)
+        return int(action[0])
 
     # calculate discounted rewards
     def discount_and_norm_rewards(self, buffer_reward):
-        discounted_rewards = np.zeros_like(buffer_reward)
-        running_add = 0
-        for index in reversed(range(0, len(buffer_reward))):
-            running_add = running_add * self.discount_factor + buffer_reward[index]
-            discounted_rewards[index] = running_add
-            
+        discounted_rewards = discount_cumsum(np.ravel(buffer_reward), self.discount_factor)
+        discounted_rewards = np.reshape(discounted_rewards, np.shape(buffer_reward))
+
         # normalize episode rewards
-        discounted_rewards -= np.mean(discounted_rewards)
-        discounted_rewards /= np.std(discounted_rewards)
-        return discounted_rewards
+        return normalize(discounted_rewards)
     
     # save <s, a ,r> of each step
     # this is used for calculating discounted rewards
     def append_sample(self, state, action, reward):
-        # Store actions as list of arrays
-        # e.g. for action_size = 2 -> [ array([ 1.,  0.]), array([ 0.,  1.]), array([ 0.,  1.]), array([ 1.,  0.]) ]
-        action_array = np.zeros(self.action_size)
-        action_array[action] = 1
-        self.episode_memory.append([state, action_array, reward])
-        
+        self.buffer.append(state, action, reward)
+
     def save_model(self):
         # Save the variables to disk.
         save_path = self.saver.save(self.sess, model_path + "/model.ckpt")
@@ -164,12 +218,24 @@ class ActorCritic:
         print("\n Model saved in file: %s" % model_path)
 
 def main():
+    global env
+    subproc_env = None
+    if USE_SUBPROC_ENV:     # seeded like the module level env
+        subproc_env = SubprocVecEnv(env_name, 1, seed=1, unwrapped=False)
+        env = subproc_env.get_env(0)
+
     with tf.Session() as sess:
         # sess = tf.Session()
         agent = ActorCritic(sess, state_size, action_size)
 
         init = tf.global_variables_initializer()
         agent.saver = tf.train.Saver()
+        agent.checkpointer = None
+        if USE_PERIODIC_CHECKPOINTS:
+            agent.checkpointer = AsyncCheckpointer(agent.sess, model_path, CHECKPOINT_EVERY_UPDATES,
+                                                   CHECKPOINT_EVERY_SECONDS, CHECKPOINT_KEEP,
+                                                   state_fn=lambda: (agent.episode, agent.step),
+                                                   state_file='epsilon_episode.pickle')
         ckpt = tf.train.get_checkpoint_state(model_path)
 
         if ckpt and tf.train.checkpoint_exists(ckpt.model_checkpoint_path):
@@ -192,60 +258,83 @@ def main():
         # Step 3.2: run the game
         display_time = datetime.datetime.now()
         print("\n\n",game_name, "-game start at :",display_time,"\n")
+        recorder = None
+        if USE_TRAJECTORY_RECORDER:
+            trajectory_writer = TrajectoryWriter(model_path + '/trajectories')
+            recorder = trajectory_writer.recorder('main', state_size, RECORD_CHUNK_SIZE, RECORD_BUFFERS)
         start_time = time.time()
 
-        while time.time() - start_time < agent.training_time and avg_score < 490:
+        if USE_SYNC_A2C:
+            vec_env = make_vec_env(env_name, SYNC_NUM_ENVS, max_episode_steps=agent.ep_trial_step)
+            trainer = SyncA2C(agent, vec_env, SYNC_N_STEPS)
+            episodes, scores = trainer.run(start_time + agent.training_time, lambda avg_score: avg_score < 490)
+        else:
+            while time.time() - start_time < agent.training_time and avg_score < 490:
+
+                state = env.reset()
+                done = False
+                score = 0
+                ep_step = 0
 
-            state = env.reset()
-            done = False
-            score = 0
-            ep_step = 0
+                while not done and ep_step < agent.ep_trial_step:
+                    # fresh env
+                    ep_step += 1
+                    agent.step += 1
 
-            while not done and ep_step < agent.ep_trial_step:
-                # fresh env
-                ep_step += 1
-                agent.step += 1
+                    # Select action_arr
+                    action = agent.get_action(state)
 
-                # Select action_arr
-                action = agent.get_action(state)
+                    # make step in environment
+                    next_state, reward, done, _ = env.step(action) 
 
-                # make step in environment
-                next_state, reward, done, _ = env.step(action) 
+                    # save the sample <state, action, reward> to the memory
+                    agent.append_sample(state, action, reward)
+                    if recorder is not None:
+                        recorder.append(state, action, reward, done, ep_step == agent.ep_trial_step)
 
-                # save the sample <state, action, reward> to the memory
-                agent.append_sample(state, action, reward)
+                    score = ep_step
 
-                score = ep_step
+                    state = next_state
 
-                state = next_state
+                    if done or ep_step == agent.ep_trial_step:
+                        agent.episode += 1
+                        # env.reset()
+                        buffer_reward = agent.buffer.rewards[:, np.newaxis]
 
-                if done or ep_step == agent.ep_trial_step:
-                    agent.episode += 1
-                    # env.reset()
-                    agent.episode_memory = np.array(agent.episode_memory)
-                    buffer_reward = np.vstack(agent.episode_memory[:, 2])
+                        discounted_rewards = agent.discount_and_norm_rewards(buffer_reward)
 
-                    discounted_rewards = agent.discount_and_norm_rewards(buffer_reward)
+                        l = train_model(agent, agent.buffer.states, agent.buffer.actions, discounted_rewards)
 
-                    l = train_model(agent, np.vstack(agent.episode_memory[:,0]), np.vstack(agent.episode_memory[:,1]),
-                                       discounted_rewards)
+                        if agent.checkpointer is not None:   # snapshots when one is due, written in the background
+                            agent.checkpointer.update()
 
-                    # every episode, plot the play time
-                    scores.append(score)
-                    episodes.append(agent.episode)
-                    avg_score = np.mean(scores[-min(30, len(scores)):])
+                        # every episode, plot the play time
+                        scores.append(score)
+                        episodes.append(agent.episode)
+                        avg_score = np.mean(scores[-min(30, len(scores)):])
 
-                    print('episode :{:>6,d}'.format(agent.episode),'/ ep step :{:>5,d}'.format(ep_step), \
-                          '/ time step :{:>8,d}'.format(agent.step),'/ last 30 avg :{:> 4.1f}'.format(avg_score) )
+                        print('episode :{:>6,d}'.format(agent.episode),'/ ep step :{:>5,d}'.format(ep_step), \
+                              '/ time step :{:>8,d}'.format(agent.step),'/ last 30 avg :{:> 4.1f}'.format(avg_score) )
 
-                    break
+                        break
         # Save model
+        if agent.checkpointer is not None:
+            agent.checkpointer.close()
+            print(agent.checkpointer.report())
         agent.save_model()
+        if recorder is not None:
+            trajectory_writer.close()  # the partial chunk and the chunks in flight
+            print(trajectory_writer.report())
+        if EXPORT_WEIGHTS:     # the networks for inference only
+            export_weights(model_path + '/' + WEIGHTS_FILE, agent.sess, *agent.mlp_params,
+                           meta={'source': game_name, 'state_size': state_size, 'action_size': action_size})
 
         pylab.plot(episodes, scores, 'b')
         pylab.savefig("./save_graph/Cartpole_A2C_1.png")
         e = int(time.time() - start_time)
         print(' Elasped time :{:02d}:{:02d}:{:02d}'.format(e // 3600, (e % 3600 // 60), e % 60))
+        if subproc_env is not None:
+            subproc_env.close()
         sys.exit()
 
 if __name__ == "__main__":
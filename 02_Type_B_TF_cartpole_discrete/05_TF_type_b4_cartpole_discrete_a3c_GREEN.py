@@ -11,9 +11,116 @@ ops.reset_default_graph()
 
 import multiprocessing
 import threading
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from rl_common.inference_server import InferenceServer
+from rl_common.numpy_policy import NumpyPolicy
+from rl_common.subproc_vec_env import SubprocVecEnv
+from rl_common.returns import bootstrap_returns
+from rl_common.rollout_buffer import RolloutBuffer
+from rl_common.hogwild import SharedParams, SharedRMSProp, HogwildClient, hogwild_context, run_hogwild
+from rl_common.callables import feed_callable
+from rl_common.sampling import sample_action, action_log_prob, worker_seed
+from rl_common.trainer_queue import TrainerQueue
+from rl_common.vtrace import VTraceLearner
+from rl_common.param_sync import ParamsVersion, VersionedPull, pull_report
+from rl_common.flat_params import FlatParams, dense_size, scope_params, flat_params_initializer
+from rl_common.grad_accumulator import GradientAccumulator
+from rl_common.run_stats import RunStats, SharedRunStats
+from rl_common.cluster import ClusterTask, run_cluster
+from rl_common.worker_pool import WorkerPool, Autoscaler
+from rl_common.shared_template import TemplateWeights, graph_attrs
+from rl_common.checkpoint import AsyncCheckpointer
+from rl_common.resume import Resume, latest_checkpoint, run_state, hogwild_run_state, save_run_state, RUN_STATE_FILE
+from rl_common.weight_export import export_weights, WEIGHTS_FILE
+from rl_common.trajectory_recorder import TrajectoryWriter
+from rl_common.offline_pretrain import TrajectoryDataset, OfflinePretrainer
+
 # N_WORKERS = multiprocessing.cpu_count()
 N_WORKERS = 6
 
+# answer the action requests of all workers with one batched forward pass
+USE_INFERENCE_SERVER = False
+INFERENCE_MAX_BATCH = N_WORKERS
+INFERENCE_MAX_WAIT = 0.001    # seconds
+
+# GA3C style central learner, one update per TRAINER_BATCH_SIZE samples (rl_common.trainer_queue)
+USE_TRAINER_QUEUE = False
+TRAINER_BATCH_SIZE = 64
+TRAINER_QUEUE_SIZE = 2 * N_WORKERS     # segments, the workers block while it is full
+TRAINER_MAX_WAIT = 0.005    # seconds to fill up a batch
+
+# IMPALA style actors / V-trace learner on the TRAINER_ settings, inference server off (rl_common.vtrace)
+USE_VTRACE = False
+ACTOR_PULL_INTERVAL = 1     # segments between two pulls of the master weights
+VTRACE_CLIP_RHO = 1.0
+VTRACE_CLIP_PG_RHO = 1.0
+
+# master versions a local copy may fall behind before it pulls, 0: after every change
+PULL_MAX_STALENESS = 0
+
+# every scope as views of one flat variable (rl_common.flat_params)
+USE_FLAT_PARAMS = False
+
+# apply the mean of ACCUMULATE_STEPS worker gradients at once (rl_common.grad_accumulator)
+USE_GRADIENT_ACCUMULATION = False
+ACCUMULATE_STEPS = N_WORKERS
+ACCUMULATE_WINDOW = None    # seconds, None: only ACCUMULATE_STEPS
+ACCUMULATE_SYNC = False
+
+# act with a NumPy snapshot of the local network instead of a session call per step
+USE_NUMPY_POLICY = False
+
+# after training, write model_path/policy.weights for rl_common.weight_export.load_policy
+EXPORT_WEIGHTS = False
+
+# record the rollout loop to model_path/trajectories (rl_common.trajectory_recorder)
+USE_TRAJECTORY_RECORDER = False
+RECORD_CHUNK_SIZE = 16384
+RECORD_BUFFERS = 2
+
+# warm start a fresh run from recorded trajectories (rl_common.offline_pretrain)
+USE_OFFLINE_PRETRAIN = False
+PRETRAIN_DATA_DIR = None    # None: model_path/trajectories
+PRETRAIN_MIN_EPISODE_RETURN = None
+PRETRAIN_EPOCHS = 50
+PRETRAIN_SECONDS = 120.
+PRETRAIN_BATCH_SIZE = 256
+PRETRAIN_SHUFFLE_CHUNKS = 4
+PRETRAIN_LEARNING_RATE = 0.01
+PRETRAIN_CRITIC = True
+
+# seed of the action sampler, None for a random one; worker i uses ACTION_SEED + i
+ACTION_SEED = None
+
+# run every worker's environment in its own process, observations come back through shared memory
+USE_SUBPROC_ENV = False
+
+# workers as processes applying their gradients lock-free to shared memory (rl_common.hogwild)
+USE_HOGWILD_PROCESSES = False
+
+# distributed A3C, "python <script> worker 1" runs one task (rl_common.cluster)
+USE_CLUSTER = False
+CLUSTER_PS_HOSTS = ['localhost:2222']
+CLUSTER_WORKER_HOSTS = ['localhost:%d' % (2223 + index) for index in range(N_WORKERS)]
+
+# add / retire workers on the aggregate steps/sec (rl_common.worker_pool)
+USE_AUTOSCALE = False
+AUTOSCALE_INTERVAL = 10.    # seconds between two decisions
+AUTOSCALE_MAX_WORKERS = 2 * N_WORKERS
+
+# the local networks after W_0 are views of it (rl_common.shared_template)
+USE_SHARED_TEMPLATE = False
+
+# checkpoint while training, written by a background thread (rl_common.checkpoint)
+USE_PERIODIC_CHECKPOINTS = False
+CHECKPOINT_EVERY_UPDATES = None
+CHECKPOINT_EVERY_SECONDS = 60.
+CHECKPOINT_KEEP = 3
+
+# start from the latest checkpoint of model_path (rl_common.resume)
+USE_RESUME = False
+
 env_name = "CartPole-v1"
 env = gym.make(env_name)
 env.seed(1)     # reproducible, general Policy gradient has high variance
@@ -24,6 +131,7 @@ state_size = env.observation_space.shape[0]
 action_size = env.action_space.n
 
 training_time = 5*60
+target_score = 490     # stop once the average of the last 30 episodes of all workers reaches it
 ep_trial_step = 500
 UPDATE_GLOBAL_ITER = 10
 discount_factor = 0.9  # reward discount
@@ -31,23 +139,22 @@ discount_factor = 0.9  # reward discount
 
 learning_rate = 0.005
 
-episode = 0
-step = 0
-
 game_name =  sys.argv[0][:-3]
 
 model_path = "save_model/" + game_name
 graph_path = "save_graph/" + game_name
 
-# Make folder for save data
-if not os.path.exists(model_path):
-    os.makedirs(model_path)
-if not os.path.exists(graph_path):
-    os.makedirs(graph_path)
+# Make folder for save data (not in the hogwild / cluster processes, they import this script
+# under another sys.argv[0] and save nothing of their own)
+if __name__ == "__main__":
+    if not os.path.exists(model_path):
+        os.makedirs(model_path)
+    if not os.path.exists(graph_path):
+        os.makedirs(graph_path)
 
 # Network for the Actor Critic
 class A3CAgent(object):
-    def __init__(self, scope, master_agent = None):
+    def __init__(self, scope, master_agent = None, template = None):
         
         # if you want to see Cartpole learning, then change to True
         self.render = False
@@ -62,7 +169,13 @@ class A3CAgent(object):
         self.master_agent = master_agent
         self.scope = scope
         
-        if scope == "master":   # get global network
+        self.template_weights = None
+        if template is not None:    # a view of the template, see rl_common.shared_template
+            self.__dict__.update(graph_attrs(template))
+            self.template_weights = TemplateWeights(sess, self.model_params,
+                                                    master_agent.model_params,
+                                                    master_agent.params_version, PULL_MAX_STALENESS)
+        elif scope == "master":   # get global network
             with tf.variable_scope(scope):
                 self.state = tf.placeholder(tf.float32,  [None, self.state_size], name='state')
                 # parameters of actor and critic net
@@ -79,6 +192,8 @@ class A3CAgent(object):
                 
                 # with tf.variable_scope('td_error'):
                 self.td_error = tf.subtract(self.q_target, self.value, name='td_error')
+                # advantage of the policy gradient, fed by the V-trace learner
+                self.advantage = tf.placeholder_with_default(tf.stop_gradient(self.td_error), [None, 1], name='advantage')
 
                 # with tf.variable_scope('critic_loss'):
                 self.critic_loss = tf.reduce_mean(tf.square(self.td_error))
@@ -86,7 +201,7 @@ class A3CAgent(object):
                 # with tf.variable_scope('actor_loss'):
                 action_one_hot = tf.one_hot(self.action, self.action_size, dtype=tf.float32)
                 entropy = -tf.reduce_sum(tf.log(self.policy) * action_one_hot, axis=1, keep_dims=True)
-                self.actor_loss = tf.reduce_mean(entropy * tf.stop_gradient(self.td_error))
+                self.actor_loss = tf.reduce_mean(entropy * self.advantage)
                 
                 self.loss_total = self.actor_loss + self.critic_loss
 
@@ -102,12 +217,77 @@ class A3CAgent(object):
             zipped_model_vars = zip(self.model_gradients, self.master_agent.model_params)
             self.update_model_op = OPT_A.apply_gradients(zipped_model_vars)
 
+        # version of the master weights, bumped by every update applied to them
+        self.params_version = ParamsVersion() if self.master_agent is None else None
+
+        # sums the gradients of the workers, see update_global
+        self.accumulator = None
+        if USE_GRADIENT_ACCUMULATION and self.master_agent is None:
+            self.accumulator = GradientAccumulator(sess, [(OPT_A, self.model_params)],
+                                                   ACCUMULATE_STEPS, ACCUMULATE_WINDOW, ACCUMULATE_SYNC, N_WORKERS,
+                                                   on_apply=self.params_version.bump)
+
+        # set in the Hogwild worker processes, see hogwild_work
+        self.hogwild = None
+
+        # a view runs its session calls on the template graph, with its own weights fed
+        session, graph_scope = sess, self.scope
+        if template is not None:
+            session, graph_scope = self.template_weights, template.scope
+
+        # kernels and biases of the actor (and critic) MLPs in creation order: the weights of the
+        # NumPy policy and of the weight export
+        actor_params = scope_params(graph_scope + '/model/dense')
+        critic_params = scope_params(graph_scope + '/model/fc')
+        self.mlp_params = (actor_params, critic_params)
+        self.numpy_policy = None
+        if USE_NUMPY_POLICY and self.master_agent is not None:
+            self.numpy_policy = NumpyPolicy(session, *self.mlp_params)
+
+        # compiled handles for the hot session calls
+        if self.master_agent is not None:
+            seed = worker_seed(ACTION_SEED, int(self.scope[2:]))
+            # actions are picked in the graph, the argmax instead of a sample when greedy is set (evaluation)
+            self.greedy = False
+            self.random = np.random.RandomState(seed)     # draws of the NumPy policy
+            if template is None:    # a view has them from its template
+                self.sampled_action, self.greedy_action = sample_action(self.actor_predict, seed)
+                self.sampled_log_prob = action_log_prob(self.actor_predict, self.sampled_action)
+                self.greedy_log_prob = action_log_prob(self.actor_predict, self.greedy_action)
+                self.batch_log_prob = action_log_prob(self.actor_predict, self.action)     # of the fed actions
+            self.act_fn = session.make_callable([self.sampled_action, self.sampled_log_prob], [self.state])
+            self.greedy_act_fn = session.make_callable([self.greedy_action, self.greedy_log_prob], [self.state])
+            self.value_fn = session.make_callable(self.value, [self.state])
+            self.update_global_fn = feed_callable(session, self.update_model_op,
+                                                  [self.state, self.action, self.q_target])
+            # pulls the master (one flat buffer with USE_FLAT_PARAMS), only when the local copy is too stale
+            if template is not None:
+                self.versioned_pull = self.template_weights     # refreshes the weights it feeds
+            else:
+                self.versioned_pull = VersionedPull(sess, self.model_params,
+                                                    self.master_agent.model_params,
+                                                    self.master_agent.params_version, PULL_MAX_STALENESS)
+            # V-trace: log pi(action | state) and V(state) of a batch, the update with the advantage fed
+            self.evaluate_fn = session.make_callable([self.batch_log_prob, self.value],
+                                                    [self.state, self.action])
+            self.update_vtrace_fn = feed_callable(session, self.update_model_op,
+                                                  [self.state, self.action, self.q_target, self.advantage])
+            # adds the local gradients to the accumulator of the master instead of applying them
+            self.accumulate_fn = None
+            if self.master_agent.accumulator is not None:
+                if template is None:
+                    self.accumulate_op = self.master_agent.accumulator.add_op([self.model_gradients])
+                self.accumulate_fn = feed_callable(session, self.accumulate_op, [self.state, self.action, self.q_target])
+
     # neural network structure of the actor and critic
     def build_model(self, scope):
 
         w_init, b_init = tf.random_normal_initializer(.0, .3), tf.constant_initializer(0.1)
 
         with tf.variable_scope("model"):
+            if USE_FLAT_PARAMS:     # the layers below get views of model/flat
+                FlatParams(dense_size(self.state_size, self.hidden1, self.action_size) +
+                           dense_size(self.state_size, self.hidden1, self.value_size))
 
             actor_hidden = tf.layers.dense(self.state, self.hidden1, tf.nn.tanh, kernel_initializer=w_init,
                                         bias_initializer=b_init)
@@ -130,81 +310,134 @@ class A3CAgent(object):
         return self.policy, self.value, self.model_params # , self.critic_params
 
     def update_global(self, feed_dict):  # run by a local
-        sess.run(self.update_model_op, feed_dict)  # local grads applies to global net
+        if self.hogwild is not None:
+            self.hogwild.push(feed_dict)
+        elif self.accumulate_fn is not None:
+            self.master_agent.accumulator.add(self.accumulate_fn, feed_dict)  # applied every ACCUMULATE_STEPS
+        else:
+            self.update_global_fn(feed_dict)  # local grads applies to global net
+            self.master_agent.params_version.bump()
 
-    def pull_global(self):  # run by a local
-        sess.run(self.pull_model_params_op)
+    def update_vtrace(self, feed_dict):  # run by the V-trace learner
+        self.update_vtrace_fn(feed_dict)
+        self.master_agent.params_version.bump()
 
-    # get action from policy network
-    def get_action(self, state):
+    def pull_global(self):  # run by a local
+        if self.hogwild is not None:
+            self.hogwild.pull()
+        elif not self.versioned_pull.pull():
+            return      # the local copy is recent enough
+        if self.numpy_policy is not None:
+            self.numpy_policy.sync()
+
+    # action and its log-probability from one forward pass
+    def act(self, state):
         # Reshape observation to (num_features, 1)
         state_t =  state[np.newaxis, :]
-        # Run forward propagation to get softmax probabilities
-        prob_weights = sess.run(self.policy, feed_dict={self.state: state_t})
-        # Select action using a biased sample
-        # this will return the index of the action we've sampled
-        action = np.random.choice(range(prob_weights.shape[1]), p=prob_weights.ravel())
-        return action
+        # one action index, sampled (or the argmax when greedy) in the graph
+        if self.numpy_policy is not None:
+            action, log_prob = self.numpy_policy.sample(state_t, self.random, self.greedy)
+        elif self.greedy:
+            action, log_prob = self.greedy_act_fn(state_t)
+        else:
+            action, log_prob = self.act_fn(state_t)
+        return int(action[0]), log_prob[0]
+
+    # get action from policy network, with its log-probability (the behaviour policy of a V-trace actor)
+    def get_action(self, state):
+        return self.act(state)
+
+    # V(next_state) for the n-step target, a value-only fetch: the update that follows changes
+    # the weights, so an action sampled here could not be reused for next_state
+    def bootstrap_value(self, next_state):
+        state_t = next_state[np.newaxis, :]
+        if self.numpy_policy is not None:
+            return self.numpy_policy.value(state_t)[0, 0]
+        return self.value_fn(state_t)[0, 0]
         
 # worker class that inits own environment, trains on it and updloads weights to global net
 class Worker(object):
-    def __init__(self, env, name, COORD, master_agent):
+    def __init__(self, env, name, COORD, master_agent, template = None):
         self.env = env
         self.coordinator = COORD
         self.name = name
-        self.agent = A3CAgent(name, master_agent)
+        self.agent = A3CAgent(name, master_agent, template)
         self.master_agent = master_agent
-
-        self.buffer_state, self.buffer_action, self.buffer_reward = [], [], []
-        self.buffer_q_target = []
+        self.inference_server = None
+        self.trainer_queue = None
+        self.vtrace_learner = None
+        self.policy_version = 0
+        self.n_segments = 0
+        self.stats = None     # RunStats shared by all the workers
+        self.retired = False  # set by the WorkerPool to stop this worker
+        self.checkpointer = None  # AsyncCheckpointer shared by all the workers
+        self.trajectory_writer = None  # TrajectoryWriter shared by all the workers
+        self.recorder = None  # this worker's stream of it
+
+        self.buffer = RolloutBuffer(UPDATE_GLOBAL_ITER, state_size)
         self.train_steps = 1
 
     # save <s, a ,r> of each step
     # this is used for calculating discounted rewards
-    def append_sample(self, state, action, reward):
-        self.buffer_state.append(state)
-        self.buffer_action.append(action)
-        self.buffer_reward.append(reward)
+    def append_sample(self, state, action, reward, log_prob):
+        self.buffer.append(state, action, reward, log_prob)
 
     # update policy network and value network every episode
     def train_model(self, next_state, done):
         if done:
             value_next_state = 0   # terminal
         else:
-            value_next_state = sess.run(self.agent.value, {self.agent.state: next_state[np.newaxis, :]})[0, 0]
+            value_next_state = self.agent.bootstrap_value(next_state)
             
-        for reward in self.buffer_reward[::-1]:    # reverse buffer r
-            value_next_state = reward + discount_factor * value_next_state
-            self.buffer_q_target.append(value_next_state)
-
-        self.buffer_q_target.reverse()
+        q_target = bootstrap_returns(self.buffer.rewards, discount_factor, value_next_state)
 
         feed_dict={
-            self.agent.state: np.vstack(self.buffer_state),
-            self.agent.action: np.array(self.buffer_action),
-            self.agent.q_target: np.vstack(self.buffer_q_target)
+            self.agent.state: self.buffer.states,
+            self.agent.action: self.buffer.actions,
+            self.agent.q_target: q_target
         } 
         
-        self.agent.update_global(feed_dict) # actual training step, update global A3CAgent
-        self.agent.pull_global() # get global parameters to local A3CAgent    
+        if self.vtrace_learner is not None:
+            # the raw segment and the log-probs of the weights that acted, the learner builds the targets
+            self.vtrace_learner.put_trajectory(self.buffer.states, self.buffer.actions, self.buffer.rewards,
+                                               self.buffer.log_probs,
+                                               next_state, done, self.policy_version)
+        elif self.trainer_queue is not None:
+            # the trainer thread batches the segments of all workers into one update
+            self.trainer_queue.put(self.buffer.states, self.buffer.actions, q_target, self.policy_version)
+        else:
+            self.agent.update_global(feed_dict) # actual training step, update global A3CAgent
+
+        # the local snapshot may act for a few segments before it is refreshed
+        self.n_segments += 1
+        if self.n_segments % ACTOR_PULL_INTERVAL == 0:
+            learner = self.vtrace_learner or self.trainer_queue
+            if learner is not None:
+                self.policy_version = learner.version
+            self.agent.pull_global() # get global parameters to local A3CAgent
         
-        self.buffer_state, self.buffer_action, self.buffer_reward = [], [], []
-        self.buffer_q_target = []
+        self.buffer.clear()
+
+        if self.checkpointer is not None:   # snapshots when one is due, written in the background
+            self.checkpointer.update(self.master_agent.params_version.version)
+
+    # the run is over, or the pool retired this worker
+    def should_stop(self):
+        return self.retired or self.stats.should_stop()
 
     def work(self):
-        global episode, step
-        
-        avg_score = 0
-        episodes, scores = [], []
+        worker_stats = self.stats.worker(self.name)
+        if self.trajectory_writer is not None:
+            self.recorder = self.trajectory_writer.recorder(self.name, state_size, RECORD_CHUNK_SIZE, RECORD_BUFFERS)
 
-        self.buffer_state, self.buffer_action, self.buffer_reward = [], [], []
+        self.buffer.clear()
         
         # Step 3.2: run the game
         display_time = datetime.datetime.now()
         print("\n\n",game_name, "-game start at :",display_time,"\n")
         start_time = time.time()
         
-        while time.time() - start_time < training_time and avg_score < 490:
+        while not self.should_stop():
             
             state = self.env.reset()
 
@@ -212,22 +445,27 @@ class Worker(object):
             score = 0
             ep_step = 0
 
-            while not done and ep_step < ep_trial_step:
+            while not done and ep_step < ep_trial_step and not self.should_stop():
                 # every time step we do train from the replay memory
                 ep_step += 1
-                step += 1
+                step = worker_stats.step()
                 
                 # if self.name == 'W_0':
                 #     self.env.render()
                 
                 # Select action_arr
-                action = self.agent.get_action(state)
+                if self.inference_server is not None:
+                    action, log_prob = self.inference_server.act(state)
+                else:
+                    action, log_prob = self.agent.get_action(state)
                 
                 # make step in environment
                 next_state, reward, done, _ = self.env.step(action) 
                 
                 # save the sample <state, action, reward> to the memory
-                self.append_sample(state, action, reward)
+                self.append_sample(state, action, reward, log_prob)
+                if self.recorder is not None:
+                    self.recorder.append(state, action, reward, done, ep_step == ep_trial_step)
                 
                 if step % 10 == 0 or done:   # update global and assign to local net
                     self.train_model(next_state, done)
@@ -238,50 +476,242 @@ class Worker(object):
                 
                 # train when epsisode finished
                 if done or ep_step == ep_trial_step:
-                    episode += 1
                     # self.train_model(next_state, done)
                     
                     # every episode, plot the play time
-                    scores.append(score)
-                    episodes.append(episode)
-                    avg_score = np.mean(scores[-min(30, len(scores)):])
+                    episode, avg_score = worker_stats.end_episode(score)
 
                     print('episode :{:>6,d}'.format(episode),'/ ep step :{:>5,d}'.format(ep_step), \
                           '/ time step :{:>8,d}'.format(step),'/ last 30 avg :{:> 4.1f}'.format(avg_score) )
 
                     break
 
+        if self.master_agent.accumulator is not None:
+            self.master_agent.accumulator.leave()  # the sync rounds go on without this worker
+        if self.recorder is not None:
+            self.recorder.close()  # the partial chunk goes to the writer
+
         e = int(time.time() - start_time)
         print(' Elasped time :{:02d}:{:02d}:{:02d}'.format(e // 3600, (e % 3600 // 60), e % 60))
 
-if __name__ == "__main__":
+# one Hogwild worker process: builds its own graph and session, the master network
+# in it is only a template, the weights it trains are the shared_params of the parent,
+# its counters and its stop are the shared_stats of all the processes
+def hogwild_work(index, shared_params, shared_stats):
+    global sess, OPT_A
+    # one op thread per process, the parallelism comes from the processes
+    sess = tf.Session(config=tf.ConfigProto(intra_op_parallelism_threads=1, inter_op_parallelism_threads=1))
+
+    OPT_A = tf.train.RMSPropOptimizer(learning_rate, name='RMSPropA')
+    global_agent = A3CAgent("master")
+    worker = Worker(gym.make(env_name).unwrapped, 'W_%i' % index, None, global_agent)
+    sess.run(tf.global_variables_initializer())
+    sess.run(flat_params_initializer())
+
+    agent = worker.agent
+    agent.hogwild = HogwildClient(sess, [agent.model_params], [agent.model_gradients], shared_params)
+    agent.pull_global()
+    worker.stats = RunStats(None, training_time, target_score, shared=shared_stats)    # one stop for all the processes
+    worker.work()
+
+# one worker task of the cluster: the master network is built on the ps tasks and shared by
+# all the tasks, the local network and the environment run in this process; the chief saves
+# to the launcher's paths (a spawned task sees another sys.argv[0], so another game_name)
+def cluster_work(cluster, index, model_path, graph_path):
+    global sess, OPT_A
+    task = ClusterTask(cluster, index)
+    sess = task.sess
+
+    with tf.device(task.shared_device):
+        OPT_A = tf.train.RMSPropOptimizer(learning_rate, name='RMSPropA')
+        global_agent = A3CAgent("master")
+    with tf.device(task.local_device):
+        worker = Worker(gym.make(env_name).unwrapped, 'W_%i' % index, None, global_agent)
+    task.initialize("master", worker.name)
+
+    worker.stats = RunStats(task.coordinator, training_time, target_score)    # one stop for all the tasks
+    worker.work()
+
+    if task.finish():   # the chief saves the master once every task is done
+        tf.summary.FileWriter(graph_path + "/", sess.graph)
+        tf.train.Saver().save(sess, model_path + "/")
+
+if __name__ == "__main__" and USE_CLUSTER:
+    run_cluster(cluster_work, {'ps': CLUSTER_PS_HOSTS, 'worker': CLUSTER_WORKER_HOSTS}, sys.argv[1:],
+                (model_path, graph_path))
+elif __name__ == "__main__":
+    subproc_env = None
+    if USE_SUBPROC_ENV and not USE_HOGWILD_PROCESSES:
+        subproc_env = SubprocVecEnv(env_name, N_WORKERS, auto_reset=False)
+
     sess = tf.Session()
 
     OPT_A = tf.train.RMSPropOptimizer(learning_rate, name='RMSPropA')
     global_agent = A3CAgent("master")  # we only need its params
-    workers = []
+
+    resume = None
+    checkpoint_path = latest_checkpoint(model_path) if USE_RESUME else None
+
+    if USE_HOGWILD_PROCESSES:
+        if checkpoint_path is not None:
+            resume = Resume(sess, checkpoint_path)
+        else:
+            sess.run(tf.global_variables_initializer())
+            sess.run(flat_params_initializer())
+        shared_params = [SharedParams(sess.run(global_agent.model_params), SharedRMSProp(learning_rate))]
+        if resume is not None:     # the optimizer slots of the run
+            resume.apply_hogwild(shared_params)
+            print(resume.report())
+        shared_stats = SharedRunStats(hogwild_context())
+        run_hogwild(hogwild_work, N_WORKERS, (shared_params, shared_stats))
+        print(shared_stats.report())
+
+        # copy the trained shared weights back into the master network for saving
+        for shared, params in zip(shared_params, [global_agent.model_params]):
+            shared.load(sess, params)
+        if USE_RESUME:
+            save_run_state(model_path, hogwild_run_state(shared_params))     # goes with the final save
+    else:
+        workers = []
     
-    COORD = tf.train.Coordinator()
+        COORD = tf.train.Coordinator()
     
-    # Create workers
-    for index in range(N_WORKERS):
-        env = gym.make(env_name).unwrapped
-        i_name = 'W_%i' % index   # worker name
-        workers.append(Worker(env, i_name, COORD, global_agent))
-
-    sess.run(tf.global_variables_initializer())
+        # Create workers
+        template = None
+        for index in range(N_WORKERS):
+            if subproc_env is not None:
+                env = subproc_env.get_env(index)
+            else:
+                env = gym.make(env_name).unwrapped
+            i_name = 'W_%i' % index   # worker name
+            workers.append(Worker(env, i_name, COORD, global_agent, template))
+            if USE_SHARED_TEMPLATE:
+                template = workers[0].agent     # the other locals are views of W_0
+
+        learner = None
+        if USE_TRAINER_QUEUE or USE_VTRACE:
+            # one more local network, it only computes the gradients of the trainer batches
+            learner = A3CAgent('W_%i' % N_WORKERS, global_agent, template)
+            learner.numpy_policy = None     # it never acts
+            learner.accumulate_fn = None    # applies its batches directly
+
+        if checkpoint_path is not None:
+            # the shared variables, then the master into every local network in one call
+            local_agents = [worker.agent for worker in workers] + ([learner] if learner is not None else [])
+            resume = Resume(sess, checkpoint_path, local_agents)
+        else:
+            sess.run(tf.global_variables_initializer())
+            sess.run(flat_params_initializer())
+            if USE_OFFLINE_PRETRAIN:     # warm start of the master, then every local network pulls it
+                pretrainer = OfflinePretrainer(sess, global_agent.state, global_agent.policy, global_agent.value,
+                                               tf.get_collection(tf.GraphKeys.TRAINABLE_VARIABLES, scope='master/'),
+                                               PRETRAIN_LEARNING_RATE, PRETRAIN_CRITIC)
+                pretrainer.run(TrajectoryDataset(PRETRAIN_DATA_DIR or model_path + '/trajectories', discount_factor,
+                                                 PRETRAIN_MIN_EPISODE_RETURN),
+                               PRETRAIN_EPOCHS, PRETRAIN_BATCH_SIZE, PRETRAIN_SECONDS, PRETRAIN_SHUFFLE_CHUNKS)
+                print(pretrainer.report())
+                global_agent.params_version.bump()
+                for agent in [worker.agent for worker in workers] + ([learner] if learner is not None else []):
+                    agent.pull_global()
+
+        inference_server = None
+        if USE_INFERENCE_SERVER:
+            # workers act with the master network, it is synced to the locals after every push
+            inference_server = InferenceServer(sess, global_agent.state, global_agent.policy,
+                                               INFERENCE_MAX_BATCH, INFERENCE_MAX_WAIT)
+            inference_server.start()
+            for worker in workers:
+                worker.inference_server = inference_server
+
+        trainer_queue = None
+        if USE_VTRACE:
+            trainer_queue = VTraceLearner(learner.update_vtrace, learner.pull_global, learner.evaluate_fn,
+                                          learner.state, learner.action, learner.q_target, learner.advantage,
+                                          discount_factor, TRAINER_BATCH_SIZE, TRAINER_QUEUE_SIZE,
+                                          TRAINER_MAX_WAIT, VTRACE_CLIP_RHO, VTRACE_CLIP_PG_RHO)
+            trainer_queue.start()
+            for worker in workers:
+                worker.vtrace_learner = trainer_queue
+        elif USE_TRAINER_QUEUE:
+            trainer_queue = TrainerQueue(learner.update_global, learner.pull_global,
+                                         learner.state, learner.action, learner.q_target,
+                                         TRAINER_BATCH_SIZE, TRAINER_QUEUE_SIZE, TRAINER_MAX_WAIT)
+            trainer_queue.start()
+            for worker in workers:
+                worker.trainer_queue = trainer_queue
     
-    worker_threads = []
-    for worker in workers: #start workers
-        job = worker.work
-        thread = threading.Thread(target = job)
-        thread.start()
-        worker_threads.append(thread)
-        
-    COORD.join(worker_threads)  # wait for termination of workers
+        run_stats = RunStats(COORD, training_time, target_score)
+        for worker in workers:
+            worker.stats = run_stats
+        if resume is not None:
+            resume.apply(run_stats, workers)
+            print(resume.report())
+
+        checkpointer = None
+        if USE_PERIODIC_CHECKPOINTS:
+            checkpointer = AsyncCheckpointer(sess, model_path, CHECKPOINT_EVERY_UPDATES, CHECKPOINT_EVERY_SECONDS,
+                                             CHECKPOINT_KEEP, state_fn=lambda: run_state(run_stats, pool.workers),
+                                             state_file=RUN_STATE_FILE)
+            for worker in workers:
+                worker.checkpointer = checkpointer
+
+        trajectory_writer = None
+        if USE_TRAJECTORY_RECORDER:
+            trajectory_writer = TrajectoryWriter(model_path + '/trajectories')
+            for worker in workers:
+                worker.trajectory_writer = trajectory_writer
+
+        # workers can be added / retired while training runs, the new ones share the settings of W_0
+        accumulator = global_agent.accumulator
+        make_worker = lambda name: Worker(gym.make(env_name).unwrapped, name, COORD, global_agent, template)
+        pool = WorkerPool(sess, COORD, make_worker, workers,
+                          ('stats', 'inference_server', 'trainer_queue', 'vtrace_learner', 'checkpointer',
+                           'trajectory_writer'),
+                          next_index=N_WORKERS + 1,     # W_<N_WORKERS> is the learner's scope
+                          on_add=accumulator.enter if accumulator is not None else None)
+        for worker in workers: #start workers
+            pool.start(worker)
+
+        autoscaler = None
+        if USE_AUTOSCALE:
+            autoscaler = Autoscaler(pool, run_stats, AUTOSCALE_INTERVAL, AUTOSCALE_MAX_WORKERS)
+            autoscaler.start()
+
+        pool.join()  # wait for termination of workers
+        print(run_stats.report())
+        print(pool.report())
+        if autoscaler is not None:
+            autoscaler.join()
+            print(autoscaler.report())
+        print(pull_report([worker.agent.versioned_pull for worker in pool.workers]))
+        if global_agent.accumulator is not None:
+            print(global_agent.accumulator.report())
+
+        if trainer_queue is not None:
+            trainer_queue.stop()
+            print(trainer_queue.report())
+
+        if inference_server is not None:
+            inference_server.stop()
+            print(inference_server.report())
+
+        if checkpointer is not None:
+            checkpointer.close()
+            print(checkpointer.report())
+        if trajectory_writer is not None:
+            trajectory_writer.close()  # the chunks in flight
+            print(trajectory_writer.report())
+        if USE_RESUME or checkpointer is not None:
+            save_run_state(model_path, run_state(run_stats, pool.workers))     # goes with the final save
     
     tf.summary.FileWriter(graph_path + "/", sess.graph)
     saver = tf.train.Saver()
     saver.save(sess, model_path+ "/")
+    if EXPORT_WEIGHTS:     # the master's networks, for inference only
+        export_weights(model_path + '/' + WEIGHTS_FILE, sess, *global_agent.mlp_params,
+                       meta={'source': game_name, 'state_size': state_size, 'action_size': action_size})
+
+    if subproc_env is not None:
+        subproc_env.close()
     
 
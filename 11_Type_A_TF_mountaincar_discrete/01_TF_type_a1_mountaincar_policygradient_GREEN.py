@@ -10,6 +10,15 @@ os.environ['TF_CPP_MIN_LOG_LEVEL'] = '2'
 from tensorflow.python.framework import ops
 ops.reset_default_graph()
 
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from rl_common.numpy_policy import NumpyPolicy
+from rl_common.returns import discount_cumsum, normalize
+from rl_common.rollout_buffer import RolloutBuffer
+from rl_common.sampling import sample_action
+from rl_common.checkpoint import AsyncCheckpointer
+from rl_common.weight_export import export_weights, WEIGHTS_FILE
+from rl_common.trajectory_recorder import TrajectoryWriter
+
 env_name = 'MountainCar-v0'
 # set environment
 env = gym.make(env_name)
@@ -20,6 +29,26 @@ env = env.unwrapped
 state_size = env.observation_space.shape[0]
 action_size = env.action_space.n
 
+# act with a NumPy snapshot of the networks instead of a session call per step
+USE_NUMPY_POLICY = False
+
+# after training, write model_path/policy.weights for rl_common.weight_export.load_policy
+EXPORT_WEIGHTS = False
+
+# record the rollout loop to model_path/trajectories (rl_common.trajectory_recorder)
+USE_TRAJECTORY_RECORDER = False
+RECORD_CHUNK_SIZE = 16384
+RECORD_BUFFERS = 2
+
+# seed of the action sampler (the graph op, or the RandomState of the NumPy policy), None for a random one
+ACTION_SEED = None
+
+# checkpoint while training, written by a background thread (rl_common.checkpoint)
+USE_PERIODIC_CHECKPOINTS = False
+CHECKPOINT_EVERY_UPDATES = None
+CHECKPOINT_EVERY_SECONDS = 60.
+CHECKPOINT_KEEP = 3
+
 game_name =  sys.argv[0][:-3]
 
 model_path = "save_model/" + game_name
@@ -37,14 +66,16 @@ def train_model(agent, x, y, reward):
     Args:
         agent(PolicyGradient): 학습될 네트워크
         x(np.array): State가 저장되어있는 array
-        y(np.array): Action(one_hot)이 저장되어있는 array
+        y(np.array): Action index가 저장되어있는 array
         reward(np.array) : Discounted reward가 저장되어있는 array
         
     Returns:
         l(float): 네트워크에 의한 loss
     '''
     l,_ = agent.sess.run([agent.actor_loss, agent.train_op], feed_dict={agent.state: x, agent.action: y, agent.reward : reward})
-    agent.episode_memory = []
+    if agent.numpy_policy is not None:
+        agent.numpy_policy.sync()
+    agent.buffer.clear()
     return l
 
 # This is REINFORCE agent for the Cartpole
@@ -70,15 +101,32 @@ class PolicyGradient:
         self.hidden1, self.hidden2 = 64, 64
         
         self.ep_trial_step = 10000
-        # lists for the states, actions and rewards
-        self.episode_memory = []
+        # preallocated states, actions and rewards
+        self.buffer = RolloutBuffer(self.ep_trial_step, self.state_size)
         
         self.build_model()
 
+        # kernels and biases of the actor (and critic) MLPs in creation order: the weights of the
+        # NumPy policy and of the weight export
+        actor_params = tf.get_collection(tf.GraphKeys.TRAINABLE_VARIABLES, scope='fc[12]_a')
+        self.mlp_params = (actor_params, [])
+        self.numpy_policy = None
+        if USE_NUMPY_POLICY:
+            self.numpy_policy = NumpyPolicy(self.sess, *self.mlp_params)
+
+        # actions are picked in the graph, the argmax instead of a sample when greedy is set (evaluation)
+        self.greedy = False
+        self.random = np.random.RandomState(ACTION_SEED)     # draws of the NumPy policy
+        self.sampled_action, self.greedy_action = sample_action(self.actor_predict, ACTION_SEED)
+
+        # compiled handles for the hot session calls
+        self.act_fn = self.sess.make_callable(self.sampled_action, [self.state])
+        self.greedy_act_fn = self.sess.make_callable(self.greedy_action, [self.state])
+
     def build_model(self):
         # with tf.variable_scope('input'):
         self.state = tf.placeholder(tf.float32, [None, self.state_size], name="states")
-        self.action = tf.placeholder(tf.float32, [None, self.action_size], name="action")
+        self.action = tf.placeholder(tf.int32, [None, ], name="action")
         self.reward = tf.placeholder(tf.float32, name="reward")
         
         w_init, b_init = tf.random_normal_initializer(mean=0, stddev=0.3), tf.constant_initializer(0.1)
@@ -86,12 +134,12 @@ class PolicyGradient:
         actor_hidden = tf.layers.dense(inputs=self.state, units = self.hidden1, activation=tf.nn.tanh,  # tanh activation
             kernel_initializer = w_init, bias_initializer = b_init, name='fc1_a')
         # fc2
-        actor_predict = tf.layers.dense(inputs=actor_hidden, units = self.action_size, activation=None,
+        self.actor_predict = tf.layers.dense(inputs=actor_hidden, units = self.action_size, activation=None,
             kernel_initializer = w_init, bias_initializer = b_init, name='fc2_a')
 
-        self.policy = tf.nn.softmax(actor_predict, name='act_prob')  # use softmax to convert to probability
+        self.policy = tf.nn.softmax(self.actor_predict, name='act_prob')  # use softmax to convert to probability
 
-        self.log_p = self.action * tf.log(self.policy)
+        self.log_p = tf.one_hot(self.action, self.action_size, dtype=tf.float32) * tf.log(self.policy)
         self.log_lik = self.log_p * self.reward
         self.actor_loss = tf.reduce_mean(tf.reduce_sum(-self.log_lik, axis=1))
         
@@ -102,37 +150,28 @@ class PolicyGradient:
     def get_action(self, state):
         # Reshape observation to (num_features, 1)
         state_t = np.reshape(state, [1, self.state_size])
-        # Run forward propagation to get softmax probabilities
-        prob_weights = self.sess.run(self.policy, feed_dict={self.state: state_t})
-
-        # Select action using a biased sample
-        # this will return the index of the action we've sampled
-        action = np.random.choice(np.arange(self.action_size), p=prob_weights[0])
-
-        return action
+        # one action index, sampled (or the argmax when greedy) in the graph
+        if self.numpy_policy is not None:
+            action = self.numpy_policy.sample(state_t, self.random, self.greedy)[0]
+        elif self.greedy:
+            action = self.greedy_act_fn(state_t)
+        else:
+            action = self.act_fn(state_t)
+        return int(action[0])
         
     # calculate discounted rewards
     def discount_and_norm_rewards(self, buffer_reward):
-        discounted_rewards = np.zeros_like(buffer_reward)
-        running_add = 0
-        for index in reversed(range(0, len(buffer_reward))):
-            running_add = running_add * self.discount_factor + buffer_reward[index]
-            discounted_rewards[index] = running_add
-            
+        discounted_rewards = discount_cumsum(np.ravel(buffer_reward), self.discount_factor)
+        discounted_rewards = np.reshape(discounted_rewards, np.shape(buffer_reward))
+
         # normalize episode rewards
-        discounted_rewards -= np.mean(discounted_rewards)
-        discounted_rewards /= np.std(discounted_rewards)
-        return discounted_rewards
+        return normalize(discounted_rewards)
     
     # save <s, a ,r> of each step
     # this is used for calculating discounted rewards
     def append_sample(self, state, action, reward):
-        # Store actions as list of arrays
-        # e.g. for action_size = 2 -> [ array([ 1.,  0.]), array([ 0.,  1.]), array([ 0.,  1.]), array([ 1.,  0.]) ]
-        action_array = np.zeros(self.action_size)
-        action_array[action] = 1
-        self.episode_memory.append([state, action_array, reward])
-        
+        self.buffer.append(state, action, reward)
+
     def save_model(self):
         # Save the variables to disk.
         save_path = self.saver.save(self.sess, model_path + "/model.ckpt")
@@ -149,6 +188,12 @@ def main():
 
         init = tf.global_variables_initializer()
         agent.saver = tf.train.Saver()
+        agent.checkpointer = None
+        if USE_PERIODIC_CHECKPOINTS:
+            agent.checkpointer = AsyncCheckpointer(agent.sess, model_path, CHECKPOINT_EVERY_UPDATES,
+                                                   CHECKPOINT_EVERY_SECONDS, CHECKPOINT_KEEP,
+                                                   state_fn=lambda: (agent.episode, agent.step),
+                                                   state_file='epsilon_episode.pickle')
         ckpt = tf.train.get_checkpoint_state(model_path)
 
         if ckpt and tf.train.checkpoint_exists(ckpt.model_checkpoint_path):
@@ -171,6 +216,10 @@ def main():
         # Step 3.2: run the game
         display_time = datetime.datetime.now()
         print("\n\n",game_name, "-game start at :",display_time,"\n")
+        recorder = None
+        if USE_TRAJECTORY_RECORDER:
+            trajectory_writer = TrajectoryWriter(model_path + '/trajectories')
+            recorder = trajectory_writer.recorder('main', state_size, RECORD_CHUNK_SIZE, RECORD_BUFFERS)
         start_time = time.time()
         
         while time.time() - start_time < agent.training_time and avg_score > 200:
@@ -193,6 +242,8 @@ def main():
 
                 # save the sample <state, action, reward> to the memory
                 agent.append_sample(state, action, reward)
+                if recorder is not None:
+                    recorder.append(state, action, reward, done, ep_step == agent.ep_trial_step)
 
                 score = ep_step
 
@@ -201,13 +252,14 @@ def main():
                 if done or ep_step == agent.ep_trial_step:
                     agent.episode += 1
                     # env.reset()
-                    agent.episode_memory = np.array(agent.episode_memory)
-                    buffer_reward = np.vstack(agent.episode_memory[:, 2])
+                    buffer_reward = agent.buffer.rewards[:, np.newaxis]
 
                     discounted_rewards = agent.discount_and_norm_rewards(buffer_reward)
                     
-                    l = train_model(agent, np.vstack(agent.episode_memory[:,0]), np.vstack(agent.episode_memory[:,1]),
-                                       discounted_rewards)
+                    l = train_model(agent, agent.buffer.states, agent.buffer.actions, discounted_rewards)
+                    
+                    if agent.checkpointer is not None:   # snapshots when one is due, written in the background
+                        agent.checkpointer.update()
 
                     # every episode, plot the play time
                     scores.append(score)
@@ -219,7 +271,16 @@ def main():
 
                     break
         # Save model
+        if agent.checkpointer is not None:
+            agent.checkpointer.close()
+            print(agent.checkpointer.report())
         agent.save_model()
+        if recorder is not None:
+            trajectory_writer.close()  # the partial chunk and the chunks in flight
+            print(trajectory_writer.report())
+        if EXPORT_WEIGHTS:     # the networks for inference only
+            export_weights(model_path + '/' + WEIGHTS_FILE, agent.sess, *agent.mlp_params,
+                           meta={'source': game_name, 'state_size': state_size, 'action_size': action_size})
 
         pylab.plot(episodes, scores, 'b')
         pylab.savefig("./save_graph/mountaincar_PG_1.png")
@@ -0,0 +1,98 @@
+import tensorflow as tf
+import numpy as np
+import time
+import sys
+import os
+os.environ['TF_CPP_MIN_LOG_LEVEL'] = '2'
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from rl_common.callables import feed_callable
+
+# per call cost of the hot session calls: Session.run with a fresh feed_dict
+# against the make_callable handles, Type B CartPole network
+state_size, action_size = 4, 2
+learning_rate = 0.005
+n_step = 10
+repeat = 1000
+rounds = 5
+
+def build(scope):
+    with tf.variable_scope(scope):
+        state = tf.placeholder(tf.float32, [None, state_size], name='state')
+        action = tf.placeholder(tf.int32, [None, ], name='action')
+        q_target = tf.placeholder(tf.float32, [None, 1], name='q_target')
+        w_init, b_init = tf.random_normal_initializer(.0, .3), tf.constant_initializer(0.1)
+        hidden = tf.layers.dense(state, 64, tf.nn.tanh, kernel_initializer=w_init, bias_initializer=b_init)
+        policy = tf.nn.softmax(tf.layers.dense(hidden, action_size, kernel_initializer=w_init, bias_initializer=b_init))
+        hidden = tf.layers.dense(state, 64, tf.nn.tanh, kernel_initializer=w_init, bias_initializer=b_init)
+        value = tf.layers.dense(hidden, 1, kernel_initializer=w_init, bias_initializer=b_init)
+    params = tf.get_collection(tf.GraphKeys.TRAINABLE_VARIABLES, scope=scope)
+
+    td_error = q_target - value
+    log_prob = tf.reduce_sum(tf.log(policy + 1e-5) * tf.one_hot(action, action_size), axis=1, keep_dims=True)
+    loss = tf.reduce_mean(tf.square(td_error)) - tf.reduce_mean(log_prob * tf.stop_gradient(td_error))
+    return state, action, q_target, policy, value, params, loss
+
+def timeit(fn):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat * 1e6
+
+# interleaved rounds, best of each, so a noisy stretch does not land on one side only
+def report(name, run_fn, callable_fn):
+    for _ in range(50):
+        run_fn(), callable_fn()
+    before, after = float('inf'), float('inf')
+    for _ in range(rounds):
+        before, after = min(before, timeit(run_fn)), min(after, timeit(callable_fn))
+    print(' {:26s} : sess.run {:7.1f} us / callable {:7.1f} us ({:.2f}x)'.format(name, before, after, before / after))
+
+def main():
+    random = np.random.RandomState(0)
+    state_t = random.randn(1, state_size).astype(np.float32)
+    states = random.randn(n_step, state_size).astype(np.float32)
+    actions = random.randint(action_size, size=n_step).astype(np.int32)
+    q_targets = random.randn(n_step, 1).astype(np.float32)
+
+    print(' A2C (one agent, train op)')
+    tf.reset_default_graph()
+    sess = tf.Session()
+    state, action, q_target, policy, value, params, loss = build('a2c')
+    train_op = tf.train.AdamOptimizer(learning_rate).minimize(loss)
+    sess.run(tf.global_variables_initializer())
+
+    policy_fn = sess.make_callable(policy, [state])
+    value_fn = sess.make_callable(value, [state])
+    train_fn = feed_callable(sess, train_op, [state, action, q_target])
+    report('get_action', lambda: sess.run(policy, feed_dict={state: state_t}), lambda: policy_fn(state_t))
+    report('bootstrap value', lambda: sess.run(value, {state: state_t})[0][0], lambda: value_fn(state_t)[0][0])
+    report('train_model (%d steps)' % n_step,
+           lambda: sess.run(train_op, {state: states, action: actions, q_target: q_targets}),
+           lambda: train_fn({state: states, action: actions, q_target: q_targets}))
+    sess.close()
+
+    print(' A3C (master + local worker)')
+    tf.reset_default_graph()
+    sess = tf.Session()
+    master_params = build('master')[5]
+    state, action, q_target, policy, value, params, loss = build('W_0')
+    gradients = tf.gradients(loss, params)
+    update_op = tf.train.RMSPropOptimizer(learning_rate).apply_gradients(zip(gradients, master_params))
+    pull_op = [local.assign(master) for local, master in zip(params, master_params)]
+    sess.run(tf.global_variables_initializer())
+
+    policy_fn = sess.make_callable(policy, [state])
+    value_fn = sess.make_callable(value, [state])
+    update_global_fn = feed_callable(sess, update_op, [state, action, q_target])
+    pull_global_fn = sess.make_callable(pull_op)
+    report('get_action', lambda: sess.run(policy, feed_dict={state: state_t}), lambda: policy_fn(state_t))
+    report('bootstrap value', lambda: sess.run(value, {state: state_t})[0][0], lambda: value_fn(state_t)[0][0])
+    report('update_global (%d steps)' % n_step,
+           lambda: sess.run(update_op, {state: states, action: actions, q_target: q_targets}),
+           lambda: update_global_fn({state: states, action: actions, q_target: q_targets}))
+    report('pull_global', lambda: sess.run(pull_op), pull_global_fn)
+    sess.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+import tensorflow as tf
+import numpy as np
+import tempfile
+import shutil
+import time
+import sys
+import os
+os.environ['TF_CPP_MIN_LOG_LEVEL'] = '2'
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from rl_common.callables import feed_callable
+from rl_common.checkpoint import AsyncCheckpointer
+
+# updates/sec of a training loop and the time the loop is blocked per checkpoint: no
+# checkpoints, a Saver.save in the loop every CHECKPOINT_EVERY updates, and the in-graph
+# snapshot written by the AsyncCheckpointer thread; Type B network with Adam (the slots
+# are checkpointed too), random segments
+state_size, action_size = 4, 2
+hidden_sizes = (64, 4096, 32768)
+learning_rate = 0.001
+segment_size = 32
+checkpoint_every = 50
+duration = 10.
+modes = ('no checkpoints', 'Saver.save in the loop', 'AsyncCheckpointer')
+
+class Net(object):
+    def __init__(self, hidden):
+        self.state = tf.placeholder(tf.float32, [None, state_size], name='state')
+        self.action = tf.placeholder(tf.int32, [None, ], name='action')
+        self.q_target = tf.placeholder(tf.float32, [None, 1], name='q_target')
+
+        w_init, b_init = tf.random_normal_initializer(.0, .3), tf.constant_initializer(0.1)
+        actor_hidden = tf.layers.dense(self.state, hidden, tf.nn.tanh, kernel_initializer=w_init, bias_initializer=b_init)
+        policy = tf.nn.softmax(tf.layers.dense(actor_hidden, action_size, kernel_initializer=w_init, bias_initializer=b_init))
+        critic_hidden = tf.layers.dense(self.state, hidden, tf.nn.tanh, kernel_initializer=w_init, bias_initializer=b_init)
+        value = tf.layers.dense(critic_hidden, 1, kernel_initializer=w_init, bias_initializer=b_init)
+
+        td_error = self.q_target - value
+        log_prob = tf.reduce_sum(tf.log(policy + 1e-5) * tf.one_hot(self.action, action_size), axis=1, keep_dims=True)
+        loss = tf.reduce_mean(tf.square(td_error)) - tf.reduce_mean(log_prob * tf.stop_gradient(td_error))
+        self.train_op = tf.train.AdamOptimizer(learning_rate).minimize(loss)
+
+def run(sess, net, mode, save_dir):
+    train_fn = feed_callable(sess, net.train_op, [net.state, net.action, net.q_target])
+    saver, checkpointer = None, None
+    if mode == 'Saver.save in the loop':
+        saver = tf.train.Saver(max_to_keep=3)
+    elif mode == 'AsyncCheckpointer':
+        checkpointer = AsyncCheckpointer(sess, save_dir, checkpoint_every, keep=3)
+
+    random = np.random.RandomState(0)
+    feed_dict = {net.state: random.randn(segment_size, state_size).astype(np.float32),
+                 net.action: random.randint(action_size, size=segment_size).astype(np.int32),
+                 net.q_target: random.randn(segment_size, 1).astype(np.float32)}
+    updates, blocked, n_checkpoints = 0, 0., 0
+    start = time.perf_counter()
+    while time.perf_counter() - start < duration:
+        train_fn(feed_dict)
+        updates += 1
+        if saver is not None and updates % checkpoint_every == 0:
+            save_start = time.perf_counter()
+            saver.save(sess, save_dir + '/model.ckpt', global_step=updates, write_meta_graph=False)
+            blocked += time.perf_counter() - save_start
+            n_checkpoints += 1
+        elif checkpointer is not None:
+            checkpointer.update()
+    elapsed = time.perf_counter() - start
+
+    if checkpointer is not None:
+        checkpointer.close()
+        blocked, n_checkpoints = checkpointer.blocked_time, checkpointer.n_snapshots
+    return updates / elapsed, n_checkpoints, blocked
+
+def main():
+    for hidden in hidden_sizes:
+        tf.reset_default_graph()
+        net = Net(hidden)
+        n_params = sum(variable.get_shape().num_elements() for variable in tf.global_variables())
+        print(' hidden {:d} : {:,d} checkpointed values ({:.1f} MB)'.format(hidden, n_params, 4e-6 * n_params))
+        with tf.Session() as sess:
+            sess.run(tf.global_variables_initializer())
+            for mode in modes:
+                save_dir = tempfile.mkdtemp()
+                try:
+                    rate, n_checkpoints, blocked = run(sess, net, mode, save_dir)
+                finally:
+                    shutil.rmtree(save_dir)
+                print('   {:24s} : {:7,.0f} updates/sec / {:3d} checkpoints / blocked {:7.2f} ms per checkpoint'.format(
+                      mode, rate, n_checkpoints, 1e3 * blocked / max(n_checkpoints, 1)))
+
+if __name__ == "__main__":
+    main()
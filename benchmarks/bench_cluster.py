@@ -0,0 +1,120 @@
+import gym
+import tensorflow as tf
+import numpy as np
+import multiprocessing
+import threading
+import time
+import sys
+import os
+os.environ['TF_CPP_MIN_LOG_LEVEL'] = '2'
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from rl_common.cluster import ClusterTask, local_cluster, run_cluster
+
+# aggregate env steps/sec and master updates/sec of the distributed A3C: one ps task holds
+# the master network, 1, 2 and 4 worker tasks (localhost processes) run the rollout / n-step
+# update loop of a Worker, pushing to and pulling from the ps over gRPC; Type B CartPole network
+env_name = "CartPole-v1"
+state_size, action_size = 4, 2
+learning_rate = 0.005
+discount_factor = 0.9
+UPDATE_GLOBAL_ITER = 10
+warmup, duration = 2., 10.
+worker_counts = (1, 2, 4)
+
+class Net(object):
+    def __init__(self, scope, master = None, optimizer = None):
+        with tf.variable_scope(scope):
+            self.state = tf.placeholder(tf.float32, [None, state_size], name='state')
+            self.action = tf.placeholder(tf.int32, [None, ], name='action')
+            self.q_target = tf.placeholder(tf.float32, [None, 1], name='q_target')
+
+            w_init, b_init = tf.random_normal_initializer(.0, .3), tf.constant_initializer(0.1)
+            actor_hidden = tf.layers.dense(self.state, 64, tf.nn.tanh, kernel_initializer=w_init, bias_initializer=b_init)
+            self.policy = tf.nn.softmax(tf.layers.dense(actor_hidden, action_size, kernel_initializer=w_init,
+                                                        bias_initializer=b_init))
+            critic_hidden = tf.layers.dense(self.state, 64, tf.nn.tanh, kernel_initializer=w_init, bias_initializer=b_init)
+            self.value = tf.layers.dense(critic_hidden, 1, kernel_initializer=w_init, bias_initializer=b_init)
+        self.params = tf.get_collection(tf.GraphKeys.TRAINABLE_VARIABLES, scope=scope)
+        if master is None:
+            return
+
+        td_error = self.q_target - self.value
+        log_prob = tf.reduce_sum(tf.log(self.policy + 1e-5) * tf.one_hot(self.action, action_size), axis=1, keep_dims=True)
+        loss = tf.reduce_mean(tf.square(td_error)) - tf.reduce_mean(log_prob * tf.stop_gradient(td_error))
+        self.gradients = tf.gradients(loss, self.params)
+        self.update_op = optimizer.apply_gradients(zip(self.gradients, master.params))
+        self.pull_op = [local.assign(shared) for local, shared in zip(self.params, master.params)]
+
+# the rollout / update loop of a Worker
+def rollout(sess, net, steps, updates, index, stop):
+    push = sess.make_callable(net.update_op, [net.state, net.action, net.q_target])
+    pull = sess.make_callable(net.pull_op)
+    env = gym.make(env_name).unwrapped
+    state = env.reset()
+    buffer_state, buffer_action, buffer_reward = [], [], []
+    step = 0
+    while not stop.is_set():
+        prob = sess.run(net.policy, {net.state: state[np.newaxis, :]})[0]
+        action = np.random.choice(action_size, p=prob)
+        next_state, reward, done, _ = env.step(action)
+        buffer_state.append(state)
+        buffer_action.append(action)
+        buffer_reward.append(reward)
+        step += 1
+        if step % UPDATE_GLOBAL_ITER == 0 or done:
+            value_next_state = 0. if done else sess.run(net.value, {net.state: next_state[np.newaxis, :]})[0, 0]
+            q_target = []
+            for r in buffer_reward[::-1]:
+                value_next_state = r + discount_factor * value_next_state
+                q_target.append(value_next_state)
+            q_target.reverse()
+            push(np.vstack(buffer_state), np.array(buffer_action), np.vstack(q_target))
+            pull()
+            updates[index] += 1
+            buffer_state, buffer_action, buffer_reward = [], [], []
+        state = env.reset() if done else next_state
+        steps[index] = step
+
+def cluster_worker(cluster, index, steps, updates, ready, stop):
+    task = ClusterTask(cluster, index)
+    with tf.device(task.shared_device):
+        master = Net('master')
+        optimizer = tf.train.RMSPropOptimizer(learning_rate)
+    with tf.device(task.local_device):
+        net = Net('W_%i' % index, master, optimizer)
+    task.initialize('master', 'W_%i' % index)
+    ready[index] = 1
+    rollout(task.sess, net, steps, updates, index, stop)
+    task.finish()
+
+def bench_cluster(n_workers):
+    ctx = multiprocessing.get_context('spawn')
+    steps, updates = ctx.RawArray('q', n_workers), ctx.RawArray('q', n_workers)
+    ready, stop = ctx.RawArray('b', n_workers), ctx.Event()
+    runner = threading.Thread(target=run_cluster, args=(cluster_worker, local_cluster(n_workers), (),
+                                                        (steps, updates, ready, stop), 'spawn'))
+    runner.start()
+
+    while sum(ready) < n_workers:
+        time.sleep(0.05)
+    time.sleep(warmup)
+    start_steps, start_updates, start = sum(steps), sum(updates), time.perf_counter()
+    time.sleep(duration)
+    elapsed = time.perf_counter() - start
+    step_rate, update_rate = (sum(steps) - start_steps) / elapsed, (sum(updates) - start_updates) / elapsed
+    stop.set()
+    runner.join()
+    return step_rate, update_rate
+
+def main():
+    print(' {:d} CPU core(s)'.format(multiprocessing.cpu_count()))
+    base = None
+    for n_workers in worker_counts:
+        step_rate, update_rate = bench_cluster(n_workers)
+        base = base or step_rate
+        print(' worker tasks {:2d} : {:8,.0f} env steps/sec ({:.2f}x) / {:6,.0f} updates/sec / {:6,.0f} steps/sec per task'.format(
+              n_workers, step_rate, step_rate / base, update_rate, step_rate / n_workers))
+
+if __name__ == "__main__":
+    main()
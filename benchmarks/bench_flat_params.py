@@ -0,0 +1,96 @@
+import tensorflow as tf
+import numpy as np
+import time
+import sys
+import os
+os.environ['TF_CPP_MIN_LOG_LEVEL'] = '2'
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from rl_common.flat_params import FlatParams, dense_size, flat_params_initializer
+
+# pull (master -> local assign), push (local gradients -> RMSProp on the master) and a
+# read of all the weights, per variable against one flat variable per network,
+# Type B network (actor and critic in one "model" scope)
+state_size, action_size = 4, 2
+hidden_sizes = (64, 256)
+learning_rate = 0.001
+segment_size = 10
+n_calls = 2000
+n_rounds = 5
+
+class Net(object):
+    def __init__(self, scope, hidden, flat, master = None):
+        w_init, b_init = tf.random_normal_initializer(.0, .3), tf.constant_initializer(0.1)
+        with tf.variable_scope(scope):
+            self.state = tf.placeholder(tf.float32, [None, state_size], name='state')
+            self.action = tf.placeholder(tf.int32, [None, ], name='action')
+            self.q_target = tf.placeholder(tf.float32, [None, 1], name='q_target')
+            with tf.variable_scope("model"):
+                if flat:
+                    FlatParams(dense_size(state_size, hidden, action_size) + dense_size(state_size, hidden, 1))
+                actor_hidden = tf.layers.dense(self.state, hidden, tf.nn.tanh, kernel_initializer=w_init,
+                                               bias_initializer=b_init)
+                policy = tf.nn.softmax(tf.layers.dense(actor_hidden, action_size, kernel_initializer=w_init,
+                                                       bias_initializer=b_init))
+                critic_hidden = tf.layers.dense(self.state, hidden, tf.nn.tanh, kernel_initializer=w_init,
+                                                bias_initializer=b_init, name='fc1_c')
+                value = tf.layers.dense(critic_hidden, 1, kernel_initializer=w_init, bias_initializer=b_init,
+                                        name='fc2_c')
+        self.params = tf.get_collection(tf.GraphKeys.TRAINABLE_VARIABLES, scope=scope + '/model')
+        if master is None:
+            self.optimizer = tf.train.RMSPropOptimizer(learning_rate)
+            return
+
+        td_error = self.q_target - value
+        log_prob = tf.reduce_sum(tf.log(policy + 1e-5) * tf.one_hot(self.action, action_size), axis=1, keep_dims=True)
+        loss = tf.reduce_mean(tf.square(td_error)) - tf.reduce_mean(log_prob * tf.stop_gradient(td_error))
+        gradients = tf.gradients(loss, self.params)
+        self.push_op = master.optimizer.apply_gradients(zip(gradients, master.params))
+        self.pull_op = [local.assign(shared) for local, shared in zip(self.params, master.params)]
+
+def timeit(fn):
+    fn()
+    start = time.perf_counter()
+    for _ in range(n_calls):
+        fn()
+    return (time.perf_counter() - start) / n_calls
+
+def main():
+    random = np.random.RandomState(0)
+    feed = [random.randn(segment_size, state_size).astype(np.float32),
+            random.randint(action_size, size=segment_size).astype(np.int32),
+            random.randn(segment_size, 1).astype(np.float32)]
+
+    for hidden in hidden_sizes:
+        tf.reset_default_graph()
+        nets = {}
+        for flat in (False, True):
+            master = Net('master_%d' % flat, hidden, flat)
+            nets[flat] = (master, Net('W_%d' % flat, hidden, flat, master))
+
+        with tf.Session() as sess:
+            sess.run(tf.global_variables_initializer())
+            sess.run(flat_params_initializer())
+
+            calls = {}
+            for flat, (master, local) in nets.items():
+                calls[flat] = {
+                    'pull': sess.make_callable(local.pull_op),
+                    'push': lambda fn=sess.make_callable(local.push_op, [local.state, local.action, local.q_target]): fn(*feed),
+                    'read': sess.make_callable(master.params),
+                }
+            # interleaved rounds, best of
+            best = {(flat, name): float('inf') for flat in calls for name in calls[flat]}
+            for _ in range(n_rounds):
+                for flat in calls:
+                    for name, fn in calls[flat].items():
+                        best[flat, name] = min(best[flat, name], timeit(fn))
+
+            n_params = sum(int(np.prod(param.get_shape().as_list())) for param in nets[False][0].params)
+            print(' hidden {:3d} : {:,d} parameters in {:d} variables'.format(hidden, n_params, len(nets[False][0].params)))
+            for name in ('pull', 'push', 'read'):
+                print('   {:4s} : per variable {:7.1f} us / flat {:7.1f} us ({:.2f}x)'.format(
+                      name, 1e6 * best[False, name], 1e6 * best[True, name], best[False, name] / best[True, name]))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+import tensorflow as tf
+import numpy as np
+import threading
+import time
+import sys
+import os
+os.environ['TF_CPP_MIN_LOG_LEVEL'] = '2'
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from rl_common.callables import feed_callable
+from rl_common.grad_accumulator import GradientAccumulator
+
+# segments/sec and optimizer applies/sec of the A3C push (every worker applies RMSProp
+# to the master) against the accumulator, every K contributions and as a sync barrier,
+# random segments so only the update path is measured, Type B network
+state_size, action_size = 4, 2
+hidden = 256
+learning_rate = 0.001
+n_workers = 6
+segment_size = 10
+duration = 5.
+modes = (('direct apply', None), ('accumulate K = 2', dict(every=2)), ('accumulate K = 6', dict(every=6)),
+         ('accumulate K = 24', dict(every=24)), ('sync barrier', dict(sync=True)))
+
+class Net(object):
+    def __init__(self, scope, master = None, optimizer = None):
+        with tf.variable_scope(scope):
+            self.state = tf.placeholder(tf.float32, [None, state_size], name='state')
+            self.action = tf.placeholder(tf.int32, [None, ], name='action')
+            self.q_target = tf.placeholder(tf.float32, [None, 1], name='q_target')
+
+            w_init, b_init = tf.random_normal_initializer(.0, .3), tf.constant_initializer(0.1)
+            actor_hidden = tf.layers.dense(self.state, hidden, tf.nn.tanh, kernel_initializer=w_init, bias_initializer=b_init)
+            self.policy = tf.nn.softmax(tf.layers.dense(actor_hidden, action_size, kernel_initializer=w_init,
+                                                        bias_initializer=b_init))
+            critic_hidden = tf.layers.dense(self.state, hidden, tf.nn.tanh, kernel_initializer=w_init, bias_initializer=b_init)
+            self.value = tf.layers.dense(critic_hidden, 1, kernel_initializer=w_init, bias_initializer=b_init)
+        self.params = tf.get_collection(tf.GraphKeys.TRAINABLE_VARIABLES, scope=scope)
+        if master is None:
+            return
+
+        td_error = self.q_target - self.value
+        log_prob = tf.reduce_sum(tf.log(self.policy + 1e-5) * tf.one_hot(self.action, action_size), axis=1, keep_dims=True)
+        loss = tf.reduce_mean(tf.square(td_error)) - tf.reduce_mean(log_prob * tf.stop_gradient(td_error))
+        self.gradients = tf.gradients(loss, self.params)
+        self.update_op = optimizer.apply_gradients(zip(self.gradients, master.params))
+        self.pull_op = [local.assign(shared) for local, shared in zip(self.params, master.params)]
+
+def run_workers(workers, push_fns, pull_fns, accumulator):
+    stop = threading.Event()
+    counts = [0] * len(workers)
+
+    def work(index):
+        net, random = workers[index], np.random.RandomState(index)
+        while not stop.is_set():
+            feed_dict = {net.state: random.randn(segment_size, state_size).astype(np.float32),
+                         net.action: random.randint(action_size, size=segment_size).astype(np.int32),
+                         net.q_target: random.randn(segment_size, 1).astype(np.float32)}
+            if accumulator is not None:
+                accumulator.add(push_fns[index], feed_dict)
+            else:
+                push_fns[index](feed_dict)
+            pull_fns[index]()
+            counts[index] += 1
+        if accumulator is not None:
+            accumulator.leave()
+
+    threads = [threading.Thread(target=work, args=(index,)) for index in range(len(workers))]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    time.sleep(duration)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    return sum(counts) / (time.perf_counter() - start)
+
+def main():
+    optimizer = tf.train.RMSPropOptimizer(learning_rate)
+    master = Net('master')
+    workers = [Net('W_%i' % index, master, optimizer) for index in range(n_workers)]
+    feed_list = lambda net: [net.state, net.action, net.q_target]
+
+    accumulators = {}
+    with tf.Session() as sess:
+        for name, kwargs in modes:
+            if kwargs is not None:
+                accumulators[name] = GradientAccumulator(sess, [(optimizer, master.params)], parties=n_workers, **kwargs)
+        add_fns = {name: [feed_callable(sess, accumulator.add_op([net.gradients]), feed_list(net)) for net in workers]
+                   for name, accumulator in accumulators.items()}
+        sess.run(tf.global_variables_initializer())
+        push_fns = [feed_callable(sess, net.update_op, feed_list(net)) for net in workers]
+        pull_fns = [sess.make_callable(net.pull_op) for net in workers]
+
+        base = None
+        for name, kwargs in modes:
+            accumulator = accumulators.get(name)
+            start = time.time()
+            if accumulator is None:
+                segments = run_workers(workers, push_fns, pull_fns, None)
+                applies = segments
+            else:
+                accumulator.start_time = start
+                segments = run_workers(workers, add_fns[name], pull_fns, accumulator)
+                applies = accumulator.n_applies / (time.time() - start)
+            base = base or segments
+            print(' {:17s} : {:7,.0f} segments/sec, {:6,.0f} applies/sec ({:.2f}x)'.format(
+                  name, segments, applies, segments / base))
+            if accumulator is not None:
+                print(accumulator.report())
+
+if __name__ == "__main__":
+    main()
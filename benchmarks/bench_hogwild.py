@@ -0,0 +1,169 @@
+import gym
+import tensorflow as tf
+import numpy as np
+import multiprocessing
+import threading
+import time
+import sys
+import os
+os.environ['TF_CPP_MIN_LOG_LEVEL'] = '2'
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from rl_common.hogwild import SharedParams, SharedRMSProp, SharedAdam, HogwildClient, run_hogwild
+
+# env steps/sec of the threaded A3C (one session, master net in the graph) against
+# Hogwild worker processes, with the Type B CartPole network and n-step updates
+env_name = "CartPole-v1"
+state_size, action_size = 4, 2
+learning_rate = 0.005
+discount_factor = 0.9
+UPDATE_GLOBAL_ITER = 10
+warmup, duration = 2., 10.
+worker_counts = (1, 2, 4)
+
+class Net(object):
+    def __init__(self, scope, master = None, optimizer = None):
+        with tf.variable_scope(scope):
+            self.state = tf.placeholder(tf.float32, [None, state_size], name='state')
+            self.action = tf.placeholder(tf.int32, [None, ], name='action')
+            self.q_target = tf.placeholder(tf.float32, [None, 1], name='q_target')
+
+            w_init, b_init = tf.random_normal_initializer(.0, .3), tf.constant_initializer(0.1)
+            actor_hidden = tf.layers.dense(self.state, 64, tf.nn.tanh, kernel_initializer=w_init, bias_initializer=b_init)
+            self.policy = tf.nn.softmax(tf.layers.dense(actor_hidden, action_size, kernel_initializer=w_init,
+                                                        bias_initializer=b_init))
+            critic_hidden = tf.layers.dense(self.state, 64, tf.nn.tanh, kernel_initializer=w_init, bias_initializer=b_init)
+            self.value = tf.layers.dense(critic_hidden, 1, kernel_initializer=w_init, bias_initializer=b_init)
+        self.params = tf.get_collection(tf.GraphKeys.TRAINABLE_VARIABLES, scope=scope)
+        if master is None:
+            return
+
+        td_error = self.q_target - self.value
+        log_prob = tf.reduce_sum(tf.log(self.policy + 1e-5) * tf.one_hot(self.action, action_size), axis=1, keep_dims=True)
+        loss = tf.reduce_mean(tf.square(td_error)) - tf.reduce_mean(log_prob * tf.stop_gradient(td_error))
+        self.gradients = tf.gradients(loss, self.params)
+        if optimizer is not None:
+            self.update_op = optimizer.apply_gradients(zip(self.gradients, master.params))
+            self.pull_op = [local.assign(shared) for local, shared in zip(self.params, master.params)]
+
+# the rollout / update loop of a Worker, push and pull are the only difference between the modes
+def rollout(sess, net, push, pull, steps, index, stop):
+    env = gym.make(env_name).unwrapped
+    state = env.reset()
+    buffer_state, buffer_action, buffer_reward = [], [], []
+    step = 0
+    while not stop.is_set():
+        prob = sess.run(net.policy, {net.state: state[np.newaxis, :]})[0]
+        action = np.random.choice(action_size, p=prob)
+        next_state, reward, done, _ = env.step(action)
+        buffer_state.append(state)
+        buffer_action.append(action)
+        buffer_reward.append(reward)
+        step += 1
+        if step % UPDATE_GLOBAL_ITER == 0 or done:
+            value_next_state = 0. if done else sess.run(net.value, {net.state: next_state[np.newaxis, :]})[0, 0]
+            q_target = []
+            for r in buffer_reward[::-1]:
+                value_next_state = r + discount_factor * value_next_state
+                q_target.append(value_next_state)
+            q_target.reverse()
+            push({net.state: np.vstack(buffer_state), net.action: np.array(buffer_action),
+                  net.q_target: np.vstack(q_target)})
+            pull()
+            buffer_state, buffer_action, buffer_reward = [], [], []
+        state = env.reset() if done else next_state
+        steps[index] = step
+
+def measure(steps, ready, n_workers, stop):
+    while sum(ready[:n_workers]) < n_workers:
+        time.sleep(0.05)
+    time.sleep(warmup)
+    start_steps, start = sum(steps[:n_workers]), time.perf_counter()
+    time.sleep(duration)
+    rate = (sum(steps[:n_workers]) - start_steps) / (time.perf_counter() - start)
+    stop.set()
+    return rate
+
+def bench_threads(n_workers):
+    tf.reset_default_graph()
+    sess = tf.Session()
+    master = Net('master')
+    optimizer = tf.train.RMSPropOptimizer(learning_rate)
+    nets = [Net('W_%i' % index, master, optimizer) for index in range(n_workers)]
+    sess.run(tf.global_variables_initializer())
+
+    steps, ready, stop = [0] * n_workers, [1] * n_workers, threading.Event()
+    threads = [threading.Thread(target=rollout, args=(sess, net,
+                                                      lambda feed, net=net: sess.run(net.update_op, feed),
+                                                      lambda net=net: sess.run(net.pull_op),
+                                                      steps, index, stop))
+               for index, net in enumerate(nets)]
+    for thread in threads:
+        thread.start()
+    rate = measure(steps, ready, n_workers, stop)
+    for thread in threads:
+        thread.join()
+    sess.close()
+    return rate
+
+def process_worker(index, shared_params, steps, ready, stop):
+    # one op thread per process, the parallelism comes from the processes
+    sess = tf.Session(config=tf.ConfigProto(intra_op_parallelism_threads=1, inter_op_parallelism_threads=1))
+    master = Net('master')
+    net = Net('W_%i' % index, master)
+    sess.run(tf.global_variables_initializer())
+    client = HogwildClient(sess, [net.params], [net.gradients], shared_params)
+    client.pull()
+    ready[index] = 1
+    rollout(sess, net, client.push, client.pull, steps, index, stop)
+
+def bench_processes(n_workers):
+    tf.reset_default_graph()
+    with tf.Session() as sess:
+        master = Net('master')
+        sess.run(tf.global_variables_initializer())
+        shared_params = [SharedParams(sess.run(master.params), SharedRMSProp(learning_rate))]
+
+    ctx = multiprocessing.get_context('spawn')
+    steps, ready, stop = ctx.RawArray('q', n_workers), ctx.RawArray('b', n_workers), ctx.Event()
+    runner = threading.Thread(target=run_hogwild, args=(process_worker, n_workers,
+                                                        (shared_params, steps, ready, stop), 'spawn'))
+    runner.start()
+    rate = measure(steps, ready, n_workers, stop)
+    runner.join()
+    return rate, shared_params[0].t
+
+# the NumPy optimizers against tf.train on the same gradient sequence
+def check_optimizers():
+    random = np.random.RandomState(0)
+    values = [random.randn(4, 3).astype(np.float32), random.randn(3).astype(np.float32)]
+    grads = [[random.randn(*v.shape).astype(np.float32) for v in values] for _ in range(50)]
+    for tf_optimizer, shared_optimizer in ((tf.train.RMSPropOptimizer, SharedRMSProp), (tf.train.AdamOptimizer, SharedAdam)):
+        tf.reset_default_graph()
+        variables = [tf.Variable(v) for v in values]
+        placeholders = [tf.placeholder(tf.float32, v.shape) for v in values]
+        apply_op = tf_optimizer(learning_rate).apply_gradients(zip(placeholders, variables))
+        shared = SharedParams(values, shared_optimizer(learning_rate))
+        with tf.Session() as sess:
+            sess.run(tf.global_variables_initializer())
+            for grad in grads:
+                sess.run(apply_op, dict(zip(placeholders, grad)))
+                shared.apply_gradients(grad)
+            expected = sess.run(variables)
+        max_diff = max(np.abs(e - p).max() for e, p in zip(expected, shared.params))
+        if max_diff > 1e-5:
+            raise AssertionError('%s differs from %s (%.2e)' % (shared_optimizer.__name__, tf_optimizer.__name__, max_diff))
+        print(' {:14s} matches {:22s} after {:d} steps, max diff {:.1e}'.format(
+              shared_optimizer.__name__, tf_optimizer.__name__, len(grads), max_diff))
+
+def main():
+    check_optimizers()
+    print(' {:d} CPU core(s)'.format(multiprocessing.cpu_count()))
+    for n_workers in worker_counts:
+        thread_rate = bench_threads(n_workers)
+        process_rate, n_updates = bench_processes(n_workers)
+        print(' workers {:2d} : threads {:8,.0f} steps/sec / hogwild processes {:8,.0f} steps/sec ({:.2f}x), {:,d} shared updates'.format(
+              n_workers, thread_rate, process_rate, process_rate / thread_rate, n_updates))
+
+if __name__ == "__main__":
+    main()
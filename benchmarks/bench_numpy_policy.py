@@ -0,0 +1,65 @@
+import tensorflow as tf
+import numpy as np
+import time
+import sys
+import os
+os.environ['TF_CPP_MIN_LOG_LEVEL'] = '2'
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from rl_common.numpy_policy import NumpyPolicy
+
+# per-step act latency: sess.run(policy) against the NumPy snapshot
+state_size = 4
+action_size = 2
+hidden1 = 64
+n_calls = 5000
+
+def build_model(state):
+    w_init, b_init = tf.random_normal_initializer(.0, .3), tf.constant_initializer(0.1)
+
+    with tf.variable_scope("actor"):
+        actor_hidden = tf.layers.dense(state, hidden1, tf.nn.tanh, kernel_initializer=w_init,
+                                       bias_initializer=b_init)
+        actor_predict = tf.layers.dense(actor_hidden, action_size, kernel_initializer=w_init,
+                                        bias_initializer=b_init)
+        policy = tf.nn.softmax(actor_predict)
+
+    with tf.variable_scope("critic"):
+        critic_hidden = tf.layers.dense(state, hidden1, tf.nn.tanh, kernel_initializer=w_init,
+                                        bias_initializer=b_init, name='fc1_c')
+        value = tf.layers.dense(critic_hidden, 1, kernel_initializer=w_init,
+                                bias_initializer=b_init, name='fc2_c')
+    return policy, value
+
+def timeit(fn, n):
+    fn()
+    start = time.perf_counter()
+    for _ in range(n):
+        fn()
+    return (time.perf_counter() - start) / n
+
+def main():
+    state = tf.placeholder(tf.float32, [None, state_size], name='state')
+    policy, value = build_model(state)
+
+    with tf.Session() as sess:
+        sess.run(tf.global_variables_initializer())
+        numpy_policy = NumpyPolicy(sess,
+                                   tf.get_collection(tf.GraphKeys.TRAINABLE_VARIABLES, scope='actor'),
+                                   tf.get_collection(tf.GraphKeys.TRAINABLE_VARIABLES, scope='critic'))
+        numpy_policy.sync()
+
+        state_t = np.random.randn(1, state_size).astype(np.float32)
+        diff = np.abs(sess.run(policy, {state: state_t}) - numpy_policy.policy(state_t)).max()
+        print(' max |p_tf - p_np| : {:.2e}'.format(diff))
+
+        t_tf = timeit(lambda: sess.run(policy, feed_dict={state: state_t}), n_calls)
+        t_np = timeit(lambda: numpy_policy.policy(state_t), n_calls)
+        t_sync = timeit(numpy_policy.sync, 500)
+
+        print(' sess.run(policy) : {:8.1f} us / step'.format(1e6 * t_tf))
+        print(' numpy policy     : {:8.1f} us / step ({:.1f}x)'.format(1e6 * t_np, t_tf / t_np))
+        print(' numpy sync       : {:8.1f} us / weight change'.format(1e6 * t_sync))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,152 @@
+import gym
+import tensorflow as tf
+import numpy as np
+import tempfile
+import shutil
+import time
+import sys
+import os
+os.environ['TF_CPP_MIN_LOG_LEVEL'] = '2'
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from rl_common.callables import feed_callable
+from rl_common.numpy_policy import NumpyPolicy
+from rl_common.offline_pretrain import TrajectoryDataset, OfflinePretrainer
+from rl_common.returns import bootstrap_returns
+from rl_common.rollout_buffer import RolloutBuffer
+from rl_common.trajectory_recorder import TrajectoryWriter
+
+# wall-clock to threshold on MountainCar with and without the warm start: the online loop of the
+# Type B 04_ script (unwrapped env, ep_trial_step 10000, one update per 10 steps, RMSProp) until the
+# average length of the last 30 episodes is at most 200 steps, from fresh networks and from
+# networks pretrained on recorded trajectories (the time of the returns pass and of the
+# pretraining counted); the trajectories are N_DEMOS episodes of a pushing-with-the-velocity
+# controller with EPSILON random actions, recorded with TrajectoryWriter in small chunks so the
+# dataset streams through a shuffle window of a few of them
+env_name = 'MountainCar-v0'
+state_size, action_size = 2, 3
+learning_rate = 0.001
+discount_factor = 0.99
+ep_trial_step = 10000
+N_DEMOS = 40
+EPSILON = 0.2
+CHUNK_SIZE = 1024
+PRETRAIN_EPOCHS = 200
+PRETRAIN_LEARNING_RATE = 0.01
+MAX_SECONDS = float(sys.argv[1]) if len(sys.argv) > 1 else 300.
+modes = ('cold start', 'warm start (actor)', 'warm start (actor + critic)')
+
+def record_demonstrations(save_dir, random):
+    env = gym.make(env_name).unwrapped
+    env.seed(0)
+    writer = TrajectoryWriter(save_dir)
+    recorder = writer.recorder('demo', state_size, CHUNK_SIZE)
+    lengths = []
+    for _ in range(N_DEMOS):
+        state, done, ep_step = env.reset(), False, 0
+        while not done and ep_step < ep_trial_step:
+            ep_step += 1
+            action = 2 if state[1] >= 0 else 0
+            if random.rand() < EPSILON:
+                action = random.randint(action_size)
+            next_state, reward, done, _ = env.step(action)
+            recorder.append(state, action, reward, done, ep_step == ep_trial_step)
+            state = next_state
+        lengths.append(ep_step)
+    writer.close()
+    return writer, lengths
+
+class Agent(object):
+    def __init__(self, sess):
+        self.sess = sess
+        self.state = tf.placeholder(tf.float32, [None, state_size], name='state')
+        self.action = tf.placeholder(tf.int32, [None, ], name='action')
+        self.q_target = tf.placeholder(tf.float32, [None, 1], name='q_target')
+        w_init, b_init = tf.random_normal_initializer(.0, .3), tf.constant_initializer(0.1)
+        with tf.variable_scope('model'):
+            actor_hidden = tf.layers.dense(self.state, 64, tf.nn.tanh, kernel_initializer=w_init, bias_initializer=b_init)
+            actor_predict = tf.layers.dense(actor_hidden, action_size, kernel_initializer=w_init, bias_initializer=b_init)
+            self.policy = tf.nn.softmax(actor_predict)
+            critic_hidden = tf.layers.dense(self.state, 64, tf.nn.tanh, kernel_initializer=w_init, bias_initializer=b_init,
+                                            name='fc1_c')
+            self.value = tf.layers.dense(critic_hidden, 1, kernel_initializer=w_init, bias_initializer=b_init,
+                                         name='fc2_c')
+        self.mlp_params = (tf.get_collection(tf.GraphKeys.TRAINABLE_VARIABLES, scope='model/dense'),
+                           tf.get_collection(tf.GraphKeys.TRAINABLE_VARIABLES, scope='model/fc'))
+
+        td_error = self.q_target - self.value
+        log_prob = tf.reduce_sum(tf.log(self.policy + 1e-5) * tf.one_hot(self.action, action_size), axis=1, keep_dims=True)
+        entropy = -tf.reduce_sum(self.policy * tf.log(self.policy + 1e-5), axis=1, keep_dims=True)
+        loss = tf.reduce_mean(tf.square(td_error)) - tf.reduce_mean(0.001 * entropy + log_prob * tf.stop_gradient(td_error))
+        self.train_fn = feed_callable(sess, tf.train.RMSPropOptimizer(learning_rate).minimize(loss),
+                                      [self.state, self.action, self.q_target])
+        self.numpy_policy = NumpyPolicy(sess, *self.mlp_params)
+        self.random = np.random.RandomState(0)
+
+    def train(self, buffer, next_state, done):
+        value_next_state = 0 if done else self.numpy_policy.value(next_state[np.newaxis, :])[0, 0]
+        q_target = bootstrap_returns(buffer.rewards, discount_factor, value_next_state)
+        self.train_fn({self.state: buffer.states, self.action: buffer.actions, self.q_target: q_target})
+        self.numpy_policy.sync()
+        buffer.clear()
+
+# seconds to the threshold (None when not reached), episodes, steps, pretraining seconds
+def run(mode, data_dir):
+    tf.reset_default_graph()
+    tf.set_random_seed(0)
+    np.random.seed(0)
+    sess = tf.Session(config=tf.ConfigProto(intra_op_parallelism_threads=1, inter_op_parallelism_threads=1))
+    agent = Agent(sess)
+    start = time.time()
+    sess.run(tf.global_variables_initializer())
+
+    pretrain_time, pretrainer = 0., None
+    if mode != 'cold start':
+        critic = mode.endswith('critic)')
+        pretrainer = OfflinePretrainer(sess, agent.state, agent.policy, agent.value,
+                                       agent.mlp_params[0] + agent.mlp_params[1], PRETRAIN_LEARNING_RATE, critic)
+        pretrainer.run(TrajectoryDataset(data_dir, discount_factor, -1000.), PRETRAIN_EPOCHS, 256, None, 2,
+                       np.random.RandomState(0))
+        pretrain_time = time.time() - start
+    agent.numpy_policy.sync()
+
+    env = gym.make(env_name).unwrapped
+    env.seed(1)
+    buffer = RolloutBuffer(10, state_size)
+    scores, step = [], 0
+    while time.time() - start < MAX_SECONDS:
+        state, done, ep_step = env.reset(), False, 0
+        while not done and ep_step < ep_trial_step and time.time() - start < MAX_SECONDS:
+            ep_step += 1
+            step += 1
+            action = int(agent.numpy_policy.sample(state[np.newaxis, :], agent.random)[0][0])
+            next_state, reward, done, _ = env.step(action)
+            buffer.append(state, action, reward)
+            if step % 10 == 0 or done:
+                agent.train(buffer, next_state, done)
+            state = next_state
+        scores.append(ep_step)
+        if len(scores) >= 30 and np.mean(scores[-30:]) <= 200:
+            return time.time() - start, len(scores), step, pretrain_time, pretrainer
+    return None, len(scores), step, pretrain_time, pretrainer
+
+def main():
+    data_dir = tempfile.mkdtemp()
+    try:
+        writer, lengths = record_demonstrations(data_dir, np.random.RandomState(0))
+        print(' demonstrations : {:d} episodes, {:.0f} steps on average'.format(len(lengths), np.mean(lengths)))
+        print(writer.report())
+        print(' budget {:.0f} s, threshold: last 30 episodes average at most 200 steps'.format(MAX_SECONDS))
+        print(' {:>28s} | {:>16s} {:>9s} {:>10s} | {:>9s}'.format('mode', 'to threshold', 'episodes', 'steps', 'pretrain'))
+        for mode in modes:
+            seconds, n_episodes, n_steps, pretrain_time, pretrainer = run(mode, data_dir)
+            print(' {:>28s} | {:>16s} {:9,d} {:10,d} | {:7.1f} s'.format(
+                  mode, '{:,.1f} s'.format(seconds) if seconds is not None else 'not in %.0f s' % MAX_SECONDS,
+                  n_episodes, n_steps, pretrain_time))
+            if pretrainer is not None:
+                print(pretrainer.report())
+    finally:
+        shutil.rmtree(data_dir)
+
+if __name__ == "__main__":
+    main()
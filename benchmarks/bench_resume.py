@@ -0,0 +1,105 @@
+import tensorflow as tf
+import numpy as np
+import subprocess
+import tempfile
+import shutil
+import time
+import sys
+import os
+os.environ['TF_CPP_MIN_LOG_LEVEL'] = '2'
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from rl_common.param_sync import ParamsVersion, VersionedPull
+from rl_common.resume import Resume, run_state, save_run_state
+from rl_common.run_stats import RunStats
+
+# resume latency of an A3C run, from the built graph to the master restored and every local
+# network holding the master weights: the plain way (run the initializers, restore every
+# variable of the checkpoint, one pull per local network) and Resume (restore the shared
+# variables, one grouped pull instead of the locals' initializers, the run state); a fresh
+# start (initializers only, the locals are not synced) for reference. Checkpoint of the master,
+# its RMSProp slots and N_WORKERS locals, Type B CartPole network, every run a fresh process
+# (the first call of an op is most of the cost)
+state_size, action_size = 4, 2
+hidden_sizes = (64, 1024)
+worker_counts = (4, 16, 32)
+learning_rate = 0.005
+modes = ('fresh start', 'init + restore + pulls', 'Resume')
+
+class Net(object):
+    def __init__(self, scope, hidden, master = None, optimizer = None):
+        with tf.variable_scope(scope):
+            self.state = tf.placeholder(tf.float32, [None, state_size], name='state')
+            self.q_target = tf.placeholder(tf.float32, [None, 1], name='q_target')
+            w_init, b_init = tf.random_normal_initializer(.0, .3), tf.constant_initializer(0.1)
+            actor_hidden = tf.layers.dense(self.state, hidden, tf.nn.tanh, kernel_initializer=w_init, bias_initializer=b_init)
+            self.logits = tf.layers.dense(actor_hidden, action_size, kernel_initializer=w_init, bias_initializer=b_init)
+            critic_hidden = tf.layers.dense(self.state, hidden, tf.nn.tanh, kernel_initializer=w_init, bias_initializer=b_init)
+            self.value = tf.layers.dense(critic_hidden, 1, kernel_initializer=w_init, bias_initializer=b_init)
+        self.params = tf.get_collection(tf.GraphKeys.TRAINABLE_VARIABLES, scope=scope)
+        self.version = ParamsVersion()
+        self.random = np.random.RandomState(0)
+        if master is not None:
+            loss = tf.reduce_mean(tf.square(self.q_target - self.value)) + tf.reduce_mean(self.logits)
+            optimizer.apply_gradients(zip(tf.gradients(loss, self.params), master.params))
+            self.versioned_pull = VersionedPull(sess, self.params, master.params, master.version)
+
+class Worker(object):
+    def __init__(self, name, agent):
+        self.name = name
+        self.agent = agent
+        self.steps = 1000
+        self.episodes = 10
+
+# one configuration, in this process: milliseconds, or the checkpoint size in MB for 'save'
+def measure(mode, hidden, n_workers, save_dir):
+    global sess
+    sess = tf.Session(config=tf.ConfigProto(intra_op_parallelism_threads=1, inter_op_parallelism_threads=1))
+    optimizer = tf.train.RMSPropOptimizer(learning_rate)
+    master = Net('master', hidden)
+    workers = [Worker('W_%i' % index, Net('W_%i' % index, hidden, master, optimizer)) for index in range(n_workers)]
+    agents = [worker.agent for worker in workers]
+    run_stats = RunStats()
+    run_stats.workers = workers
+
+    if mode == 'save':
+        sess.run(tf.global_variables_initializer())
+        tf.train.Saver().save(sess, save_dir + '/model.ckpt')
+        save_run_state(save_dir, run_state(run_stats, workers))
+        return sum(os.path.getsize(os.path.join(save_dir, name)) for name in os.listdir(save_dir)) / 1e6
+
+    path = tf.train.latest_checkpoint(save_dir)
+    start = time.perf_counter()
+    if mode == 'fresh start':
+        sess.run(tf.global_variables_initializer())
+    elif mode == 'init + restore + pulls':
+        sess.run(tf.global_variables_initializer())
+        tf.train.Saver().restore(sess, path)
+        for agent in agents:
+            agent.versioned_pull.pull()
+    else:
+        Resume(sess, path, agents).apply(run_stats, workers)
+    return 1e3 * (time.perf_counter() - start)
+
+def main():
+    if len(sys.argv) == 5:
+        print('%f' % measure(sys.argv[1], int(sys.argv[2]), int(sys.argv[3]), sys.argv[4]))
+        return
+
+    run = lambda *args: float(subprocess.check_output([sys.executable, os.path.abspath(__file__)] +
+                                                      [str(arg) for arg in args]).split()[-1])
+    print(' {:>6s} {:>9s} {:>10s} | '.format('hidden', 'N_WORKERS', 'checkpoint') +
+          ' | '.join('{:>22s}'.format(mode) for mode in modes))
+    for hidden in hidden_sizes:
+        for n_workers in worker_counts:
+            save_dir = tempfile.mkdtemp()
+            try:
+                size = run('save', hidden, n_workers, save_dir)
+                latencies = [run(mode, hidden, n_workers, save_dir) for mode in modes]
+            finally:
+                shutil.rmtree(save_dir)
+            print(' {:6d} {:9d} {:7.1f} MB | '.format(hidden, n_workers, size) +
+                  ' | '.join('{:19.1f} ms'.format(latency) for latency in latencies))
+
+if __name__ == "__main__":
+    main()
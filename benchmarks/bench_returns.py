@@ -0,0 +1,90 @@
+import numpy as np
+import time
+import sys
+import os
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from rl_common.returns import discount_cumsum, bootstrap_returns, normalize
+
+# the per element Python loops of the scripts against rl_common.returns
+discount_factor = 0.99
+repeat = 20
+
+# discount_and_norm_rewards of the PG / Type A scripts
+def loop_discount_and_norm(buffer_reward):
+    buffer_reward = np.vstack(buffer_reward)
+    discounted_rewards = np.zeros_like(buffer_reward)
+    running_add = 0
+    for index in reversed(range(0, len(buffer_reward))):
+        running_add = running_add * discount_factor + buffer_reward[index]
+        discounted_rewards[index] = running_add
+    discounted_rewards -= np.mean(discounted_rewards)
+    discounted_rewards /= np.std(discounted_rewards)
+    return discounted_rewards
+
+def vec_discount_and_norm(buffer_reward):
+    buffer_reward = np.array(buffer_reward)[:, np.newaxis]
+    discounted_rewards = discount_cumsum(np.ravel(buffer_reward), discount_factor)
+    return normalize(np.reshape(discounted_rewards, np.shape(buffer_reward)))
+
+# the reverse buffer loop of the Type B / C train_model, including the np.vstack of the feed
+def loop_bootstrap(buffer_reward, value_next_state):
+    buffer_q_target = []
+    for reward in buffer_reward[::-1]:
+        value_next_state = reward + discount_factor * value_next_state
+        buffer_q_target.append(value_next_state)
+    buffer_q_target.reverse()
+    return np.vstack(buffer_q_target)
+
+def vec_bootstrap(buffer_reward, value_next_state):
+    return bootstrap_returns(buffer_reward, discount_factor, value_next_state)
+
+# batched [N, T] with done masks, one reference loop per row
+def loop_batched(rewards, last_values, dones):
+    returns = np.zeros_like(rewards)
+    for n in range(rewards.shape[0]):
+        running_add = last_values[n]
+        for t in reversed(range(rewards.shape[1])):
+            running_add = rewards[n, t] + discount_factor * (1 - dones[n, t]) * running_add
+            returns[n, t] = running_add
+    return returns
+
+def vec_batched(rewards, last_values, dones):
+    return discount_cumsum(rewards, discount_factor, last_values, dones)
+
+def timeit(fn, *args):
+    fn(*args)
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn(*args)
+    return (time.perf_counter() - start) / repeat
+
+def compare(name, loop_fn, vec_fn, *args):
+    expected, result = loop_fn(*args), vec_fn(*args)
+    max_diff = np.abs(expected - result).max() / max(np.abs(expected).max(), 1.)
+    if max_diff > 1e-9:
+        raise AssertionError('%s: vectorized returns differ (rel diff %.2e)' % (name, max_diff))
+    loop_time, vec_time = timeit(loop_fn, *args), timeit(vec_fn, *args)
+    print(' {:32s} : loop {:9.3f} ms / vec {:8.3f} ms ({:6.1f}x), rel diff {:.1e}'.format(
+          name, loop_time * 1e3, vec_time * 1e3, loop_time / vec_time, max_diff))
+
+def main():
+    random = np.random.RandomState(0)
+    # rewards come from gym as Python floats
+    for length in (10, 200, 1000, 10000):
+        buffer_reward = [float(r) for r in random.choice([-1., 0., 1.], size=length)]
+        compare('discount_and_norm T=%d' % length, loop_discount_and_norm, vec_discount_and_norm, buffer_reward)
+        compare('bootstrap T=%d' % length, loop_bootstrap, vec_bootstrap, buffer_reward, 0.5)
+    for n, length in ((16, 5), (16, 128), (256, 128)):
+        rewards = random.randn(n, length)
+        dones = random.rand(n, length) < 0.05
+        compare('batched N=%d T=%d' % (n, length), loop_batched, vec_batched,
+                rewards, random.randn(n), dones)
+
+    # constant rewards: the old normalization divides by a zero std
+    with np.errstate(invalid='ignore'):
+        print(' one step episode                 : loop %s / vec %s' % (
+              loop_discount_and_norm([1.]).ravel(), vec_discount_and_norm([1.]).ravel()))
+
+if __name__ == "__main__":
+    main()
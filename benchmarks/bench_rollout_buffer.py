@@ -0,0 +1,58 @@
+import numpy as np
+import time
+import tracemalloc
+import sys
+import os
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from rl_common.rollout_buffer import RolloutBuffer
+
+# one 10000 step MountainCar episode: the old list buffers with a one hot array
+# per step and np.vstack at update time, against RolloutBuffer
+ep_trial_step = 10000
+state_size, action_size = 2, 3
+repeat = 5
+
+def list_buffers(states, actions, rewards):
+    buffer_state, buffer_action, buffer_reward = [], [], []
+    for state, action, reward in zip(states, actions, rewards):
+        action_array = np.zeros(action_size)
+        action_array[action] = 1
+        buffer_state.append(state)
+        buffer_action.append(action_array)
+        buffer_reward.append(reward)
+    return np.vstack(buffer_state), np.vstack(buffer_action), np.vstack(buffer_reward)
+
+buffer = RolloutBuffer(ep_trial_step, state_size)
+
+def rollout_buffer(states, actions, rewards):
+    buffer.clear()
+    for state, action, reward in zip(states, actions, rewards):
+        buffer.append(state, action, reward)
+    return buffer.states, buffer.actions, buffer.rewards[:, np.newaxis]
+
+def main():
+    random = np.random.RandomState(0)
+    # what the env hands back: float64 arrays, int actions, float rewards
+    states = [random.uniform(-1, 1, size=state_size) for _ in range(ep_trial_step)]
+    actions = [int(a) for a in random.randint(action_size, size=ep_trial_step)]
+    rewards = [-1.] * ep_trial_step
+
+    for fn in (list_buffers, rollout_buffer):
+        fn(states, actions, rewards)
+        start = time.perf_counter()
+        for _ in range(repeat):
+            fn(states, actions, rewards)
+        elapsed = (time.perf_counter() - start) / repeat
+
+        tracemalloc.start()
+        result = fn(states, actions, rewards)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+        print(' {:15s} : {:7.2f} ms / episode, {:6.2f} us / step, peak {:8.1f} KB, feed {}'.format(
+              fn.__name__, elapsed * 1e3, elapsed / ep_trial_step * 1e6, peak / 1024.,
+              ' '.join('%s%s' % (a.dtype, list(a.shape)) for a in result)))
+
+if __name__ == "__main__":
+    main()
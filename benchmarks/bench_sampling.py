@@ -0,0 +1,79 @@
+import tensorflow as tf
+import numpy as np
+import time
+import sys
+import os
+os.environ['TF_CPP_MIN_LOG_LEVEL'] = '2'
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from rl_common.numpy_policy import NumpyPolicy
+from rl_common.sampling import sample_action
+
+# action selection per step: the probability vector + np.random.choice against the
+# in-graph sample op and NumpyPolicy.sample, for one state and for a batch of states
+state_size = 4
+action_size = 3
+hidden1 = 64
+batch_size = 16
+n_calls = 3000
+n_draws = 100000
+
+def build_model(state):
+    w_init, b_init = tf.random_normal_initializer(.0, .3), tf.constant_initializer(0.1)
+    with tf.variable_scope("actor"):
+        actor_hidden = tf.layers.dense(state, hidden1, tf.nn.tanh, kernel_initializer=w_init,
+                                       bias_initializer=b_init)
+        actor_predict = tf.layers.dense(actor_hidden, action_size, kernel_initializer=w_init,
+                                        bias_initializer=b_init)
+    return actor_predict, tf.nn.softmax(actor_predict)
+
+def timeit(fn, n):
+    fn()
+    start = time.perf_counter()
+    for _ in range(n):
+        fn()
+    return (time.perf_counter() - start) / n
+
+def choice(prob_weights):
+    return [np.random.choice(np.arange(action_size), p=p) for p in prob_weights]
+
+# the empirical action frequencies of every sampler must match the softmax
+def check_distribution(sess, state, policy, sampled_action, numpy_policy, random):
+    state_t = np.random.RandomState(0).randn(1, state_size).astype(np.float32)
+    prob = sess.run(policy, {state: state_t})[0]
+    states = np.repeat(state_t, n_draws, axis=0)
+    for name, actions in (('graph op', sess.run(sampled_action, {state: states})),
+                          ('numpy sample', numpy_policy.sample(states, random)[0])):
+        freq = np.bincount(actions, minlength=action_size) / float(n_draws)
+        diff = np.abs(freq - prob).max()
+        if diff > 0.01:
+            raise AssertionError('%s frequencies %s differ from %s' % (name, freq, prob))
+        print(' {:12s} : frequencies {} / softmax {}, max diff {:.4f}'.format(
+              name, np.round(freq, 3), np.round(prob, 3), diff))
+
+def main():
+    state = tf.placeholder(tf.float32, [None, state_size], name='state')
+    logits, policy = build_model(state)
+    sampled_action, greedy_action = sample_action(logits, seed=1)
+
+    with tf.Session() as sess:
+        sess.run(tf.global_variables_initializer())
+        numpy_policy = NumpyPolicy(sess, tf.get_collection(tf.GraphKeys.TRAINABLE_VARIABLES, scope='actor'))
+        random = np.random.RandomState(1)
+        check_distribution(sess, state, policy, sampled_action, numpy_policy, random)
+
+        policy_fn = sess.make_callable(policy, [state])
+        act_fn = sess.make_callable(sampled_action, [state])
+        for n_rows in (1, batch_size):
+            states = np.random.randn(n_rows, state_size).astype(np.float32)
+            t_choice = timeit(lambda: choice(policy_fn(states)), n_calls)
+            t_graph = timeit(lambda: act_fn(states), n_calls)
+            t_np_choice = timeit(lambda: choice(numpy_policy.policy(states)), n_calls)
+            t_np = timeit(lambda: numpy_policy.sample(states, random), n_calls)
+            print(' {:2d} state(s) : policy + np.random.choice {:7.1f} us / in-graph sample {:7.1f} us ({:.2f}x)'.format(
+                  n_rows, 1e6 * t_choice, 1e6 * t_graph, t_choice / t_graph))
+            print('              numpy policy + choice     {:7.1f} us / numpy sample    {:7.1f} us ({:.2f}x)'.format(
+                  1e6 * t_np_choice, 1e6 * t_np, t_np_choice / t_np))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+import tensorflow as tf
+import numpy as np
+import resource
+import subprocess
+import time
+import sys
+import os
+os.environ['TF_CPP_MIN_LOG_LEVEL'] = '2'
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from rl_common.callables import feed_callable
+from rl_common.param_sync import ParamsVersion, VersionedPull
+from rl_common.sampling import sample_action, action_log_prob
+from rl_common.shared_template import TemplateWeights, graph_attrs
+
+# graph ops, build time (graph, session, init and the compiled handles of every worker) and
+# peak resident memory after one act / push / pull per worker, against N_WORKERS: every local
+# network built in its own scope, and the locals after W_0 as views of it; each run is a
+# fresh process, Type B CartPole network
+state_size, action_size = 4, 2
+hidden = 64
+learning_rate = 0.005
+worker_counts = (1, 2, 4, 8, 16, 32)
+modes = ('own scope', 'shared template')
+
+class Net(object):
+    def __init__(self, scope, master = None, optimizer = None, template = None):
+        self.template_weights = None
+        if template is not None:
+            self.__dict__.update(graph_attrs(template))
+            self.template_weights = TemplateWeights(sess, self.params, master.params, master.version)
+        else:
+            with tf.variable_scope(scope):
+                self.state = tf.placeholder(tf.float32, [None, state_size], name='state')
+                self.action = tf.placeholder(tf.int32, [None, ], name='action')
+                self.q_target = tf.placeholder(tf.float32, [None, 1], name='q_target')
+
+                w_init, b_init = tf.random_normal_initializer(.0, .3), tf.constant_initializer(0.1)
+                actor_hidden = tf.layers.dense(self.state, hidden, tf.nn.tanh, kernel_initializer=w_init, bias_initializer=b_init)
+                self.logits = tf.layers.dense(actor_hidden, action_size, kernel_initializer=w_init, bias_initializer=b_init)
+                critic_hidden = tf.layers.dense(self.state, hidden, tf.nn.tanh, kernel_initializer=w_init, bias_initializer=b_init)
+                self.value = tf.layers.dense(critic_hidden, 1, kernel_initializer=w_init, bias_initializer=b_init)
+            self.params = tf.get_collection(tf.GraphKeys.TRAINABLE_VARIABLES, scope=scope)
+        self.version = ParamsVersion() if master is None else None
+        if master is None:
+            return
+
+        if template is None:
+            td_error = self.q_target - self.value
+            log_prob = action_log_prob(self.logits, self.action)[:, None]
+            loss = tf.reduce_mean(tf.square(td_error)) - tf.reduce_mean(log_prob * tf.stop_gradient(td_error))
+            self.gradients = tf.gradients(loss, self.params)
+            self.update_op = optimizer.apply_gradients(zip(self.gradients, master.params))
+            self.sampled_action = sample_action(self.logits)[0]
+
+        session = sess if template is None else self.template_weights
+        self.act_fn = session.make_callable([self.sampled_action, self.value], [self.state])
+        self.push_fn = feed_callable(session, self.update_op, [self.state, self.action, self.q_target])
+        if template is not None:
+            self.pull = self.template_weights
+        else:
+            self.pull = VersionedPull(sess, self.params, master.params, master.version)
+
+# one configuration, in this process: ops, seconds, MB
+def measure(mode, n_workers):
+    global sess
+    start = time.perf_counter()
+    sess = tf.Session(config=tf.ConfigProto(intra_op_parallelism_threads=1, inter_op_parallelism_threads=1))
+    optimizer = tf.train.RMSPropOptimizer(learning_rate)
+    master = Net('master')
+    workers, template = [], None
+    for index in range(n_workers):
+        workers.append(Net('W_%i' % index, master, optimizer, template))
+        if mode == 'shared template':
+            template = workers[0]
+    sess.run(tf.global_variables_initializer())
+    build_time = time.perf_counter() - start
+
+    random = np.random.RandomState(0)
+    states = random.randn(10, state_size).astype(np.float32)
+    for net in workers:
+        net.pull.pull()
+        net.act_fn(states[:1])
+        net.push_fn({net.state: states, net.action: random.randint(action_size, size=10).astype(np.int32),
+                     net.q_target: random.randn(10, 1).astype(np.float32)})
+        master.version.bump()
+    n_ops = len(tf.get_default_graph().get_operations())
+    return n_ops, build_time, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.
+
+def main():
+    if len(sys.argv) == 3:
+        print('%d %f %f' % measure(sys.argv[1], int(sys.argv[2])))
+        return
+
+    print(' {:>9s} | {:>27s} | {:>27s}'.format('', *modes))
+    print(' {:>9s} | {:>7s} {:>9s} {:>9s} | {:>7s} {:>9s} {:>9s}'.format('N_WORKERS', *(('ops', 'build', 'RSS') * 2)))
+    for n_workers in worker_counts:
+        row = []
+        for mode in modes:
+            output = subprocess.check_output([sys.executable, os.path.abspath(__file__), mode, str(n_workers)])
+            n_ops, build_time, rss = output.split()[-3:]
+            row.extend([int(n_ops), float(build_time), float(rss)])
+        print(' {:9d} | {:7,d} {:8.2f}s {:6,.0f} MB | {:7,d} {:8.2f}s {:6,.0f} MB'.format(n_workers, *row))
+
+if __name__ == "__main__":
+    main()
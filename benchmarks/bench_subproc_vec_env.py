@@ -0,0 +1,67 @@
+import gym
+import numpy as np
+import multiprocessing
+import threading
+import time
+import sys
+import os
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from rl_common.subproc_vec_env import SubprocVecEnv
+
+# env steps/sec of gym envs in threads of one interpreter against one child process per env,
+# both driven the way the A3C Worker threads drive them (one thread per env)
+env_name = "Acrobot-v1"
+bench_time = 3.0    # seconds per measurement
+
+def run_threads(envs):
+    counts = [0] * len(envs)
+    stop = threading.Event()
+
+    def work(index):
+        env = envs[index]
+        env.reset()
+        action = 0
+        while not stop.is_set():
+            _, _, done, _ = env.step(action)
+            action = (action + 1) % 3
+            counts[index] += 1
+            if done:
+                env.reset()
+
+    threads = [threading.Thread(target=work, args=(index,)) for index in range(len(envs))]
+    for thread in threads:
+        thread.start()
+    time.sleep(bench_time)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    return sum(counts) / bench_time
+
+def main():
+    n_cpu = multiprocessing.cpu_count()
+    n_envs = sorted(set([1, 2, 4, 8, n_cpu]))
+    n_envs = [n for n in n_envs if n <= n_cpu]
+
+    print(' {} / {} cores'.format(env_name, n_cpu))
+    for n in n_envs:
+        thread_rate = run_threads([gym.make(env_name).unwrapped for _ in range(n)])
+
+        vec_env = SubprocVecEnv(env_name, n, auto_reset=False)
+        vec_env.reset()     # wait until every child is up
+        subproc_rate = run_threads([vec_env.get_env(index) for index in range(n)])
+
+        actions = np.zeros(n, dtype=np.int64)
+        steps = 0
+        start = time.time()
+        while time.time() - start < bench_time:
+            vec_env.step(actions)
+            steps += n
+        batch_rate = steps / (time.time() - start)
+        vec_env.close()
+
+        print(' N={:3d} : threads {:>10,.0f} / subproc threads {:>10,.0f} / subproc batched {:>10,.0f} steps/sec'.format(
+              n, thread_rate, subproc_rate, batch_rate))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+import gym
+import tensorflow as tf
+import numpy as np
+import contextlib
+import io
+import time
+import sys
+import os
+os.environ['TF_CPP_MIN_LOG_LEVEL'] = '2'
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from rl_common.callables import feed_callable
+from rl_common.returns import bootstrap_returns
+from rl_common.rollout_buffer import RolloutBuffer
+from rl_common.sampling import sample_action
+from rl_common.sync_a2c import SyncA2C
+from rl_common.vec_env import make_vec_env
+
+# env steps/sec and samples per update of the single environment A2C loop
+# (update every 10 steps) against SyncA2C over N vectorized CartPoles, Type B network
+env_name = "CartPole-v1"
+state_size, action_size = 4, 2
+learning_rate = 0.001
+discount_factor = 0.99
+n_steps = 5
+env_counts = (1, 4, 16, 64)
+duration = 10.
+
+class Agent(object):
+    def __init__(self, sess):
+        self.sess = sess
+        self.discount_factor = discount_factor
+        self.numpy_policy = None
+        self.random = np.random.RandomState(0)
+        self.step = self.episode = 0
+
+        self.state = tf.placeholder(tf.float32, [None, state_size], name='state')
+        self.action = tf.placeholder(tf.int32, [None, ], name='action')
+        self.q_target = tf.placeholder(tf.float32, [None, 1], name='q_target')
+        w_init, b_init = tf.random_normal_initializer(.0, .3), tf.constant_initializer(0.1)
+        actor_hidden = tf.layers.dense(self.state, 64, tf.nn.tanh, kernel_initializer=w_init, bias_initializer=b_init)
+        self.actor_predict = tf.layers.dense(actor_hidden, action_size, kernel_initializer=w_init, bias_initializer=b_init)
+        self.policy = tf.nn.softmax(self.actor_predict)
+        critic_hidden = tf.layers.dense(self.state, 64, tf.nn.tanh, kernel_initializer=w_init, bias_initializer=b_init)
+        self.value = tf.layers.dense(critic_hidden, 1, kernel_initializer=w_init, bias_initializer=b_init)
+
+        td_error = self.q_target - self.value
+        log_prob = tf.reduce_sum(tf.log(self.policy + 1e-5) * tf.one_hot(self.action, action_size), axis=1, keep_dims=True)
+        loss = tf.reduce_mean(tf.square(td_error)) - tf.reduce_mean(log_prob * tf.stop_gradient(td_error))
+        self.train_op = tf.train.RMSPropOptimizer(learning_rate).minimize(loss)
+
+        self.sampled_action = sample_action(self.actor_predict, 1)[0]
+        self.act_fn = sess.make_callable([self.sampled_action, self.value], [self.state])
+        self.train_fn = feed_callable(sess, self.train_op, [self.state, self.action, self.q_target])
+
+# the loop of the 04_ scripts: one env, one act per step, one update per 10 steps
+def bench_single(agent):
+    env = gym.make(env_name)
+    buffer = RolloutBuffer(10, state_size)
+    state = env.reset()
+    steps = updates = 0
+    start = time.perf_counter()
+    while time.perf_counter() - start < duration:
+        action, value = agent.act_fn(state[np.newaxis, :])
+        next_state, reward, done, _ = env.step(int(action[0]))
+        buffer.append(state, action[0], reward)
+        steps += 1
+        if steps % 10 == 0 or done:
+            value_next_state = 0. if done else agent.act_fn(next_state[np.newaxis, :])[1][0, 0]
+            agent.train_fn({agent.state: buffer.states, agent.action: buffer.actions,
+                            agent.q_target: bootstrap_returns(buffer.rewards, discount_factor, value_next_state)})
+            buffer.clear()
+            updates += 1
+        state = env.reset() if done else next_state
+    elapsed = time.perf_counter() - start
+    return steps / elapsed, updates / elapsed
+
+def bench_sync(agent, num_envs):
+    trainer = SyncA2C(agent, make_vec_env(env_name, num_envs, seed=0, max_episode_steps=500), n_steps)
+    start, start_step = time.perf_counter(), agent.step
+    with contextlib.redirect_stdout(io.StringIO()):
+        trainer.run(time.time() + duration, lambda avg_score: True)
+    elapsed = time.perf_counter() - start
+    return (agent.step - start_step) / elapsed, trainer.n_updates / elapsed
+
+def main():
+    with tf.Session() as sess:
+        agent = Agent(sess)
+        sess.run(tf.global_variables_initializer())
+
+        steps, updates = bench_single(agent)
+        print(' single env      : {:8,.0f} steps/sec, {:6,.0f} updates/sec, <= 10 samples/update'.format(steps, updates))
+        for num_envs in env_counts:
+            sync_steps, sync_updates = bench_sync(agent, num_envs)
+            print(' sync A2C N = {:2d} : {:8,.0f} steps/sec, {:6,.0f} updates/sec, {:4d} samples/update ({:.1f}x)'.format(
+                  num_envs, sync_steps, sync_updates, num_envs * n_steps, sync_steps / steps))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+import tensorflow as tf
+import numpy as np
+import threading
+import time
+import sys
+import os
+os.environ['TF_CPP_MIN_LOG_LEVEL'] = '2'
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from rl_common.trainer_queue import TrainerQueue
+
+# samples/sec and backward passes of the A3C push (every worker applies the gradients
+# of its own 10 sample segment to the master) against the TrainerQueue learner,
+# random segments so only the update path is measured, Type B network
+state_size, action_size = 4, 2
+hidden = 256
+learning_rate = 0.001
+n_workers = 6
+segment_size = 10
+batch_sizes = (32, 64, 128)
+duration = 5.
+
+class Net(object):
+    def __init__(self, scope, master = None):
+        with tf.variable_scope(scope):
+            self.state = tf.placeholder(tf.float32, [None, state_size], name='state')
+            self.action = tf.placeholder(tf.int32, [None, ], name='action')
+            self.q_target = tf.placeholder(tf.float32, [None, 1], name='q_target')
+
+            w_init, b_init = tf.random_normal_initializer(.0, .3), tf.constant_initializer(0.1)
+            actor_hidden = tf.layers.dense(self.state, hidden, tf.nn.tanh, kernel_initializer=w_init, bias_initializer=b_init)
+            self.policy = tf.nn.softmax(tf.layers.dense(actor_hidden, action_size, kernel_initializer=w_init,
+                                                        bias_initializer=b_init))
+            critic_hidden = tf.layers.dense(self.state, hidden, tf.nn.tanh, kernel_initializer=w_init, bias_initializer=b_init)
+            self.value = tf.layers.dense(critic_hidden, 1, kernel_initializer=w_init, bias_initializer=b_init)
+        self.params = tf.get_collection(tf.GraphKeys.TRAINABLE_VARIABLES, scope=scope)
+        if master is None:
+            return
+
+        td_error = self.q_target - self.value
+        log_prob = tf.reduce_sum(tf.log(self.policy + 1e-5) * tf.one_hot(self.action, action_size), axis=1, keep_dims=True)
+        loss = tf.reduce_mean(tf.square(td_error)) - tf.reduce_mean(log_prob * tf.stop_gradient(td_error))
+        gradients = tf.gradients(loss, self.params)
+        self.update_op = tf.train.RMSPropOptimizer(learning_rate).apply_gradients(zip(gradients, master.params))
+        self.pull_op = [local.assign(shared) for local, shared in zip(self.params, master.params)]
+
+def segment(random):
+    return (random.randn(segment_size, state_size).astype(np.float32),
+            random.randint(action_size, size=segment_size).astype(np.int32),
+            random.randn(segment_size, 1).astype(np.float32))
+
+# the workers either update the master themselves or put into the trainer queue
+def run_workers(sess, workers, trainer_queue):
+    stop = threading.Event()
+    counts = [0] * len(workers)
+
+    def work(index):
+        net, random = workers[index], np.random.RandomState(index)
+        while not stop.is_set():
+            states, actions, q_target = segment(random)
+            if trainer_queue is not None:
+                trainer_queue.put(states, actions, q_target, trainer_queue.version)
+            else:
+                sess.run(net.update_op, {net.state: states, net.action: actions, net.q_target: q_target})
+            sess.run(net.pull_op)
+            counts[index] += segment_size
+
+    threads = [threading.Thread(target=work, args=(index,)) for index in range(len(workers))]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    time.sleep(duration)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    return sum(counts) / (time.perf_counter() - start)
+
+def main():
+    master = Net('master')
+    workers = [Net('W_%i' % index, master) for index in range(n_workers)]
+    learner = Net('W_%i' % n_workers, master)
+
+    with tf.Session() as sess:
+        sess.run(tf.global_variables_initializer())
+
+        samples = run_workers(sess, workers, None)
+        print(' worker push     : {:8,.0f} samples/sec, {:6,.0f} updates/sec, {:4d} samples/update'.format(
+              samples, samples / segment_size, segment_size))
+
+        for batch_size in batch_sizes:
+            trainer_queue = TrainerQueue(lambda feed_dict: sess.run(learner.update_op, feed_dict),
+                                         lambda: sess.run(learner.pull_op),
+                                         learner.state, learner.action, learner.q_target,
+                                         batch_size, 2 * n_workers)
+            trainer_queue.start()
+            queue_samples = run_workers(sess, workers, trainer_queue)
+            trainer_queue.stop()
+            print(' queue batch {:3d} : {:8,.0f} samples/sec, {:6,.0f} updates/sec, {:6.1f} samples/update ({:.2f}x)'.format(
+                  batch_size, queue_samples, trainer_queue.n_batches / duration,
+                  trainer_queue.n_samples / float(max(trainer_queue.n_batches, 1)), queue_samples / samples))
+            print(trainer_queue.report())
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+import numpy as np
+import tempfile
+import shutil
+import time
+import sys
+import os
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from rl_common.trajectory_recorder import TrajectoryWriter, COLUMNS, chunk_paths, load_chunk
+
+# cost of recording in the rollout loop: a loop of N_STEPS steps (a CartPole sized transition and
+# a fixed amount of work standing in for env.step) with no recording, with the chunks written
+# by the loop itself when they fill up (the same columns, np.save in the loop) and with
+# TrajectoryRecorder (the writer thread saves them); steps/sec, the slowest step (the stall of a
+# chunk write), the memory of the buffers and the write throughput, then a pass over the files
+# through the memory maps
+N_STEPS = 200000
+state_sizes = (4, 64)
+chunk_sizes = (4096, 65536)
+STEP_WORK = 200     # elements of the stand-in for env.step
+modes = ('no recording', 'np.save in the loop', 'TrajectoryRecorder')
+
+def run(mode, state_size, chunk_size, save_dir):
+    states = np.random.RandomState(0).randn(1024, state_size).astype(np.float32)
+    work = np.ones(STEP_WORK)
+    writer = recorder = None
+    if mode == 'TrajectoryRecorder':
+        writer = TrajectoryWriter(save_dir)
+        recorder = writer.recorder('main', state_size, chunk_size)
+    elif mode == 'np.save in the loop':
+        buffer = dict((column, np.zeros([chunk_size, state_size] if column == 'states' else [chunk_size],
+                                        np.float32 if column in ('states', 'rewards') else np.int8)) for column in COLUMNS)
+        n, index = 0, 0
+
+    slowest = 0.
+    start = time.perf_counter()
+    for step in range(N_STEPS):
+        step_start = time.perf_counter()
+        state, action, reward, done = states[step % 1024], step % 2, 1.0, step % 200 == 199
+        work.sum()
+        if recorder is not None:
+            recorder.append(state, action, reward, done)
+        elif mode == 'np.save in the loop':
+            buffer['states'][n], buffer['actions'][n], buffer['rewards'][n], buffer['dones'][n] = state, action, reward, done
+            n += 1
+            if n == chunk_size:
+                chunk_dir = os.path.join(save_dir, 'chunk-%06d' % index)
+                os.makedirs(chunk_dir)
+                for column in COLUMNS:
+                    np.save(os.path.join(chunk_dir, column + '.npy'), buffer[column])
+                n, index = 0, index + 1
+        slowest = max(slowest, time.perf_counter() - step_start)
+    if writer is not None:
+        writer.close()
+    elapsed = time.perf_counter() - start
+
+    memory, write_rate = 0., 0.
+    if writer is not None:
+        memory = recorder.n_buffers * recorder.chunk_nbytes
+        write_rate = writer.nbytes / max(writer.write_time, 1e-9)
+    elif mode == 'np.save in the loop':
+        memory = sum(value.nbytes for value in buffer.values())
+    return N_STEPS / elapsed, 1e3 * slowest, memory, write_rate
+
+def read_back(save_dir):
+    start = time.perf_counter()
+    n_steps = 0
+    for path in chunk_paths(save_dir):
+        chunk = load_chunk(path)
+        n_steps += len(chunk['actions'])
+        chunk['states'].sum(), chunk['rewards'].sum()      # touch the pages
+    return n_steps / (time.perf_counter() - start)
+
+def main():
+    print(' {:>10s} {:>10s} | {:>20s} | {:>12s} {:>12s} | {:>10s} {:>12s} | {:>14s}'.format(
+          'state_size', 'chunk_size', 'mode', 'steps/sec', 'slowest', 'buffers', 'write', 'mmap read'))
+    for state_size in state_sizes:
+        for chunk_size in chunk_sizes:
+            for mode in modes:
+                save_dir = tempfile.mkdtemp()
+                try:
+                    rate, slowest, memory, write_rate = run(mode, state_size, chunk_size, save_dir)
+                    read_rate = read_back(save_dir) if mode == 'TrajectoryRecorder' else None
+                finally:
+                    shutil.rmtree(save_dir)
+                print(' {:10d} {:10,d} | {:>20s} | {:12,.0f} {:9,.2f} ms | {:7,.2f} MB {:7,.1f} MB/s | {:>14s}'.format(
+                      state_size, chunk_size, mode, rate, slowest, memory / 1e6, write_rate / 1e6,
+                      '{:,.0f} steps/s'.format(read_rate) if read_rate is not None else '-'))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+import gym
+import numpy as np
+import time
+import sys
+import os
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from rl_common.vec_env import make_vec_env, VEC_ENVS
+
+# parity of the vectorized envs against gym, then steps/sec of both
+# every step starts the gym copies from the vectorized state, so chaotic
+# dynamics (Acrobot) do not amplify float rounding into a false mismatch
+num_envs = 16
+parity_steps = 2000
+bench_steps = 2000
+rtol, atol = 1e-6, 1e-6
+
+def check_parity(env_name):
+    vec_env = make_vec_env(env_name, num_envs, seed=0)
+    envs = [gym.make(env_name).unwrapped for _ in range(num_envs)]
+    for env in envs:
+        env.reset()
+
+    def copy_state(index):
+        envs[index].state = vec_env.state[index].copy()
+        if env_name == 'CartPole-v1':
+            envs[index].steps_beyond_done = None
+
+    vec_env.reset()
+
+    random = np.random.RandomState(1)
+    n_dones = 0
+    max_diff = 0.
+    for _ in range(parity_steps):
+        actions = random.randint(vec_env.action_size, size=num_envs)
+        for index in range(num_envs):
+            copy_state(index)
+        obs, rewards, dones, infos = vec_env.step(actions)
+        for index, env in enumerate(envs):
+            next_state, reward, done, _ = env.step(int(actions[index]))
+            vec_state = infos['terminal_observation'][index]
+            diff = np.abs(next_state - vec_state).max()
+            max_diff = max(max_diff, diff)
+            if not np.allclose(next_state, vec_state, rtol, atol) or reward != rewards[index] or done != dones[index]:
+                raise AssertionError('%s: copy %d diverged from gym (diff %.2e, reward %s/%s, done %s/%s)'
+                                     % (env_name, index, diff, reward, rewards[index], done, dones[index]))
+            if done:
+                n_dones += 1
+    print(' {:15s} parity ok : {:,d} steps x {:d} envs, {:,d} episode ends, max |obs diff| {:.1e}'.format(
+          env_name, parity_steps, num_envs, n_dones, max_diff))
+
+def bench(env_name, n):
+    envs = [gym.make(env_name).unwrapped for _ in range(n)]
+    for env in envs:
+        env.reset()
+    random = np.random.RandomState(0)
+    actions = random.randint(envs[0].action_space.n, size=(bench_steps, n))
+
+    start = time.perf_counter()
+    for t in range(bench_steps):
+        for index, env in enumerate(envs):
+            _, _, done, _ = env.step(int(actions[t, index]))
+            if done:
+                env.reset()
+    gym_rate = bench_steps * n / (time.perf_counter() - start)
+
+    vec_env = make_vec_env(env_name, n, seed=0)
+    vec_env.reset()
+    start = time.perf_counter()
+    for t in range(bench_steps):
+        vec_env.step(actions[t])
+    vec_rate = bench_steps * n / (time.perf_counter() - start)
+
+    print(' {:15s} N={:5d} : gym {:>12,.0f} steps/sec / vec {:>12,.0f} steps/sec ({:.1f}x)'.format(
+          env_name, n, gym_rate, vec_rate, vec_rate / gym_rate))
+
+def main():
+    for env_name in sorted(VEC_ENVS):
+        check_parity(env_name)
+    for env_name in sorted(VEC_ENVS):
+        for n in (1, 16, 256):
+            bench(env_name, n)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+import numpy as np
+import time
+import sys
+import os
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from rl_common.returns import bootstrap_returns
+from rl_common.vtrace import vtrace, VTraceLearner
+
+# V-trace parity: on-policy (rho = 1) it must give the n-step targets of the A3C
+# train_model, with a behaviour policy the target never picks it must stay at V;
+# then the learner side cost of building the targets of one batch
+discount_factor = 0.9
+segment_size = 10
+n_segments = 7
+n_calls = 2000
+
+def check_parity(random):
+    rewards, values = random.rand(segment_size), random.randn(segment_size)
+    log_probs = np.log(random.rand(segment_size))
+    bootstrap_value = random.randn()
+
+    vs, pg_advantages = vtrace(log_probs, log_probs, rewards, values, bootstrap_value, discount_factor)
+    q_target = bootstrap_returns(rewards, discount_factor, bootstrap_value)[:, 0]
+    diff = max(np.abs(vs - q_target).max(),
+               np.abs(pg_advantages - (rewards + discount_factor * np.append(q_target[1:], bootstrap_value) - values)).max())
+    if diff > 1e-6:
+        raise AssertionError('on-policy V-trace differs from the n-step targets by %g' % diff)
+    print(' on-policy  : vs = n-step return, advantage = n-step TD error, max diff {:.2e}'.format(diff))
+
+    vs, pg_advantages = vtrace(log_probs, log_probs - 30., rewards, values, bootstrap_value, discount_factor)
+    diff = max(np.abs(vs - values).max(), np.abs(pg_advantages).max())
+    if diff > 1e-6:
+        raise AssertionError('off-policy V-trace moved away from V by %g' % diff)
+    print(' rho -> 0   : vs = V, advantage = 0, max diff {:.2e}'.format(diff))
+
+def main():
+    random = np.random.RandomState(0)
+    check_parity(random)
+
+    # the learner network is replaced by a random evaluate_fn, only the target building is timed
+    evaluate_fn = lambda states, actions: (np.log(random.rand(len(actions))), random.randn(len(actions), 1))
+    learner = VTraceLearner(None, None, evaluate_fn, 'state', 'action', 'q_target', 'advantage',
+                            discount_factor, segment_size * n_segments)
+    for index in range(n_segments):
+        learner.put_trajectory(random.randn(segment_size, 4), random.randint(2, size=segment_size),
+                               random.rand(segment_size), np.log(random.rand(segment_size)),
+                               random.randn(4), index % 3 == 0, 0)
+    batch = [learner.segments.get() for _ in range(n_segments)]
+
+    start = time.perf_counter()
+    for _ in range(n_calls):
+        learner._feed_dict(batch)
+    elapsed = (time.perf_counter() - start) / n_calls
+    print(' targets    : {:.1f} us per batch of {:d} segments ({:d} samples)'.format(
+          1e6 * elapsed, n_segments, n_segments * segment_size))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+import numpy as np
+import subprocess
+import tempfile
+import shutil
+import time
+import sys
+import os
+os.environ['TF_CPP_MIN_LOG_LEVEL'] = '2'
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# time to a first action from a trained policy on disk: rebuild the training graph (actor, critic,
+# losses, RMSProp) and restore its Saver checkpoint, against load_policy of the exported weight
+# file; each run is a fresh process (graph and restore, or map, then the first forward pass), the
+# files on disk and the largest difference of the action probabilities; Type C CartPole networks
+state_size, action_size = 4, 2
+hidden_sizes = (64, 1024, 8192)
+learning_rate = 0.005
+modes = ('graph + Saver.restore', 'load_policy')
+
+def build(hidden):
+    import tensorflow as tf
+    state = tf.placeholder(tf.float32, [None, state_size], name='state')
+    action = tf.placeholder(tf.int32, [None, ], name='action')
+    q_target = tf.placeholder(tf.float32, [None, 1], name='q_target')
+    w_init, b_init = tf.random_normal_initializer(.0, .3), tf.constant_initializer(0.1)
+    with tf.variable_scope('actor'):
+        actor_hidden = tf.layers.dense(state, hidden, tf.nn.tanh, kernel_initializer=w_init, bias_initializer=b_init)
+        policy = tf.nn.softmax(tf.layers.dense(actor_hidden, action_size, kernel_initializer=w_init, bias_initializer=b_init))
+    with tf.variable_scope('critic'):
+        critic_hidden = tf.layers.dense(state, hidden, tf.nn.tanh, kernel_initializer=w_init, bias_initializer=b_init)
+        value = tf.layers.dense(critic_hidden, 1, kernel_initializer=w_init, bias_initializer=b_init)
+    td_error = q_target - value
+    log_prob = tf.reduce_sum(tf.log(policy + 1e-5) * tf.one_hot(action, action_size), axis=1, keep_dims=True)
+    tf.train.RMSPropOptimizer(learning_rate).minimize(-tf.reduce_mean(log_prob * tf.stop_gradient(td_error)))
+    tf.train.RMSPropOptimizer(learning_rate).minimize(tf.reduce_mean(tf.square(td_error)))
+    return state, policy
+
+def save(hidden, save_dir):
+    import tensorflow as tf
+    from rl_common.weight_export import export_weights, WEIGHTS_FILE
+    build(hidden)
+    sess = tf.Session()
+    sess.run(tf.global_variables_initializer())
+    tf.train.Saver().save(sess, save_dir + '/model.ckpt')
+    export_weights(os.path.join(save_dir, WEIGHTS_FILE), sess,
+                   tf.get_collection(tf.GraphKeys.TRAINABLE_VARIABLES, 'actor'),
+                   tf.get_collection(tf.GraphKeys.TRAINABLE_VARIABLES, 'critic'))
+
+# one mode, in this process: milliseconds from the start, and the probabilities of fixed states
+def measure(mode, hidden, save_dir):
+    start = time.perf_counter()
+    states = np.random.RandomState(0).randn(8, state_size).astype(np.float32)
+    if mode == 'load_policy':
+        from rl_common.weight_export import load_policy, WEIGHTS_FILE
+        probs = load_policy(os.path.join(save_dir, WEIGHTS_FILE)).policy(states)
+    else:
+        import tensorflow as tf
+        state, policy = build(hidden)
+        sess = tf.Session()
+        tf.train.Saver().restore(sess, save_dir + '/model.ckpt')
+        probs = sess.run(policy, {state: states})
+    elapsed = time.perf_counter() - start
+    np.save(os.path.join(save_dir, mode.replace(' ', '_') + '.npy'), probs)
+    return 1e3 * elapsed
+
+def main():
+    if len(sys.argv) == 4:
+        if sys.argv[1] == 'save':
+            save(int(sys.argv[2]), sys.argv[3])
+        else:
+            print('%f' % measure(sys.argv[1], int(sys.argv[2]), sys.argv[3]))
+        return
+
+    run = lambda *args: subprocess.check_output([sys.executable, os.path.abspath(__file__)] + [str(arg) for arg in args])
+    print(' {:>6s} | {:>10s} {:>10s} | {:>22s} {:>12s} | {:>9s}'.format(
+          'hidden', 'checkpoint', 'weights', modes[0], modes[1], 'max diff'))
+    for hidden in hidden_sizes:
+        save_dir = tempfile.mkdtemp()
+        try:
+            run('save', hidden, save_dir)
+            sizes = [sum(os.path.getsize(os.path.join(save_dir, name)) for name in os.listdir(save_dir)
+                         if name.startswith('model.ckpt')), os.path.getsize(os.path.join(save_dir, 'policy.weights'))]
+            latencies = [float(run(mode, hidden, save_dir).split()[-1]) for mode in modes]
+            probs = [np.load(os.path.join(save_dir, mode.replace(' ', '_') + '.npy')) for mode in modes]
+        finally:
+            shutil.rmtree(save_dir)
+        print(' {:6d} | {:7,.0f} KB {:7,.0f} KB | {:19,.1f} ms {:9,.1f} ms | {:9.1e}'.format(
+              hidden, sizes[0] / 1e3, sizes[1] / 1e3, latencies[0], latencies[1], np.abs(probs[0] - probs[1]).max()))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,2 @@
+# shared helpers for the A2C / A3C gym scripts
+# the scripts add the repository root to sys.path and import from here
@@ -0,0 +1,15 @@
+# Session.make_callable handles for the hot session calls (act, bootstrap value,
+# train / push, pull): the fetches and feeds are resolved once at graph build time
+# instead of on every Session.run
+#
+#   self.policy_fn = self.sess.make_callable(self.policy, [self.state])
+#   prob_weights = self.policy_fn(state_t)
+#
+# feed_callable keeps the feed_dict interface of train_model / update_global
+def feed_callable(sess, fetches, feed_list):
+    feed_list = list(feed_list)
+    fn = sess.make_callable(fetches, feed_list)
+
+    def run(feed_dict):
+        return fn(*[feed_dict[tensor] for tensor in feed_list])
+    return run
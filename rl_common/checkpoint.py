@@ -0,0 +1,183 @@
+import os
+import pickle
+import re
+import shutil
+import threading
+import time
+
+import tensorflow as tf
+
+# periodic checkpoints that do not stall training: when one is due the training thread
+# only runs one session call that copies the variables into shadow variables in the graph,
+# a background thread saves the shadows (under the names of the variables, a plain Saver
+# restores them) into a temp directory and renames it to save_dir/ckpt-<n>, then points
+# save_dir/checkpoint at it; a checkpoint directory is complete or absent, a crash leaves
+# the previous ones, the last `keep` are kept
+#
+#   checkpointer = AsyncCheckpointer(sess, model_path, CHECKPOINT_EVERY_UPDATES, CHECKPOINT_EVERY_SECONDS,
+#                                    CHECKPOINT_KEEP, state_fn=lambda: (agent.episode, agent.step),
+#                                    state_file='epsilon_episode.pickle')
+#   ...
+#   agent.train_model()
+#   checkpointer.update()           # or update(n_updates) with a global count
+#   ...
+#   checkpointer.close()            # waits for the write in flight
+#   print(checkpointer.report())
+#
+#   ckpt = tf.train.get_checkpoint_state(model_path)    # restores as before
+#   saver.restore(sess, ckpt.model_checkpoint_path)
+#
+# while a write is in flight no new snapshot is taken (the shadows are being read), the due
+# one is taken by the first update() after the write; state_fn() is called with the snapshot
+# and pickled next to it, and to save_dir/state_file once the checkpoint is in place
+#
+# USE_PERIODIC_CHECKPOINTS of the numbered scripts: every CHECKPOINT_EVERY_UPDATES updates or
+# CHECKPOINT_EVERY_SECONDS (None: not by that measure), the last CHECKPOINT_KEEP kept; the PG /
+# A2C scripts count their own updates and pickle (episode, step), the A3C scripts count the master
+# updates and the worker that finds one due takes the snapshot (threaded mode only)
+class AsyncCheckpointer(object):
+    def __init__(self, sess, save_dir, every_updates = None, every_seconds = None, keep = 3, var_list = None,
+                 state_fn = None, state_file = None, prefix = 'model.ckpt'):
+        self.sess = sess
+        self.save_dir = save_dir
+        self.every_updates = every_updates
+        self.every_seconds = every_seconds
+        self.keep = keep
+        self.state_fn = state_fn
+        self.state_file = state_file
+        self.prefix = prefix
+
+        variables = list(tf.global_variables() if var_list is None else var_list)
+        with tf.name_scope('checkpoint_snapshot'):
+            self.shadows = [tf.Variable(tf.zeros(variable.get_shape(), variable.dtype.base_dtype), trainable=False,
+                                        collections=[], name='shadow') for variable in variables]
+            snapshot_op = tf.group(*[shadow.assign(variable) for shadow, variable in zip(self.shadows, variables)])
+        self.saver = tf.train.Saver(dict((variable.op.name, shadow) for variable, shadow in zip(variables, self.shadows)),
+                                    max_to_keep=None)
+        sess.run(tf.variables_initializer(self.shadows))
+        self.snapshot_fn = sess.make_callable(snapshot_op)
+        self.nbytes = sum(variable.dtype.base_dtype.size * variable.get_shape().num_elements() for variable in variables)
+
+        # the checkpoints of an earlier run count for `keep`, a temp directory of a crash is dropped
+        if not os.path.exists(save_dir):
+            os.makedirs(save_dir)
+        indices = []
+        for name in os.listdir(save_dir):
+            match = re.match(r'(\.tmp-)?ckpt-(\d+)$', name)
+            if match and match.group(1):
+                shutil.rmtree(os.path.join(save_dir, name), ignore_errors=True)
+            elif match:
+                indices.append(int(match.group(2)))
+        self.paths = [os.path.join(save_dir, 'ckpt-%d' % index, prefix) for index in sorted(indices)]
+        self.index = max(indices) + 1 if indices else 0
+
+        self.updates = 0
+        self.last_updates = 0
+        self.last_time = time.time()
+        self.pending = None         # (updates, state) of the snapshot to write
+        self.writing = False        # from the snapshot until its write is done
+        self.deferred = False
+        self.closing = False
+        self.lock = threading.Lock()
+        self.condition = threading.Condition(self.lock)
+
+        self.n_snapshots = 0
+        self.n_written = 0
+        self.n_deferred = 0
+        self.blocked_time = 0.      # training threads, in the snapshot calls
+        self.max_blocked = 0.
+        self.write_time = 0.        # background thread
+
+        self.thread = threading.Thread(target=self._run, name=type(self).__name__)
+        self.thread.daemon = True
+        self.thread.start()
+
+    def _due(self):
+        if self.every_updates is not None and self.updates - self.last_updates >= self.every_updates:
+            return True
+        return self.every_seconds is not None and time.time() - self.last_time >= self.every_seconds
+
+    # after a training update, from any training thread: True when it took a snapshot
+    def update(self, updates = None):
+        with self.lock:
+            self.updates = self.updates + 1 if updates is None else updates
+            if self.closing or not self._due():
+                return False
+            if self.writing:
+                if not self.deferred:
+                    self.deferred = True
+                    self.n_deferred += 1
+                return False
+            self.writing = True
+            self.last_updates, self.last_time = self.updates, time.time()
+            updates = self.updates
+
+        start = time.time()
+        self.snapshot_fn()
+        state = self.state_fn() if self.state_fn is not None else None
+        blocked = time.time() - start
+
+        with self.condition:
+            self.blocked_time += blocked
+            self.max_blocked = max(self.max_blocked, blocked)
+            self.n_snapshots += 1
+            self.pending = (updates, state)
+            self.condition.notify_all()
+        return True
+
+    def _run(self):
+        while True:
+            with self.condition:
+                while self.pending is None and not self.closing:
+                    self.condition.wait()
+                if self.pending is None:
+                    return
+                _, state = self.pending
+                self.pending = None
+
+            start = time.time()
+            self._write(state)
+            with self.condition:
+                self.write_time += time.time() - start
+                self.n_written += 1
+                self.writing = False
+                self.deferred = False
+                self.condition.notify_all()
+
+    def _write(self, state):
+        name = 'ckpt-%d' % self.index
+        self.index += 1
+        temp_dir, final_dir = os.path.join(self.save_dir, '.tmp-' + name), os.path.join(self.save_dir, name)
+        shutil.rmtree(temp_dir, ignore_errors=True)
+        os.makedirs(temp_dir)
+        self.saver.save(self.sess, os.path.join(temp_dir, self.prefix), write_meta_graph=False, write_state=False)
+        if self.state_file is not None:
+            with open(os.path.join(temp_dir, self.state_file), 'wb') as f:
+                pickle.dump(state, f)
+        os.rename(temp_dir, final_dir)
+
+        # the checkpoint file is replaced atomically, the dropped directories go after it
+        self.paths.append(os.path.join(final_dir, self.prefix))
+        dropped, self.paths = self.paths[:-self.keep], self.paths[-self.keep:]
+        tf.train.update_checkpoint_state(self.save_dir, self.paths[-1], list(self.paths))    # stored relative to save_dir
+        if self.state_file is not None:
+            temp_file = os.path.join(self.save_dir, '.tmp-' + self.state_file)
+            shutil.copyfile(os.path.join(final_dir, self.state_file), temp_file)
+            os.replace(temp_file, os.path.join(self.save_dir, self.state_file))
+        for path in dropped:
+            shutil.rmtree(os.path.dirname(path), ignore_errors=True)
+
+    # waits for the write in flight (a due snapshot is not taken any more) and stops the writer
+    def close(self):
+        with self.condition:
+            self.closing = True
+            self.condition.notify_all()
+        self.thread.join()
+
+    def report(self):
+        return ' checkpoints : {:d} written of {:d} snapshots ({:,.1f} MB each) / training blocked {:.3f} s, {:.2f} ms avg, {:.2f} ms max'.format(
+                   self.n_written, self.n_snapshots, self.nbytes / 1e6, self.blocked_time,
+                   1e3 * self.blocked_time / max(self.n_snapshots, 1), 1e3 * self.max_blocked) + \
+               ' / write {:.1f} ms avg in the background / {:d} deferred while writing / last {}'.format(
+                   1e3 * self.write_time / max(self.n_written, 1), self.n_deferred,
+                   self.paths[-1] if self.paths else '-')
@@ -0,0 +1,187 @@
+import multiprocessing
+import socket
+import time
+
+import tensorflow as tf
+
+from rl_common.flat_params import flat_params_initializer
+
+# distributed A3C over a tf.train.ClusterSpec: the "ps" tasks hold the master network
+# (its variables round robin over them, with the optimizer slots), every "worker" task
+# is a process with its own server and session that builds the master on the ps devices,
+# its local network on its own device, and runs Worker.work; the pushes and pulls are
+# the same ops as in one process, they just cross gRPC
+#
+#   def cluster_work(cluster, index, model_path):           # one worker task
+#       task = ClusterTask(cluster, index)
+#       with tf.device(task.shared_device):
+#           global_agent = A3CAgent(task.sess, "master")
+#       with tf.device(task.local_device):
+#           worker = Worker(env, task.sess, 'W_%i' % index, None, global_agent)
+#       task.initialize('master', worker.name)   # the chief inits the master, the others wait
+#       worker.stats = RunStats(task.coordinator, training_time, target_score)
+#       worker.work()
+#       if task.finish():                        # True on the chief once every task is done
+#           saver.save(task.sess, model_path + "/")
+#
+#   run_cluster(cluster_work, {'ps': ['localhost:2222'], 'worker': ['localhost:2223', ...]}, sys.argv[1:],
+#               (model_path,))     # extra args of cluster_work
+#
+# without a task on the command line every task of the spec is started here as a local
+# process (one box, localhost hosts); "python script.py worker 1" runs only that task,
+# on its own machine, for a real cluster
+# task.coordinator is a tf.train.Coordinator whose stop is a flag on the ps: a stop requested by
+# any task (training time, target score of its episodes) stops all of them within poll_interval
+# seconds; the step / episode counters and the score window stay per task
+# a worker task that dies is seen by run_cluster (the local processes are terminated and it
+# raises) and by the chief's finish (it raises after timeout seconds without every task done)
+#
+# USE_CLUSTER of the A3C scripts, on CLUSTER_PS_HOSTS / CLUSTER_WORKER_HOSTS: the worker tasks use
+# the plain push / pull, the trainer queue, V-trace, gradient accumulation and the inference server
+# are not available there
+class ClusterTask(object):
+    def __init__(self, cluster, index, config = None):
+        self.cluster = tf.train.ClusterSpec(cluster)
+        self.index = index
+        self.n_workers = self.cluster.num_tasks('worker')
+        self.is_chief = index == 0
+        self.local_device = '/job:worker/task:%d' % index
+        self.shared_device = tf.train.replica_device_setter(cluster=self.cluster, worker_device=self.local_device)
+
+        # one op thread, the parallelism comes from the tasks; talk to the ps tasks and to no other worker
+        if config is None:
+            config = tf.ConfigProto(intra_op_parallelism_threads=1, inter_op_parallelism_threads=1)
+        config.device_filters.extend(['/job:ps', self.local_device])
+        self.server = tf.train.Server(self.cluster, 'worker', index, config=config)
+        self.sess = tf.Session(self.server.target, config=config)
+
+    # after the graph is built: the chief initializes the variables of the ps tasks, the
+    # others wait for it (the done counter is initialized last, it marks the master ready)
+    # and then initialize the ps variables only their graph has (optimizer slots of a per
+    # worker optimizer), every task initializes its local network
+    def initialize(self, shared_scope, local_scope, poll_interval = 0.1):
+        with tf.device('/job:ps/task:0'):
+            self.stop_flag = tf.Variable(False, trainable=False, name='cluster_stop')
+            self.n_done = tf.Variable(0, trainable=False, name='cluster_tasks_done')
+        self.stop_op = self.stop_flag.assign(True)
+        self.done_op = self.n_done.assign_add(1)
+        self.coordinator = ClusterCoordinator(self.sess, self.stop_flag, self.stop_op)
+
+        shared = [variable for variable in tf.global_variables() if '/job:ps' in variable.device]
+        local = [variable for variable in tf.global_variables() if '/job:ps' not in variable.device]
+        if self.is_chief:
+            self.sess.run(tf.variables_initializer([variable for variable in shared if variable is not self.n_done]))
+            self.sess.run(flat_params_initializer(shared_scope))
+            self.sess.run(self.n_done.initializer)
+        else:
+            uninitialized = tf.report_uninitialized_variables([self.n_done])
+            while len(self.sess.run(uninitialized)):
+                time.sleep(poll_interval)
+            names = set(self.sess.run(tf.report_uninitialized_variables(shared)))
+            self.sess.run(tf.variables_initializer([variable for variable in shared
+                                                    if variable.op.name.encode() in names]))
+        self.sess.run(tf.variables_initializer(local))
+        self.sess.run(flat_params_initializer(local_scope))
+
+    # this task is done; the chief waits for all the others and returns True, it saves the master
+    # (the run is over: the others are asked to stop, a task not done after timeout seconds is lost)
+    def finish(self, poll_interval = 0.1, timeout = 300.):
+        self.sess.run(self.done_op)
+        if not self.is_chief:
+            return False
+        self.coordinator.request_stop()
+        deadline = time.time() + timeout
+        n_done = self.sess.run(self.n_done)
+        while n_done < self.n_workers:
+            if time.time() >= deadline:
+                raise RuntimeError('%d of %d cluster worker tasks done after %.0f s' % (n_done, self.n_workers, timeout))
+            time.sleep(poll_interval)
+            n_done = self.sess.run(self.n_done)
+        return True
+
+# the stop of a tf.train.Coordinator shared by all the tasks through a flag on the ps: request_stop
+# sets it, should_stop reads it at most every poll_interval seconds (one gRPC call, not one per step)
+class ClusterCoordinator(tf.train.Coordinator):
+    def __init__(self, sess, stop_flag, stop_op, poll_interval = 1.):
+        tf.train.Coordinator.__init__(self)
+        self.sess = sess
+        self.stop_flag = stop_flag
+        self.stop_op = stop_op
+        self.poll_interval = poll_interval
+        self.next_poll = 0.
+
+    def should_stop(self):
+        if tf.train.Coordinator.should_stop(self):
+            return True
+        now = time.time()
+        if now < self.next_poll:
+            return False
+        self.next_poll = now + self.poll_interval
+        if self.sess.run(self.stop_flag):
+            tf.train.Coordinator.request_stop(self)
+            return True
+        return False
+
+    def request_stop(self, ex = None):
+        if not tf.train.Coordinator.should_stop(self):
+            self.sess.run(self.stop_op)
+        tf.train.Coordinator.request_stop(self, ex)
+
+# a parameter server task only serves its variables, until the launcher terminates it
+def ps_server(cluster, index):
+    tf.train.Server(tf.train.ClusterSpec(cluster), 'ps', index).join()
+
+# a cluster dict of n_ps ps tasks and n_workers worker tasks on free localhost ports
+def local_cluster(n_workers, n_ps = 1):
+    sockets = [socket.socket() for _ in range(n_ps + n_workers)]
+    for sock in sockets:
+        sock.bind(('localhost', 0))
+    hosts = ['localhost:%d' % sock.getsockname()[1] for sock in sockets]
+    for sock in sockets:
+        sock.close()
+    return {'ps': hosts[:n_ps], 'worker': hosts[n_ps:]}
+
+# run the task named in argv ("ps 0", "worker 3") here, or with no argv every task of the
+# cluster as a local process; waits for the workers, then stops the parameter servers
+# (a worker that exits with an error ends the run: the other tasks are terminated, it raises)
+# worker_target(cluster, index, *args) is a module level function, cluster a picklable dict
+def run_cluster(worker_target, cluster, argv = (), args = (), start_method = None, poll_interval = 0.5):
+    if len(argv) >= 2:
+        job, index = argv[0], int(argv[1])
+        if job == 'ps':
+            ps_server(cluster, index)
+        else:
+            worker_target(cluster, index, *args)
+        return
+
+    # children never share the TensorFlow runtime of the parent: forkserver, else spawn
+    if start_method is None:
+        methods = multiprocessing.get_all_start_methods()
+        start_method = 'forkserver' if 'forkserver' in methods else 'spawn'
+    ctx = multiprocessing.get_context(start_method)
+
+    ps = [ctx.Process(target=ps_server, name='ps_%i' % index, args=(cluster, index))
+          for index in range(len(cluster['ps']))]
+    workers = [ctx.Process(target=worker_target, name='worker_%i' % index, args=(cluster, index) + tuple(args))
+               for index in range(len(cluster['worker']))]
+    for process in ps + workers:
+        process.start()
+
+    failed = []
+    try:
+        while any(process.is_alive() for process in workers):
+            failed = [process.name for process in workers if process.exitcode not in (None, 0)]
+            if failed:
+                break
+            time.sleep(poll_interval)
+        else:
+            failed = [process.name for process in workers if process.exitcode != 0]
+    finally:
+        for process in ps + workers:
+            if process.is_alive():
+                process.terminate()
+        for process in ps + workers:
+            process.join()
+
+    if failed:
+        raise RuntimeError('cluster task(s) %s exited with an error' % ', '.join(failed))
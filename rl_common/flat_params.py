@@ -0,0 +1,67 @@
+import numpy as np
+import tensorflow as tf
+
+FLAT_VIEWS = 'flat_param_views'
+FLAT_INITIALIZERS = 'flat_param_initializers'
+
+# the trainable variables of a variable scope as views of one contiguous float32 variable
+# the scope's custom getter hands out reshaped slices instead of creating variables, so
+# get_collection(TRAINABLE_VARIABLES, scope) is [flat] and the gradient push, the pull
+# (one assign), the optimizer slots, the Hogwild shared buffers and the checkpoint all
+# move one flat tensor
+#
+#   with tf.variable_scope("model"):
+#       if USE_FLAT_PARAMS:
+#           FlatParams(dense_size(state_size, hidden1, action_size) + dense_size(state_size, hidden1, 1))
+#       actor_hidden = tf.layers.dense(...)     # kernel and bias are views of model/flat
+#
+#   sess.run(tf.global_variables_initializer())
+#   sess.run(flat_params_initializer())     # the layers' own initializers, slice by slice
+#
+# the size has to be given up front (the variable exists before the layers ask for their
+# slices), a network asking for more than that raises a ValueError
+#
+# USE_FLAT_PARAMS of the A3C scripts, off by default: it changes the graph and the checkpoint
+# (one <scope>/flat variable instead of the kernels and biases), so the checkpoints of one mode
+# do not restore in the other; on, every init path also runs flat_params_initializer(), without
+# it the weights stay zero
+class FlatParams(object):
+    def __init__(self, size, name = 'flat'):
+        self.size = size
+        self.offset = 0
+        self.variable = tf.Variable(tf.zeros([size]), name=name)
+        self.views = []
+        tf.get_variable_scope().set_custom_getter(self._getter)
+
+    def _getter(self, getter, name, shape = None, dtype = tf.float32, initializer = None, *args, **kwargs):
+        shape = tf.TensorShape(shape).as_list()
+        size = int(np.prod(shape))
+        start, end = self.offset, self.offset + size
+        if end > self.size:
+            raise ValueError('%s needs %d more parameters than the %d of %s' %
+                             (name, end - self.size, self.size, self.variable.name))
+        self.offset = end
+
+        # named after the variable it replaces, so get_collection(FLAT_VIEWS, scope) finds it
+        with tf.name_scope(name + '/'):
+            view = tf.reshape(self.variable[start:end], shape, name='view')
+            if initializer is not None:
+                value = initializer(shape, dtype=dtype) if callable(initializer) else initializer
+                init = self.variable[start:end].assign(tf.reshape(tf.cast(value, tf.float32), [-1]))
+                tf.add_to_collection(FLAT_INITIALIZERS, init)
+        tf.add_to_collection(FLAT_VIEWS, view)
+        self.views.append(view)
+        return view
+
+# number of parameters of dense layers units[0] -> units[1] -> ... (kernels and biases)
+def dense_size(*units):
+    return sum(n_in * n_out + n_out for n_in, n_out in zip(units[:-1], units[1:]))
+
+# kernels and biases of a scope in creation order: the views in flat mode, else the variables
+def scope_params(scope):
+    return tf.get_collection(FLAT_VIEWS, scope) or tf.get_collection(tf.GraphKeys.TRAINABLE_VARIABLES, scope)
+
+# runs the initializers of the views, after tf.global_variables_initializer (a no-op without flat params)
+# scope: only those of the networks under it (the views are named after the variables they replace)
+def flat_params_initializer(scope = None):
+    return tf.group(*tf.get_collection(FLAT_INITIALIZERS, scope))
@@ -0,0 +1,146 @@
+import threading
+import time
+
+import tensorflow as tf
+
+# accumulate-then-apply for the A3C master: the workers add their local gradients into
+# one accumulator variable per master parameter, the master's optimizer applies their
+# mean once per `every` contributions (or once `window` seconds passed since the last
+# apply), so the contended optimizer slot update runs far less often
+#
+#   accumulator = GradientAccumulator(sess, [(OPT_A, master.model_params)], ACCUMULATE_STEPS,
+#                                     on_apply=master.params_version.bump)                       # master
+#   accumulate_fn = feed_callable(sess, accumulator.add_op([local.model_gradients]), feed_list)  # local
+#   accumulator.add(accumulate_fn, feed_dict)       # True when this contribution applied
+#   accumulator.leave()     # when a worker stops
+#
+# the adds run concurrently (assign_add with use_locking), an apply waits for the adds
+# in flight and holds off new ones; sync = True is a barrier instead: every round waits
+# for one contribution of each of the `parties` workers, the A3C scripts then train like
+# synchronous A2C
+#
+# USE_GRADIENT_ACCUMULATION of the A3C scripts: every = ACCUMULATE_STEPS, window =
+# ACCUMULATE_WINDOW (seconds, None: by count only), sync = ACCUMULATE_SYNC
+class GradientAccumulator(object):
+    def __init__(self, sess, optimizer_params, every = 1, window = None, sync = False, parties = 1,
+                 on_apply = None):
+        self.sess = sess
+        self.on_apply = on_apply    # called after every apply, before the waiting workers resume
+        self.every = every
+        self.window = window
+        self.sync = sync
+        self.parties = parties
+
+        self.accumulators = []
+        applies, zeros = [], []
+        self.count = tf.placeholder(tf.float32, [], name='accumulated_count')
+        for optimizer, params in optimizer_params:
+            accumulators = [tf.Variable(tf.zeros(param.get_shape()), trainable=False,
+                                        name=param.op.name.replace('/', '_') + '_accumulator')
+                            for param in params]
+            applies.append(optimizer.apply_gradients([(accumulator / self.count, param)
+                                                      for accumulator, param in zip(accumulators, params)]))
+            self.accumulators.append(accumulators)
+        with tf.control_dependencies(applies):
+            for accumulators in self.accumulators:
+                zeros.extend(accumulator.assign(tf.zeros_like(accumulator)) for accumulator in accumulators)
+        self.apply_fn = sess.make_callable(tf.group(*zeros), [self.count])
+
+        self.condition = threading.Condition()
+        self.pending = 0        # contributions in the accumulators
+        self.in_flight = 0      # adds running right now
+        self.applying = False
+        self.generation = 0
+        self.last_apply = time.time()
+
+        # statistics
+        self.n_contributions = 0
+        self.n_applies = 0
+        self.apply_time = 0.
+        self.n_waits = 0
+        self.wait_time = 0.     # adds held off by an apply
+        self.barrier_time = 0.  # sync: waiting for the other workers
+        self.start_time = time.time()
+
+    # the op a local network runs to add its gradients, same nesting as optimizer_params
+    def add_op(self, gradient_lists):
+        return tf.group(*[accumulator.assign_add(gradient, use_locking=True)
+                          for accumulators, gradients in zip(self.accumulators, gradient_lists)
+                          for accumulator, gradient in zip(accumulators, gradients)])
+
+    # add_fn(feed_dict) runs add_op on one worker segment, True when the master changed
+    def add(self, add_fn, feed_dict):
+        with self.condition:
+            if self.applying:
+                start = time.time()
+                while self.applying:
+                    self.condition.wait()
+                self.n_waits += 1
+                self.wait_time += time.time() - start
+            self.in_flight += 1
+
+        add_fn(feed_dict)
+
+        with self.condition:
+            self.in_flight -= 1
+            self.pending += 1
+            self.n_contributions += 1
+            self.condition.notify_all()     # an apply may be waiting for the adds in flight
+            if self.sync:
+                return self._sync_round()
+            if self.pending >= self.every or (self.window is not None and time.time() - self.last_apply >= self.window):
+                return self._apply()
+            return False
+
+    # called with the condition held
+    def _apply(self):
+        if self.applying or self.pending == 0:
+            return False
+        self.applying = True
+        while self.in_flight > 0:
+            self.condition.wait()
+        start = time.time()
+        self.apply_fn(float(self.pending))
+        self.apply_time += time.time() - start
+        if self.on_apply is not None:
+            self.on_apply()
+        self.pending = 0
+        self.applying = False
+        self.last_apply = time.time()
+        self.generation += 1
+        self.n_applies += 1
+        self.condition.notify_all()
+        return True
+
+    def _sync_round(self):
+        if self.pending >= self.parties:
+            return self._apply()
+        generation = self.generation
+        start = time.time()
+        while self.generation == generation:
+            self.condition.wait()
+        self.barrier_time += time.time() - start
+        return False
+
+    # a worker that starts after the accumulator was built, the sync rounds wait for it too
+    def enter(self):
+        with self.condition:
+            self.parties += 1
+
+    # a worker that stops, the sync rounds go on without it
+    def leave(self):
+        with self.condition:
+            self.parties -= 1
+            if self.sync and self.parties > 0 and self.pending >= self.parties:
+                self._apply()
+            elif self.parties == 0:
+                self._apply()   # the last partial round
+
+    def report(self):
+        n_applies = max(self.n_applies, 1)
+        elapsed = max(time.time() - self.start_time, 1e-9)
+        return ' accumulator : {:,d} contributions / {:,d} applies / {:.1f} per apply / apply {:.2f} ms avg'.format(
+                    self.n_contributions, self.n_applies, self.n_contributions / float(n_applies),
+                    1e3 * self.apply_time / n_applies) + \
+               ' / {:,d} adds held by an apply ({:.2f} s) / barrier wait {:.2f} s / {:,.1f} applies/sec'.format(
+                    self.n_waits, self.wait_time, self.barrier_time, self.n_applies / elapsed)
@@ -0,0 +1,200 @@
+import multiprocessing
+
+import numpy as np
+
+# Hogwild A3C: the master weights and the optimizer slots live in shared memory,
+# every worker is a process with its own graph and session, it computes the
+# gradients of its local network and applies them to the shared arrays without a lock
+#
+#   shared = SharedParams(sess.run(global_agent.model_params), SharedRMSProp(learning_rate))
+#   shared_stats = SharedRunStats(hogwild_context())    # rl_common.run_stats, one stop for all
+#   run_hogwild(hogwild_work, N_WORKERS, ([shared], shared_stats))     # parent
+#
+#   client = HogwildClient(sess, [local_params], [local_gradients], [shared])   # worker
+#   client.push(feed_dict)      # local gradients -> shared weights
+#   client.pull()               # shared weights -> local network
+#
+# concurrent pushes may interleave element by element, that is the point of Hogwild:
+# the updates are sparse and small enough for the lost writes not to matter
+#
+# USE_HOGWILD_PROCESSES of the A3C scripts runs the workers this way, in place of threads that
+# share one session and push through the master's optimizer
+
+# tf.train.RMSPropOptimizer with its defaults: no momentum, not centered, ms starts at 1
+class SharedRMSProp(object):
+    n_slots = 1
+
+    def __init__(self, learning_rate, decay = 0.9, epsilon = 1e-10):
+        self.learning_rate = learning_rate
+        self.decay = decay
+        self.epsilon = epsilon
+
+    def init_slots(self, slots):
+        slots[0][:] = 1.
+
+    def apply(self, param, grad, slots, t):
+        ms, = slots
+        ms *= self.decay
+        ms += (1. - self.decay) * grad * grad
+        param -= self.learning_rate * grad / np.sqrt(ms + self.epsilon)
+
+
+# tf.train.AdamOptimizer, the step count t is shared by all workers
+class SharedAdam(object):
+    n_slots = 2
+
+    def __init__(self, learning_rate, beta1 = 0.9, beta2 = 0.999, epsilon = 1e-8):
+        self.learning_rate = learning_rate
+        self.beta1 = beta1
+        self.beta2 = beta2
+        self.epsilon = epsilon
+
+    def init_slots(self, slots):
+        for slot in slots:
+            slot[:] = 0.
+
+    def apply(self, param, grad, slots, t):
+        m, v = slots
+        lr = self.learning_rate * np.sqrt(1. - self.beta2 ** t) / (1. - self.beta1 ** t)
+        m *= self.beta1
+        m += (1. - self.beta1) * grad
+        v *= self.beta2
+        v += (1. - self.beta2) * grad * grad
+        param -= lr * m / (np.sqrt(v) + self.epsilon)
+
+
+# one flat float32 buffer for a list of variables plus one buffer per optimizer slot
+# the NumPy views are rebuilt after unpickling, so it can be handed to Process(args=...)
+class SharedParams(object):
+    def __init__(self, values, optimizer, ctx = None):
+        if ctx is None:
+            ctx = multiprocessing
+        self.shapes = [np.shape(value) for value in values]
+        self.size = sum(int(np.prod(shape)) for shape in self.shapes)
+        self.optimizer = optimizer
+
+        self._params = ctx.RawArray('f', self.size)
+        self._slots = [ctx.RawArray('f', self.size) for _ in range(optimizer.n_slots)]
+        self._t = ctx.RawValue('q', 0)
+        self._attach()
+
+        optimizer.init_slots(self.slots)
+        self.set(values)
+
+    def _attach(self):
+        self.flat = np.frombuffer(self._params, np.float32)
+        self.slots = [np.frombuffer(slot, np.float32) for slot in self._slots]
+        self.params = []
+        offset = 0
+        for shape in self.shapes:
+            size = int(np.prod(shape))
+            self.params.append(self.flat[offset:offset + size].reshape(shape))
+            offset += size
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        for name in ('flat', 'slots', 'params'):
+            del state[name]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._attach()
+
+    @property
+    def t(self):
+        return self._t.value
+
+    def set(self, values):
+        for param, value in zip(self.params, values):
+            param[...] = value
+
+    # lock free, the read-modify-write of t can lose a count under contention
+    def apply_gradients(self, gradients):
+        grad = np.concatenate([np.ravel(g) for g in gradients]).astype(np.float32, copy=False)
+        self._t.value += 1
+        self.optimizer.apply(self.flat, grad, self.slots, self._t.value)
+
+    # the optimizer slots and t, the weights are saved with the master network
+    def state(self):
+        return {'slots': [slot.copy() for slot in self.slots], 't': self.t}
+
+    # before the workers start: go on from state() of a run with the same networks and optimizer
+    def restore(self, state):
+        if len(state['slots']) != len(self.slots) or any(np.size(slot) != self.size for slot in state['slots']):
+            raise ValueError('optimizer state of %d slot(s) does not fit %d slot(s) of %d values'
+                             % (len(state['slots']), len(self.slots), self.size))
+        for slot, value in zip(self.slots, state['slots']):
+            slot[:] = value
+        self._t.value = state['t']
+
+    # copy the shared weights into TF variables (the master network before saving)
+    def load(self, sess, variables):
+        for variable, param in zip(variables, self.params):
+            variable.load(param, sess)
+
+
+# the worker process side: one session run for all gradients per push,
+# one grouped assign op for all local variables per pull
+class HogwildClient(object):
+    def __init__(self, sess, variables, gradients, shared_params):
+        import tensorflow as tf
+
+        self.sess = sess
+        self.gradients = [list(group) for group in gradients]
+        self.shared_params = list(shared_params)
+
+        self.placeholders = []
+        assign_ops = []
+        for group in variables:
+            for variable in group:
+                placeholder = tf.placeholder(variable.dtype.base_dtype, variable.get_shape())
+                assign_ops.append(variable.assign(placeholder))
+                self.placeholders.append(placeholder)
+        self.pull_op = tf.group(*assign_ops)
+
+        self.n_push = 0
+        self.n_pull = 0
+
+    def push(self, feed_dict):
+        gradients = self.sess.run(self.gradients, feed_dict)
+        for shared, group in zip(self.shared_params, gradients):
+            shared.apply_gradients(group)
+        self.n_push += 1
+
+    def pull(self):
+        params = [param for shared in self.shared_params for param in shared.params]
+        self.sess.run(self.pull_op, dict(zip(self.placeholders, params)))
+        self.n_pull += 1
+
+
+# the multiprocessing context of the worker processes, locks and events handed to them are made
+# with it (a lock of the default fork context can not be passed to a forkserver child)
+# children never share the TensorFlow runtime of the parent: forkserver, else spawn
+def hogwild_context(start_method = None):
+    if start_method is None:
+        methods = multiprocessing.get_all_start_methods()
+        start_method = 'forkserver' if 'forkserver' in methods else 'spawn'
+    return multiprocessing.get_context(start_method)
+
+# start target(index, *args) in n_workers processes and wait for all of them
+def run_hogwild(target, n_workers, args = (), start_method = None):
+    ctx = hogwild_context(start_method)
+
+    processes = []
+    for index in range(n_workers):
+        process = ctx.Process(target=target, name='W_%i' % index, args=(index,) + tuple(args))
+        process.start()
+        processes.append(process)
+
+    try:
+        for process in processes:
+            process.join()
+    finally:
+        for process in processes:
+            if process.is_alive():
+                process.terminate()
+
+    failed = [process.name for process in processes if process.exitcode != 0]
+    if failed:
+        raise RuntimeError('hogwild worker(s) %s exited with an error' % ', '.join(failed))
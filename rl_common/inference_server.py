@@ -0,0 +1,167 @@
+import threading
+import queue
+import time
+
+import numpy as np
+
+# one pending observation of a worker thread
+# every thread reuses its own request object, so nothing is allocated per step
+class _Request(object):
+    def __init__(self):
+        self.state = None
+        self.action = None
+        self.log_prob = None
+        self.submit_time = 0.
+        self.error = None           # the server failed or stopped before it answered
+        self.ready = threading.Event()
+
+# inference server for the A3C workers
+# gathers the pending observations of all workers and answers them with one batched forward pass
+# an exception of a forward pass stops the server: act() raises a RuntimeError in the workers of
+# that batch, in the ones still queued and in every later call, as it does once stop() was called
+class InferenceServer(threading.Thread):
+    def __init__(self, sess, state, policy, max_batch_size, max_wait = 0.001, seed = None):
+        threading.Thread.__init__(self, name = 'InferenceServer')
+        self.daemon = True
+
+        import tensorflow as tf
+        from rl_common.sampling import sample_action, action_log_prob
+
+        self.sess = sess
+        self.state = state          # state placeholder of the acting network
+        self.policy = policy        # softmax output of the acting network
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait    # seconds to wait for a batch to fill up
+
+        # every row is sampled in the graph, or the argmax when greedy is set (evaluation)
+        logits = policy.op.inputs[0] if policy.op.type == 'Softmax' else tf.log(policy)
+        sampled_action, greedy_action = sample_action(logits, seed)
+        self.act_fn = sess.make_callable([sampled_action, action_log_prob(logits, sampled_action)], [state])
+        self.greedy_act_fn = sess.make_callable([greedy_action, action_log_prob(logits, greedy_action)], [state])
+        self.greedy = False
+
+        self.requests = queue.Queue()
+        self.local = threading.local()
+        self.stop_event = threading.Event()
+        self.error = None           # of the forward pass that failed, the thread ended with it
+
+        # statistics
+        self.n_requests = 0
+        self.n_batches = 0
+        self.latency_sum = 0.
+        self.latency_max = 0.
+        self.start_time = None
+        self.stop_time = None
+
+    # called by a worker thread, blocks until the server answered
+    def get_action(self, state):
+        return self.act(state)[0]
+
+    # the action and its log-probability under the weights that served it
+    def act(self, state):
+        request = getattr(self.local, 'request', None)
+        if request is None:
+            request = self.local.request = _Request()
+
+        self._check()
+        request.state = state
+        request.error = None
+        request.ready.clear()
+        request.submit_time = time.time()
+        self.requests.put(request)
+        # the server may have ended between the check and the put, then nothing answers
+        while not request.ready.wait(0.1):
+            if self.stop_time is not None and not request.ready.is_set():
+                self._check()
+        if request.error is not None:
+            raise RuntimeError('the %s failed: %r' % (self.name, request.error))
+        return request.action, request.log_prob
+
+    def _check(self):
+        if self.error is not None:
+            raise RuntimeError('the %s failed: %r' % (self.name, self.error))
+        if self.stop_event.is_set() or self.stop_time is not None:
+            raise RuntimeError('the %s is stopped' % self.name)
+
+    def run(self):
+        self.start_time = time.time()
+        try:
+            self._run()
+        except Exception as error:
+            self.error = error
+        # the requests still queued are not served any more
+        while True:
+            try:
+                request = self.requests.get_nowait()
+            except queue.Empty:
+                break
+            request.error = self.error or RuntimeError('stopped')
+            request.ready.set()
+        self.stop_time = time.time()
+
+    def _run(self):
+        while not self.stop_event.is_set():
+            try:
+                batch = [self.requests.get(timeout=0.1)]
+            except queue.Empty:
+                continue
+
+            deadline = time.time() + self.max_wait
+            while len(batch) < self.max_batch_size:
+                try:
+                    batch.append(self.requests.get_nowait())
+                    continue
+                except queue.Empty:
+                    pass
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self.requests.get(timeout=remaining))
+                except queue.Empty:
+                    break
+
+            self._serve(batch)
+
+    def _serve(self, batch):
+        try:
+            states = np.vstack([request.state for request in batch])
+            if self.greedy:
+                actions, log_probs = self.greedy_act_fn(states)
+            else:
+                actions, log_probs = self.act_fn(states)
+        except Exception as error:
+            for request in batch:
+                request.error = error
+                request.ready.set()
+            raise
+
+        now = time.time()
+        for request, action, log_prob in zip(batch, actions, log_probs):
+            latency = now - request.submit_time
+            self.latency_sum += latency
+            if latency > self.latency_max:
+                self.latency_max = latency
+            request.action = int(action)
+            request.log_prob = log_prob
+            request.ready.set()
+
+        self.n_requests += len(batch)
+        self.n_batches += 1
+
+    def stop(self):
+        self.stop_event.set()
+        if self.is_alive():
+            self.join()
+
+    def report(self):
+        n_batches = max(self.n_batches, 1)
+        n_requests = max(self.n_requests, 1)
+        elapsed = max((self.stop_time or time.time()) - (self.start_time or time.time()), 1e-9)
+
+        avg_batch = self.n_requests / n_batches
+        return ' inference : {:,d} steps / {:,d} batches / avg batch {:.2f} ({:.1%} fill)'.format(
+                    self.n_requests, self.n_batches, avg_batch, avg_batch / self.max_batch_size) + \
+               ' / latency avg {:.3f} ms, max {:.3f} ms / {:,.0f} steps/sec'.format(
+                    1000 * self.latency_sum / n_requests, 1000 * self.latency_max, self.n_requests / elapsed) + \
+               (' / failed: %r' % self.error if self.error is not None else '')
@@ -0,0 +1,73 @@
+import numpy as np
+
+# NumPy copy of the tanh MLPs built in build_model
+# every network is dense(tanh) layers followed by a linear output layer,
+# the variables are passed in creation order: kernel, bias, kernel, bias, ...
+class NumpyPolicy(object):
+    def __init__(self, sess, actor_params, critic_params = None):
+        self.sess = sess
+        self.actor_params = list(actor_params)
+        self.critic_params = list(critic_params or [])
+        
+        self.actor_layers = None
+        self.critic_layers = None
+        self.n_sync = 0
+
+    # fixed weights without a session (e.g. rl_common.weight_export.load_policy), sync() is not
+    # used; float32 arrays are taken as they are, a read-only memmap stays one
+    @classmethod
+    def from_values(cls, actor_values, critic_values = ()):
+        policy = cls(None, [])
+        policy.actor_layers = cls._layers(list(actor_values))
+        policy.critic_layers = cls._layers(list(critic_values))
+        return policy
+
+    # snapshot the weights, call it whenever the TF variables change
+    # (after pull_global or after a training step)
+    def sync(self):
+        values = self.sess.run(self.actor_params + self.critic_params)
+        n_actor = len(self.actor_params)
+        self.actor_layers = self._layers(values[:n_actor])
+        self.critic_layers = self._layers(values[n_actor:])
+        self.n_sync += 1
+
+    @staticmethod
+    def _layers(values):
+        return [(np.asarray(kernel, np.float32), np.asarray(bias, np.float32))
+                for kernel, bias in zip(values[0::2], values[1::2])]
+
+    @staticmethod
+    def _forward(layers, x):
+        for kernel, bias in layers[:-1]:
+            x = np.tanh(np.dot(x, kernel) + bias)
+        kernel, bias = layers[-1]
+        return np.dot(x, kernel) + bias
+
+    # softmax probabilities, same as sess.run(agent.policy, {agent.state: states})
+    def policy(self, states):
+        if self.actor_layers is None:
+            self.sync()
+        logits = self._forward(self.actor_layers, np.asarray(states, np.float32))
+        logits -= logits.max(axis=1, keepdims=True)
+        prob_weights = np.exp(logits)
+        prob_weights /= prob_weights.sum(axis=1, keepdims=True)
+        return prob_weights
+
+    # one action per row and its log-probability, the NumPy side of rl_common.sampling:
+    # inverse cdf with the caller's RandomState, or the argmax when greedy; the probability is
+    # clipped to 1e-10 as in the loss, an underflow to 0 gives log 1e-10 and not -inf
+    def sample(self, states, random, greedy = False):
+        prob_weights = self.policy(states)
+        if greedy:
+            actions = prob_weights.argmax(axis=1)
+        else:
+            cum_prob = np.cumsum(prob_weights, axis=1)
+            uniform = random.rand(len(prob_weights), 1) * cum_prob[:, -1:]
+            actions = np.minimum((uniform > cum_prob).sum(axis=1), prob_weights.shape[1] - 1)
+        return actions, np.log(np.clip(prob_weights[np.arange(len(actions)), actions], 1e-10, 1.))
+
+    # state values, same as sess.run(agent.value, {agent.state: states})
+    def value(self, states):
+        if self.actor_layers is None:
+            self.sync()
+        return self._forward(self.critic_layers, np.asarray(states, np.float32))
@@ -0,0 +1,170 @@
+import os
+import time
+
+import numpy as np
+import tensorflow as tf
+
+from rl_common.returns import discount_cumsum
+from rl_common.trajectory_recorder import chunk_paths, load_chunk
+
+# warm start of fresh actor / critic networks from the chunks of rl_common.trajectory_recorder:
+# behaviour cloning (-log pi(recorded action | state)) for the actor, regression of V(state) on
+# the discounted return of the recorded episode for the critic, in shuffled minibatches
+#
+#   dataset = TrajectoryDataset(model_path + '/trajectories', discount_factor, min_episode_return=-1000.)
+#   pretrainer = OfflinePretrainer(sess, agent.state, agent.policy, agent.value, agent.model_params)
+#   pretrainer.run(dataset, epochs=50, batch_size=256, max_seconds=120.)    # after the initializers
+#   print(pretrainer.report())
+#
+# the data is never loaded whole: the returns are computed stream by stream one chunk at a time
+# (backwards, then forwards for the return of each episode) and kept in memory with the mask of
+# the kept steps, 5 bytes a step; the chunk dirs are only read, the dataset may be read-only or
+# shared by several runs; an epoch visits the chunks in a random order and shuffles the steps of
+# shuffle_chunks chunks at a time, read from their memory maps, so a dataset larger than RAM
+# trains in the memory of those chunks
+#
+# USE_OFFLINE_PRETRAIN of the A2C / A3C scripts runs it once before training, on a fresh run only
+# (a restored one keeps its weights): the chunks of PRETRAIN_DATA_DIR (None: model_path/trajectories,
+# recorded by an earlier run or by another script on the same environment), the episodes with a
+# return of at least PRETRAIN_MIN_EPISODE_RETURN (None: all of them), PRETRAIN_EPOCHS passes of at
+# most PRETRAIN_SECONDS; in the A3C scripts in threaded mode only
+class TrajectoryDataset(object):
+    def __init__(self, save_dir, discount_factor, min_episode_return = None):
+        self.save_dir = save_dir
+        self.paths = chunk_paths(save_dir)
+        if not self.paths:
+            raise ValueError('no trajectory chunks in %s' % save_dir)
+        self.min_episode_return = min_episode_return
+
+        # per chunk, the discounted return of every kept step and the mask of the kept steps
+        start = time.time()
+        self.returns, self.selected = [None] * len(self.paths), [None] * len(self.paths)
+        streams = {}
+        for index, path in enumerate(self.paths):
+            streams.setdefault(os.path.dirname(path), []).append(index)
+        for indices in streams.values():
+            self._returns(indices, discount_factor)
+        self.prepare_time = time.time() - start
+
+        self.sizes = [len(returns) for returns in self.returns]
+        self.n_steps = sum(len(selected) for selected in self.selected)
+        self.n_selected = sum(self.sizes)
+        self.nbytes = sum(returns.nbytes + selected.nbytes for returns, selected in zip(self.returns, self.selected))
+        if self.n_selected == 0:
+            raise ValueError('no episode of %s reaches a return of %s' % (save_dir, min_episode_return))
+        self.state_size = load_chunk(self.paths[0])['states'].shape[1]
+
+    # the chunks of one stream in order: an episode may go on in the next chunk
+    def _returns(self, indices, discount_factor):
+        returns, to_go = {}, {}
+        carry, carry_to_go = 0., 0.     # of the step after the chunk
+        for index in reversed(indices):
+            chunk = load_chunk(self.paths[index])
+            dones = chunk['dones'] != 0
+            chunk_returns = discount_cumsum(chunk['rewards'], discount_factor, carry, dones)
+            to_go[index] = discount_cumsum(chunk['rewards'], 1., carry_to_go, dones)
+            returns[index] = chunk_returns.astype(np.float32)
+            carry, carry_to_go = chunk_returns[0], to_go[index][0]
+
+        # the reward to go at the first step of an episode is its return
+        carry, after_done = 0., True
+        for index in indices:
+            dones = load_chunk(self.paths[index])['dones'] != 0
+            starts = np.concatenate([[after_done], dones[:-1]])
+            episode_returns = np.concatenate([[carry], to_go.pop(index)[starts]])[np.cumsum(starts)]
+            if self.min_episode_return is None:
+                selected = np.ones(len(dones), bool)
+            else:
+                selected = episode_returns >= self.min_episode_return
+            self.returns[index] = returns.pop(index)[selected]
+            self.selected[index] = selected
+            carry, after_done = episode_returns[-1], dones[-1]
+
+    def __len__(self):
+        return self.n_selected
+
+    # one epoch: (states, actions, returns [n, 1]), the last minibatch of a window may be short
+    def minibatches(self, batch_size, random = np.random, shuffle_chunks = 4):
+        order = [index for index in random.permutation(len(self.paths)) if self.sizes[index] > 0]
+        for start in range(0, len(order), shuffle_chunks):
+            states, actions, returns = [], [], []
+            for index in order[start:start + shuffle_chunks]:
+                chunk = load_chunk(self.paths[index])
+                selected = self.selected[index]
+                states.append(chunk['states'][selected])
+                actions.append(chunk['actions'][selected].astype(np.int32))
+                returns.append(self.returns[index])
+            states, actions, returns = np.concatenate(states), np.concatenate(actions), np.concatenate(returns)
+            permutation = random.permutation(len(actions))
+            for begin in range(0, len(actions), batch_size):
+                batch = permutation[begin:begin + batch_size]
+                yield states[batch], actions[batch], returns[batch][:, np.newaxis]
+
+    # bytes of the largest shuffle window
+    def window_nbytes(self, shuffle_chunks = 4):
+        per_step = 4 * self.state_size + 4 + 4
+        sizes = sorted(self.sizes, reverse=True)
+        return per_step * sum(sizes[:shuffle_chunks])
+
+class OfflinePretrainer(object):
+    def __init__(self, sess, state, policy, value, var_list, learning_rate = 0.01, critic = True,
+                 name = 'offline_pretrain'):
+        self.sess = sess
+        self.state = state
+        self.critic = critic
+        n_variables = len(tf.global_variables())
+        with tf.variable_scope(name):
+            self.action = tf.placeholder(tf.int32, [None, ], name='action')
+            self.returns = tf.placeholder(tf.float32, [None, 1], name='returns')
+            log_prob = tf.reduce_sum(tf.log(tf.clip_by_value(policy, 1e-10, 1.)) *
+                                     tf.one_hot(self.action, policy.get_shape().as_list()[-1], dtype=tf.float32), axis=1)
+            self.bc_loss = -tf.reduce_mean(log_prob)
+            self.accuracy = tf.reduce_mean(tf.cast(tf.equal(tf.argmax(policy, axis=1, output_type=tf.int32), self.action),
+                                                   tf.float32))
+            self.value_loss = tf.reduce_mean(tf.square(value - self.returns)) if critic else tf.constant(0.)
+            self.train_op = tf.train.AdamOptimizer(learning_rate).minimize(self.bc_loss + self.value_loss,
+                                                                           var_list=list(var_list))
+        # the optimizer's slots and counters, initialized by run() (the networks are not touched)
+        self.initializer = tf.variables_initializer(tf.global_variables()[n_variables:])
+
+        feeds = [state, self.action] + ([self.returns] if critic else [])
+        self.train_fn = sess.make_callable([self.bc_loss, self.value_loss, self.accuracy, self.train_op], feeds)
+
+        self.n_updates = 0
+        self.n_samples = 0
+        self.n_epochs = 0
+        self.train_time = 0.
+        self.losses = (0., 0., 0.)
+        self.dataset = None
+        self.window_nbytes = 0
+
+    # epochs over the dataset, cut after max_seconds (None: no limit)
+    def run(self, dataset, epochs = 50, batch_size = 256, max_seconds = None, shuffle_chunks = 4, random = np.random):
+        self.dataset = dataset
+        self.window_nbytes = dataset.window_nbytes(shuffle_chunks)
+        start = time.time()
+        self.sess.run(self.initializer)
+        for _ in range(epochs):
+            sums, n = np.zeros(3), 0
+            for states, actions, returns in dataset.minibatches(batch_size, random, shuffle_chunks):
+                feeds = (states, actions, returns) if self.critic else (states, actions)
+                sums += len(actions) * np.array(self.train_fn(*feeds)[:3])
+                n += len(actions)
+                self.n_updates += 1
+                if max_seconds is not None and time.time() - start > max_seconds:
+                    break
+            self.n_samples += n
+            self.n_epochs += 1
+            self.losses = tuple(sums / max(n, 1))
+            if max_seconds is not None and time.time() - start > max_seconds:
+                break
+        self.train_time = time.time() - start
+
+    def report(self):
+        dataset = self.dataset
+        bc_loss, value_loss, accuracy = self.losses
+        return ' pretrain : {:,d} of {:,d} steps in {:,d} chunks of {} ({:.2f} s for the returns) / {:d} epochs, {:,d} updates, {:,.0f} samples/sec in {:.1f} s / behaviour cloning loss {:.3f}, accuracy {:.1%}{} / {:,.1f} MB in memory (shuffle window and returns)'.format(
+                   dataset.n_selected, dataset.n_steps, len(dataset.paths), dataset.save_dir, dataset.prepare_time,
+                   self.n_epochs, self.n_updates, self.n_samples / max(self.train_time, 1e-9), self.train_time,
+                   bc_loss, accuracy, ', value loss {:,.2f}'.format(value_loss) if self.critic else '',
+                   (self.window_nbytes + dataset.nbytes) / 1e6)
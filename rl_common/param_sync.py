@@ -0,0 +1,83 @@
+import collections
+import threading
+
+import numpy as np
+import tensorflow as tf
+
+# version of the master weights, every update applied to them bumps it
+class ParamsVersion(object):
+    def __init__(self):
+        self.version = 0
+        self.lock = threading.Lock()
+
+    def bump(self):
+        with self.lock:
+            self.version += 1
+            return self.version
+
+# staleness aware pull of the master weights into a local network
+# the local copy remembers the master version it was pulled at, pull() is skipped
+# while the copy is at most max_staleness versions behind (0: pull on every change,
+# the first call always pulls); the copy is one assign per local variable, so with
+# USE_FLAT_PARAMS (rl_common.flat_params) it moves one
+# flat buffer per scope, without it one tensor per kernel and bias (pull_report shows which)
+#
+#   self.versioned_pull = VersionedPull(sess, self.model_params, master_agent.model_params,
+#                                       master_agent.params_version, PULL_MAX_STALENESS)
+#   self.update_global_fn(feed_dict)
+#   master_agent.params_version.bump()
+#   self.versioned_pull.pull()      # False when the local copy was recent enough
+class VersionedPull(object):
+    def __init__(self, sess, local_params, master_params, params_version, max_staleness = 0):
+        self.params_version = params_version
+        self.max_staleness = max_staleness
+
+        local_params, master_params = list(local_params), list(master_params)
+        self.local_params = local_params
+        self.n_variables = len(local_params)
+        self.size = sum(int(np.prod(param.get_shape().as_list())) for param in local_params)
+        self.nbytes = 4 * self.size     # float32
+
+        self.pull_op = tf.group(*[local.assign(master) for local, master in zip(local_params, master_params)])
+        self.pull_fn = sess.make_callable(self.pull_op)
+
+        self.version = None     # master version of the local copy, None before the first pull
+        self.n_requests = 0
+        self.n_pulls = 0
+        self.staleness = collections.Counter()   # versions behind at every request
+
+    def pull(self):
+        # the master version is read before the copy, the pulled weights are at least that recent
+        version = self.params_version.version
+        self.n_requests += 1
+        if self.version is not None:
+            staleness = version - self.version
+            self.staleness[staleness] += 1
+            if staleness <= self.max_staleness:
+                return False
+        self._copy()
+        self.version = version
+        self.n_pulls += 1
+        return True
+
+    # master -> local copy, without the version check
+    def _copy(self):
+        self.pull_fn()
+
+# pulls, bytes moved and the staleness histogram of all the workers
+def pull_report(pulls, max_bucket = 8):
+    pulls = list(pulls)
+    n_requests = sum(pull.n_requests for pull in pulls)
+    n_pulls = sum(pull.n_pulls for pull in pulls)
+    nbytes = sum(pull.n_pulls * pull.nbytes for pull in pulls)
+    n_variables = max([pull.n_variables for pull in pulls] or [0])
+    staleness = collections.Counter()
+    for pull in pulls:
+        staleness.update(pull.staleness)
+
+    buckets = [(str(k), staleness[k]) for k in range(max_bucket)]
+    buckets.append(('%d+' % max_bucket, sum(n for k, n in staleness.items() if k >= max_bucket)))
+    histogram = ', '.join('{}: {:.1%}'.format(k, n / float(max(n_requests, 1))) for k, n in buckets if n)
+
+    return ' pulls : {:,d} of {:,d} requests / {:,.1f} MB moved, {:d} variable{} per pull / staleness {}'.format(
+               n_pulls, n_requests, nbytes / 1e6, n_variables, 's' if n_variables != 1 else '', histogram)
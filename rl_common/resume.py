@@ -0,0 +1,135 @@
+import os
+import pickle
+import re
+import time
+
+import numpy as np
+import tensorflow as tf
+
+from rl_common.flat_params import FLAT_INITIALIZERS
+
+# resume of an A3C run from the latest checkpoint of model_path (the final save, or a periodic
+# one of rl_common.checkpoint) in two session calls: the first restores the shared variables
+# (the master network, the optimizer slots and counters, wherever their scope) and initializes
+# the gradient accumulators, the second pulls the master into every local network at once; the
+# locals (the variables the pulls write) are not initialized first, and the checkpoint's copies
+# of them are not read. The run state (RunStats counters, score window and training time, NumPy
+# RNG states) is the pickle saved next to the checkpoint
+#
+#   path = latest_checkpoint(model_path) if USE_RESUME else None
+#   if path is not None:
+#       resume = Resume(sess, path, [worker.agent for worker in workers] + [learner])     # instead of the initializers
+#   ...
+#   run_stats = RunStats(COORD, training_time, target_score)
+#   resume.apply(run_stats, workers)        # before the workers start
+#   print(resume.report())
+#
+#   checkpointer = AsyncCheckpointer(..., state_fn=lambda: run_state(run_stats, workers),
+#                                    state_file=RUN_STATE_FILE)
+#   save_run_state(model_path, run_state(run_stats, workers))      # with the final save
+#
+# the views of a shared template have no variables, they pull on first use; the envs and TF's
+# op level seeds start over, a resumed run is not the bit exact continuation
+#
+# USE_RESUME of the A3C scripts restores all of this in threaded mode; with the hogwild processes
+# the master weights and the shared optimizer slots and step count (hogwild_run_state, restored
+# into the SharedParams by apply_hogwild), the counters and the RNGs of the processes start over
+#
+#   shared_params = [SharedParams(sess.run(global_agent.model_params), SharedAdam(learning_rate))]
+#   resume.apply_hogwild(shared_params)     # before run_hogwild
+#   save_run_state(model_path, hogwild_run_state(shared_params))      # with the final save
+RUN_STATE_FILE = 'run_state.pickle'
+NOT_RESTORED = r'.*_accumulator$'     # GradientAccumulator, partial sums of the last run
+
+# tf.train.latest_checkpoint, also for the final save: its prefix is model_path + "/", the
+# checkpoint file of a relative model_path records it as "." and TF looks for "model_path/..index"
+def latest_checkpoint(save_dir):
+    path = tf.train.latest_checkpoint(save_dir)
+    if path is None and os.path.exists(os.path.join(save_dir, '.index')):
+        path = os.path.join(save_dir, '')
+    return path
+
+def run_state(run_stats, workers):
+    return {'run_stats': run_stats.state(),
+            'numpy_random': np.random.get_state(),
+            'worker_random': dict((worker.name, worker.agent.random.get_state()) for worker in workers)}
+
+def hogwild_run_state(shared_params):
+    return {'hogwild': [shared.state() for shared in shared_params]}
+
+# atomic: a crash leaves the previous file
+def save_run_state(save_dir, state, state_file = RUN_STATE_FILE):
+    if not os.path.exists(save_dir):
+        os.makedirs(save_dir)
+    temp_file = os.path.join(save_dir, '.tmp-' + state_file)
+    with open(temp_file, 'wb') as f:
+        pickle.dump(state, f)
+    os.replace(temp_file, os.path.join(save_dir, state_file))
+
+class Resume(object):
+    def __init__(self, sess, path, agents = (), not_restored = NOT_RESTORED, state_file = RUN_STATE_FILE):
+        if os.path.isdir(path):     # the final save's prefix is model_path + "/", it comes back as "model_path/."
+            path = os.path.normpath(path) + os.sep
+        self.path = path
+        start = time.time()
+
+        pulls = [agent.versioned_pull for agent in agents
+                 if getattr(agent.versioned_pull, 'pull_op', None) is not None]
+        pulled = set(param.op.name for pull in pulls for param in pull.local_params)
+        restored, initialized = [], []
+        for variable in tf.global_variables():
+            name = variable.op.name
+            if name in pulled:
+                continue
+            (initialized if re.match(not_restored, name) else restored).append(variable)
+        # the slices of flat variables, of those initialized only
+        initialized_names = set(variable.op.name for variable in initialized)
+        flat_initializers = [init for init in tf.get_collection(FLAT_INITIALIZERS)
+                             if init.op.inputs[0].op.name in initialized_names]
+
+        # the checkpoint is one of the same script with the same settings (Saver.restore reads a
+        # prefix ending in "/", tf.train.list_variables does not)
+        saver = tf.train.Saver(restored)
+        sess.run([saver.saver_def.restore_op_name, tf.variables_initializer(initialized)] + flat_initializers,
+                 {saver.saver_def.filename_tensor_name: path})
+        if pulls:
+            sess.run(tf.group(*[pull.pull_op for pull in pulls]))
+        for pull in pulls:      # the first pull_global finds the local copy current
+            pull.version = pull.params_version.version
+            pull.n_pulls += 1
+        self.n_restored, self.n_initialized, self.n_pulled = len(restored), len(initialized), len(pulls)
+        self.restore_time = time.time() - start
+
+        self.state = None
+        state_path = os.path.join(os.path.dirname(path), state_file)
+        if os.path.exists(state_path):
+            with open(state_path, 'rb') as f:
+                self.state = pickle.load(f)
+
+    # before the workers start: the counters, the score window and the RNG states
+    def apply(self, run_stats, workers):
+        if self.state is None or 'run_stats' not in self.state:
+            return
+        run_stats.restore(self.state['run_stats'])
+        np.random.set_state(self.state['numpy_random'])
+        for worker in workers:
+            if worker.name in self.state['worker_random']:
+                worker.agent.random.set_state(self.state['worker_random'][worker.name])
+
+    # before the hogwild processes start: the optimizer slots and step count of the shared params
+    def apply_hogwild(self, shared_params):
+        if self.state is None or 'hogwild' not in self.state:
+            return
+        for shared, state in zip(shared_params, self.state['hogwild']):
+            shared.restore(state)
+
+    def report(self):
+        if self.state is not None and 'run_stats' in self.state:
+            at = 'step {:,d}'.format(self.state['run_stats']['steps'])
+        elif self.state is not None and 'hogwild' in self.state:
+            at = 'update {:,d}'.format(self.state['hogwild'][0]['t'])
+        else:
+            at = 'step - (no run state)'
+        return ' resume : {} at {} / {:d} shared variables restored, {:d} local networks pulled, {:d} variables initialized / {:.1f} ms'.format(
+                   self.path, at,
+                   self.n_restored, self.n_pulled, self.n_initialized, 1e3 * self.restore_time)
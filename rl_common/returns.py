@@ -0,0 +1,68 @@
+import numpy as np
+
+# vectorized discounted returns
+#   R[t] = r[t] + gamma * (1 - done[t]) * R[t + 1],   R[T] = bootstrap
+#
+# the time axis is cut into chunks of `chunk` steps, inside a chunk the sum is one
+# product with the upper triangular matrix gamma^(j - i), the chunk return at
+# its first step is carried into the previous chunk as its bootstrap value
+#
+#   discount_cumsum(rewards, gamma)                         # [T]    -> [T]
+#   discount_cumsum(rewards, gamma, last_values, dones)     # [N, T] -> [N, T]
+_cache = {}
+
+def _discount_matrix(gamma, length):
+    key = (gamma, length)
+    if key not in _cache:
+        exponent = np.arange(length)[np.newaxis, :] - np.arange(length)[:, np.newaxis]
+        _cache[key] = np.where(exponent >= 0, np.power(gamma, np.maximum(exponent, 0), dtype=np.float64), 0.)
+    return _cache[key]
+
+def discount_cumsum(rewards, gamma, bootstrap = 0., dones = None, chunk = 128):
+    rewards = np.asarray(rewards, dtype=np.float64)
+    batched = rewards.ndim == 2
+    rewards = np.atleast_2d(rewards)
+    n, length = rewards.shape
+
+    carry = np.broadcast_to(np.asarray(bootstrap, dtype=np.float64), (n,)).copy()
+    returns = np.empty((n, length), dtype=np.float64)
+    if dones is not None:
+        dones = np.atleast_2d(np.asarray(dones, dtype=bool)).astype(np.int64)
+        # the masked path builds an [N, chunk, chunk] tensor, keep it small
+        chunk = min(chunk, 64)
+
+    end = length
+    while end > 0:
+        start = max(0, end - chunk)
+        size = end - start
+        weights = _discount_matrix(gamma, size)
+        carry_weights = weights[:, -1] * gamma      # gamma^(size - i)
+        r = rewards[:, start:end]
+
+        if dones is None:
+            returns[:, start:end] = r.dot(weights.T) + carry[:, np.newaxis] * carry_weights
+        else:
+            # count[:, j] = dones seen in [start, start + j), r[j] reaches step i < j
+            # only if no episode ended in between
+            count = np.zeros((n, size + 1), dtype=np.int64)
+            np.cumsum(dones[:, start:end], axis=1, out=count[:, 1:])
+            same = count[:, np.newaxis, :size] == count[:, :size, np.newaxis]
+            returns[:, start:end] = np.einsum('nij,nj->ni', weights * same, r) + \
+                carry[:, np.newaxis] * carry_weights * (count[:, :size] == count[:, size:])
+        carry = returns[:, start]
+        end = start
+
+    return returns if batched else returns[0]
+
+# returns of an n-step segment bootstrapped from the value of the state after it,
+# the Type B / C train_model targets (value_next_state = 0 when the episode is done)
+def bootstrap_returns(rewards, gamma, value_next_state):
+    return discount_cumsum(rewards, gamma, value_next_state)[:, np.newaxis]
+
+# zero mean / unit std (over the whole array unless an axis is given),
+# only centered when the std is 0 so a constant or one step episode does not turn into NaN
+def normalize(x, axis = None, eps = 1e-8):
+    x = np.asarray(x, dtype=np.float64)
+    x = x - np.mean(x, axis=axis, keepdims=True)
+    std = np.std(x, axis=axis, keepdims=True)
+    return x / np.where(std > eps, std, 1.)
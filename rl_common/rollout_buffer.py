@@ -0,0 +1,64 @@
+import numpy as np
+
+# preallocated <s, a, r> storage for the train_model updates, and the log-probability
+# of each action under the weights that sampled it (the behaviour policy of V-trace)
+# states are kept in float32 and actions as int32 indices, the dtypes of the
+# state / action placeholders, so the views below go into feed_dict without a copy
+#
+#   buffer = RolloutBuffer(ep_trial_step, state_size)
+#   buffer.append(state, action, reward)      # or append(state, action, reward, log_prob)
+#   feed_dict = {agent.state: buffer.states, agent.action: buffer.actions}
+#   buffer.clear()
+#
+# the views are only valid until the next clear(), appending past the capacity
+# doubles the arrays (the A3C workers flush on the global step, so the number of
+# samples between two updates of one worker is not strictly bounded)
+class RolloutBuffer(object):
+    def __init__(self, capacity, state_size):
+        self.capacity = capacity
+        self.state_size = state_size
+        self._states = np.zeros((capacity, state_size), dtype=np.float32)
+        self._actions = np.zeros(capacity, dtype=np.int32)
+        self._rewards = np.zeros(capacity, dtype=np.float32)
+        self._log_probs = np.zeros(capacity, dtype=np.float32)
+        self.size = 0
+
+    def __len__(self):
+        return self.size
+
+    def append(self, state, action, reward, log_prob = 0.):
+        index = self.size
+        if index == self.capacity:
+            self._grow()
+        self._states[index] = state
+        self._actions[index] = action
+        self._rewards[index] = reward
+        self._log_probs[index] = log_prob
+        self.size = index + 1
+
+    def clear(self):
+        self.size = 0
+
+    def _grow(self):
+        self.capacity *= 2
+        for name in ('_states', '_actions', '_rewards', '_log_probs'):
+            old = getattr(self, name)
+            new = np.zeros((self.capacity,) + old.shape[1:], dtype=old.dtype)
+            new[:self.size] = old[:self.size]
+            setattr(self, name, new)
+
+    @property
+    def states(self):
+        return self._states[:self.size]
+
+    @property
+    def actions(self):
+        return self._actions[:self.size]
+
+    @property
+    def rewards(self):
+        return self._rewards[:self.size]
+
+    @property
+    def log_probs(self):
+        return self._log_probs[:self.size]
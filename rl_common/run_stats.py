@@ -0,0 +1,222 @@
+import collections
+import itertools
+import multiprocessing
+import threading
+import time
+
+import tensorflow as tf
+
+# run statistics shared by the A3C worker threads: the global step and episode counters,
+# the moving average score of the last `window` episodes of all the workers, and one stop
+# condition for all of them (training time or target score), signalled through the
+# tf.train.Coordinator the threads are joined with
+#
+#   stats = RunStats(COORD, training_time, target_score)    # lower_is_better for episode lengths
+#   worker_stats = stats.worker(self.name)
+#   while not stats.should_stop():
+#       step = worker_stats.step()                          # distinct global step numbers
+#       episode, avg_score = worker_stats.end_episode(score)     # requests the stop at the target
+#
+# the counters are itertools.count (next() is atomic under the GIL), the per worker numbers
+# are only written by their own thread, the lock is taken once per episode for the average;
+# the target only counts once the window is full, one lucky episode does not stop the run
+# with shared (a SharedRunStats, worker processes) the counters, the score window, the training
+# time and the stop are those of all the processes, each one builds its RunStats on it
+class RunStats(object):
+    def __init__(self, coordinator = None, training_time = None, target_score = None, lower_is_better = False,
+                 window = 30, shared = None):
+        self.coordinator = coordinator if coordinator is not None else tf.train.Coordinator()
+        self.training_time = training_time
+        self.target_score = target_score
+        self.lower_is_better = lower_is_better
+        self.shared = shared
+
+        if shared is None:
+            self.steps = itertools.count(1)
+            self.episodes = itertools.count(1)
+        else:
+            self.steps, self.episodes = shared.steps, shared.episodes
+            window = shared.window
+        self.scores = collections.deque(maxlen=window)
+        self.avg_score = None
+        self.lock = threading.Lock()
+        self.workers = []
+        self.stop_reason = None
+
+        self.start_time = time.time() if shared is None else shared.start()
+        self.deadline = None if training_time is None else self.start_time + training_time
+
+        # a resumed run goes on from the counters of the checkpoint, see restore
+        self.step_offset = 0
+        self.episode_offset = 0
+        self.time_offset = 0.
+
+    # the statistics of one worker thread, the same ones again for a worker that restarts
+    def worker(self, name):
+        with self.lock:
+            for worker_stats in self.workers:
+                if worker_stats.name == name:
+                    return worker_stats
+            worker_stats = WorkerStats(self, name)
+            self.workers.append(worker_stats)
+        return worker_stats
+
+    # checked every step, a stop requested by any thread (or the coordinator) is seen at once
+    def should_stop(self):
+        if self.coordinator.should_stop():
+            return True
+        if self.shared is not None and self.shared.stop.is_set():
+            self.request_stop(self.shared.stop_reason())
+            return True
+        if self.deadline is not None and time.time() >= self.deadline:
+            self.request_stop('training time')
+            return True
+        return False
+
+    def request_stop(self, reason):
+        with self.lock:
+            if self.stop_reason is None:
+                self.stop_reason = reason
+        if self.shared is not None:
+            self.shared.request_stop(reason)
+        self.coordinator.request_stop()
+
+    def _end_episode(self, score):
+        episode = next(self.episodes)
+        if self.shared is not None:
+            avg_score, full = self.shared.add_score(score)
+        else:
+            with self.lock:
+                self.scores.append(score)
+                avg_score = sum(self.scores) / float(len(self.scores))
+                full = len(self.scores) == self.scores.maxlen
+        self.avg_score = avg_score
+
+        if self.target_score is not None and full:
+            if avg_score <= self.target_score if self.lower_is_better else avg_score >= self.target_score:
+                self.request_stop('target score')
+        return episode, avg_score
+
+    # the counters, the score window and the training time used, pickled with a checkpoint
+    def state(self):
+        with self.lock:
+            scores = list(self.scores)
+        return {'steps': self.step_offset + sum(worker.steps for worker in self.workers),
+                'episodes': self.episode_offset + sum(worker.episodes for worker in self.workers),
+                'scores': scores, 'avg_score': self.avg_score,
+                'training_time': self.time_offset + time.time() - self.start_time}
+
+    # before the workers start: go on from state(), training_time is the budget of the whole run
+    def restore(self, state):
+        self.step_offset, self.episode_offset = state['steps'], state['episodes']
+        self.steps = itertools.count(self.step_offset + 1)
+        self.episodes = itertools.count(self.episode_offset + 1)
+        self.scores.clear()
+        self.scores.extend(state['scores'])
+        self.avg_score = state['avg_score']
+        self.time_offset = state['training_time']
+        if self.training_time is not None:
+            self.deadline = self.start_time + max(self.training_time - self.time_offset, 0.)
+
+    def report(self):
+        elapsed = max(time.time() - self.start_time, 1e-9)
+        steps = [worker.steps for worker in self.workers]
+        episodes = sum(worker.episodes for worker in self.workers)
+        avg_score = float('nan') if self.avg_score is None else self.avg_score
+        return ' run : {:,d} steps / {:,d} episodes / {:,.0f} steps/sec / {:,d} - {:,d} steps per worker'.format(
+                   sum(steps), episodes, sum(steps) / elapsed, min(steps or [0]), max(steps or [0])) + \
+               ' / last {:d} avg {:.1f} / stopped by {}'.format(
+                   self.scores.maxlen, avg_score, self.stop_reason or 'the workers') + \
+               (' / resumed at step {:,d}'.format(self.step_offset) if self.step_offset else '')
+
+# counters of one worker, only its own thread writes them
+class WorkerStats(object):
+    def __init__(self, run_stats, name):
+        self.run_stats = run_stats
+        self.name = name
+        self.steps = 0
+        self.episodes = 0
+
+    # the global step number of this step
+    def step(self):
+        self.steps += 1
+        return next(self.run_stats.steps)
+
+    # the global episode number and the moving average score of all the workers
+    def end_episode(self, score):
+        self.episodes += 1
+        return self.run_stats._end_episode(score)
+
+
+# a counter in shared memory, next() as on itertools.count
+class SharedCounter(object):
+    def __init__(self, ctx, start = 1):
+        self.value = ctx.Value('q', start - 1)
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        with self.value.get_lock():
+            self.value.value += 1
+            return self.value.value
+
+# the shared part of RunStats for workers that are processes (Hogwild): the step and episode
+# counters, the score window and a stop event, made by the parent with the context the processes
+# are started with and handed to each of them in its Process(args=...)
+#
+#   shared_stats = SharedRunStats(hogwild_context())                              # parent
+#   run_hogwild(hogwild_work, N_WORKERS, (shared_params, shared_stats))
+#   print(shared_stats.report())
+#   worker.stats = RunStats(None, training_time, target_score, shared=shared_stats)   # process
+#
+# one process reaching the target (or the training time) stops the others within one step; the
+# training time counts from the first process that is ready (building the graphs of the processes
+# is not part of it), a process that starts late does not run longer
+class SharedRunStats(object):
+    def __init__(self, ctx = None, window = 30):
+        if ctx is None:
+            ctx = multiprocessing
+        self.window = window
+        self.start_time = ctx.RawValue('d', 0.)     # 0 until the first RunStats is built on it
+        self.steps = SharedCounter(ctx)
+        self.episodes = SharedCounter(ctx)
+        self.stop = ctx.Event()
+        self.lock = ctx.Lock()
+        self._scores = ctx.RawArray('d', window)
+        self._n_scores = ctx.RawValue('q', 0)     # scores added, the window holds the last `window`
+        self._stop_reason = ctx.RawArray('c', 32)
+
+    # the start time of the run, the time of the first call
+    def start(self):
+        with self.lock:
+            if not self.start_time.value:
+                self.start_time.value = time.time()
+            return self.start_time.value
+
+    # (moving average of the window, whether it is full)
+    def add_score(self, score):
+        with self.lock:
+            self._scores[self._n_scores.value % self.window] = score
+            self._n_scores.value += 1
+            n = min(self._n_scores.value, self.window)
+            return sum(self._scores[:n]) / float(n), n == self.window
+
+    def request_stop(self, reason):
+        with self.lock:
+            if not self._stop_reason.value:
+                self._stop_reason.value = reason.encode('ascii')[:len(self._stop_reason) - 1]
+        self.stop.set()
+
+    def stop_reason(self):
+        return self._stop_reason.value.decode('ascii') or None
+
+    def report(self):
+        with self.lock:
+            n = min(self._n_scores.value, self.window)
+            avg_score = sum(self._scores[:n]) / float(n) if n else float('nan')
+        elapsed = max(time.time() - self.start(), 1e-9)
+        steps = self.steps.value.value
+        return ' run : {:,d} steps / {:,d} episodes / {:,.0f} steps/sec / last {:d} avg {:.1f} / stopped by {}'.format(
+                   steps, self.episodes.value.value, steps / elapsed, self.window, avg_score,
+                   self.stop_reason() or 'the workers')
@@ -0,0 +1,22 @@
+import tensorflow as tf
+
+# action selection in the graph: a step fetches one int32 action per row of states
+# instead of the probability vector, and np.random.choice leaves the hot loop
+#
+#   self.sampled_action, self.greedy_action = sample_action(self.actor_predict, seed)
+#   action = self.act_fn(state_t)[0]
+#
+# the sample op keeps its own RNG state, so every worker draws from its own stream
+# instead of sharing NumPy's global one; greedy_action is the argmax, for evaluation
+def sample_action(logits, seed = None):
+    sampled_action = tf.squeeze(tf.multinomial(logits, 1, seed=seed, output_dtype=tf.int32), axis=1)
+    greedy_action = tf.argmax(logits, axis=1, output_type=tf.int32)
+    return sampled_action, greedy_action
+
+# log pi(action | state) of int32 actions, from the logits
+def action_log_prob(logits, action):
+    return -tf.nn.sparse_softmax_cross_entropy_with_logits(labels=action, logits=logits)
+
+# worker i of an A3C run samples with seed + i, None stays None (TF picks a seed)
+def worker_seed(seed, index):
+    return None if seed is None else seed + index
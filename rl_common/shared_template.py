@@ -0,0 +1,92 @@
+import collections
+
+import numpy as np
+import tensorflow as tf
+from tensorflow.python.ops.resource_variable_ops import ResourceVariable
+
+from rl_common.param_sync import VersionedPull
+
+# the local networks of the A3C workers as views of one template network: the template (W_0)
+# is built as usual, every other local agent builds no ops and no variables, it takes the
+# tensors and ops of the template (model, loss, gradients, push, sampling) and runs them with
+# its own snapshot of the master weights fed into the template's variables (a fed variable
+# reads as the fed value), so the graph, the build time and the session's memory no longer
+# grow with N_WORKERS
+#
+#   if template is not None:        # a view
+#       self.__dict__.update(graph_attrs(template))
+#       self.template_weights = TemplateWeights(sess, self.model_params, master_agent.model_params,
+#                                               master_agent.params_version, PULL_MAX_STALENESS)
+#   self.act_fn = self.template_weights.make_callable([self.sampled_action], [self.state])
+#   self.versioned_pull = self.template_weights     # pull() refreshes the snapshot
+#
+# the template's own weights stay its own, the views never write them; the weights of a
+# view are NumPy arrays in its TemplateWeights, they are not saved with the checkpoint
+#
+# only ref variables (the TF1 default, use_resource=False) can be fed this way: a fed resource
+# variable is a fed handle, its reads still see the template's weights, so every view would
+# silently act and learn with W_0's; TemplateWeights refuses a template with resource variables
+#
+# USE_SHARED_TEMPLATE of the A3C scripts (threaded mode): the learner and the workers the pool
+# adds are views too
+def graph_attrs(agent):
+    return dict((name, value) for name, value in vars(agent).items() if _is_graph_element(value))
+
+def _is_graph_element(value):
+    if isinstance(value, (list, tuple)):
+        return len(value) > 0 and all(_is_graph_element(item) for item in value)
+    return isinstance(value, (tf.Tensor, tf.Operation, tf.Variable))
+
+# the weights of one view: a VersionedPull that copies the master into NumPy instead of into
+# variables, and a session for the view's handles that feeds them with every call
+#   make_callable(fetches, feed_list) / run(fetches, feed_dict), as tf.Session
+# the first call pulls
+class TemplateWeights(VersionedPull):
+    def __init__(self, sess, template_params, master_params, params_version, max_staleness = 0):
+        self.sess = sess
+        self.graph = sess.graph
+        self.params_version = params_version
+        self.max_staleness = max_staleness
+
+        self.template_params = list(template_params)
+        resource_params = [param.name for param in self.template_params if isinstance(param, ResourceVariable)]
+        if resource_params:
+            raise ValueError('the template weights must be ref variables (use_resource=False), '
+                             'a fed resource variable is not read: %s' % ', '.join(resource_params))
+        self.n_variables = len(self.template_params)
+        self.size = sum(int(np.prod(param.get_shape().as_list())) for param in self.template_params)
+        self.nbytes = 4 * self.size     # float32
+        self.fetch_fn = sess.make_callable(list(master_params))
+        self.values = None
+
+        self.version = None
+        self.n_requests = 0
+        self.n_pulls = 0
+        self.staleness = collections.Counter()
+
+    def _copy(self):
+        self.values = tuple(self.fetch_fn())
+
+    def _feed_values(self):
+        if self.values is None:
+            self.pull()
+        return self.values
+
+    def make_callable(self, fetches, feed_list = ()):
+        feed_list = list(feed_list)
+        fn = self.sess.make_callable(fetches, feed_list + self.template_params)
+
+        def run(*args):
+            return fn(*(args + self._feed_values()))
+        return run
+
+    def run(self, fetches, feed_dict = None):
+        # the weights themselves (NumpyPolicy.sync) need no session call
+        indices = dict((id(param), index) for index, param in enumerate(self.template_params))
+        if not feed_dict and isinstance(fetches, list) and all(id(fetch) in indices for fetch in fetches):
+            values = self._feed_values()
+            return [values[indices[id(fetch)]] for fetch in fetches]
+
+        feed_dict = dict(feed_dict or {})
+        feed_dict.update(zip(self.template_params, self._feed_values()))
+        return self.sess.run(fetches, feed_dict)
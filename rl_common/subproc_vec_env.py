@@ -0,0 +1,169 @@
+import multiprocessing
+
+import numpy as np
+
+# process-pool vector env: every environment runs in its own child process
+# observations, rewards and dones come back through preallocated shared memory,
+# the pipes only carry one byte commands and acknowledgements
+#
+#   vec_env = SubprocVecEnv(env_name, num_envs, seed)     # child i is seeded with seed + i
+#   obs = vec_env.reset()                                 # [N, observation_size]
+#   obs, rewards, dones, infos = vec_env.step(actions)    # actions: [N] int
+#   vec_env.close()
+#
+# get_env(index) returns a gym style handle on one child, so each A3C Worker
+# thread can step its own process while the others keep running
+_STEP, _RESET, _CLOSE = b's', b'r', b'c'
+
+def _worker(conn, env_name, index, seed, unwrapped, auto_reset, shared, num_envs, observation_size):
+    import gym
+
+    env = gym.make(env_name)
+    if unwrapped:
+        env = env.unwrapped
+    if seed is not None:
+        env.seed(seed + index)
+
+    obs = np.frombuffer(shared['obs'], np.float32).reshape(num_envs, observation_size)
+    terminal_obs = np.frombuffer(shared['terminal_obs'], np.float32).reshape(num_envs, observation_size)
+    rewards = np.frombuffer(shared['rewards'], np.float32)
+    dones = np.frombuffer(shared['dones'], np.uint8)
+    actions = np.frombuffer(shared['actions'], np.int64)
+
+    try:
+        while True:
+            cmd = conn.recv_bytes()
+            if cmd == _STEP:
+                next_state, reward, done, _ = env.step(int(actions[index]))
+                terminal_obs[index] = next_state
+                if done and auto_reset:
+                    next_state = env.reset()
+                obs[index] = next_state
+                rewards[index] = reward
+                dones[index] = done
+            elif cmd == _RESET:
+                obs[index] = env.reset()
+            elif cmd == _CLOSE:
+                break
+            conn.send_bytes(b'')
+    except (KeyboardInterrupt, EOFError):
+        pass
+    finally:
+        env.close()
+        conn.close()
+
+
+class SubprocVecEnv(object):
+    def __init__(self, env_name, num_envs, seed = None, unwrapped = True, auto_reset = True, start_method = None):
+        import gym
+
+        # forkserver (else spawn) keeps the children clear of the session threads of the parent;
+        # both re-import the script's __main__ in every child, so a script that imports
+        # TensorFlow and makes its env at module level does that there too (no session is made)
+        if start_method is None:
+            methods = multiprocessing.get_all_start_methods()
+            start_method = 'forkserver' if 'forkserver' in methods else 'spawn'
+        ctx = multiprocessing.get_context(start_method)
+
+        probe = gym.make(env_name)
+        self.observation_space = probe.observation_space
+        self.action_space = probe.action_space
+        probe.close()
+
+        self.env_name = env_name
+        self.num_envs = num_envs
+        self.observation_size = int(np.prod(self.observation_space.shape))
+
+        shared = {
+            'obs': ctx.RawArray('f', num_envs * self.observation_size),
+            'terminal_obs': ctx.RawArray('f', num_envs * self.observation_size),
+            'rewards': ctx.RawArray('f', num_envs),
+            'dones': ctx.RawArray('B', num_envs),
+            'actions': ctx.RawArray('q', num_envs),
+        }
+        self.obs = np.frombuffer(shared['obs'], np.float32).reshape(num_envs, self.observation_size)
+        self.terminal_obs = np.frombuffer(shared['terminal_obs'], np.float32).reshape(num_envs, self.observation_size)
+        self.rewards = np.frombuffer(shared['rewards'], np.float32)
+        self.dones = np.frombuffer(shared['dones'], np.uint8)
+        self.actions = np.frombuffer(shared['actions'], np.int64)
+
+        self.conns, self.processes = [], []
+        for index in range(num_envs):
+            parent_conn, child_conn = ctx.Pipe()
+            process = ctx.Process(target=_worker, name='%s-%d' % (env_name, index),
+                                  args=(child_conn, env_name, index, seed, unwrapped, auto_reset,
+                                        shared, num_envs, self.observation_size))
+            process.daemon = True
+            process.start()
+            child_conn.close()
+            self.conns.append(parent_conn)
+            self.processes.append(process)
+        self.closed = False
+
+    def _send(self, cmd, indices):
+        for index in indices:
+            self.conns[index].send_bytes(cmd)
+        for index in indices:
+            self.conns[index].recv_bytes()
+
+    def reset(self):
+        self._send(_RESET, range(self.num_envs))
+        return self.obs.copy()
+
+    def step_async(self, actions):
+        self.actions[:] = actions
+        for conn in self.conns:
+            conn.send_bytes(_STEP)
+
+    def step_wait(self):
+        for conn in self.conns:
+            conn.recv_bytes()
+        infos = {'terminal_observation': self.terminal_obs.copy()}
+        return self.obs.copy(), self.rewards.copy(), self.dones.astype(bool), infos
+
+    def step(self, actions):
+        self.step_async(actions)
+        return self.step_wait()
+
+    def get_env(self, index):
+        return SubprocEnv(self, index)
+
+    def close(self):
+        if self.closed:
+            return
+        for conn in self.conns:
+            try:
+                conn.send_bytes(_CLOSE)
+            except (BrokenPipeError, EOFError):
+                pass
+        for process in self.processes:
+            process.join(timeout=1)
+            if process.is_alive():
+                process.terminate()
+        self.closed = True
+
+
+# gym style view on one child of a SubprocVecEnv, drop-in for `env` in the rollout loops
+class SubprocEnv(object):
+    def __init__(self, vec_env, index):
+        self.vec_env = vec_env
+        self.index = index
+        self.conn = vec_env.conns[index]
+        self.observation_space = vec_env.observation_space
+        self.action_space = vec_env.action_space
+
+    def reset(self):
+        self.conn.send_bytes(_RESET)
+        self.conn.recv_bytes()
+        return self.vec_env.obs[self.index].copy()
+
+    def step(self, action):
+        index = self.index
+        self.vec_env.actions[index] = action
+        self.conn.send_bytes(_STEP)
+        self.conn.recv_bytes()
+        return (self.vec_env.obs[index].copy(), float(self.vec_env.rewards[index]),
+                bool(self.vec_env.dones[index]), {})
+
+    def close(self):
+        pass
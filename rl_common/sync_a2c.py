@@ -0,0 +1,122 @@
+import time
+
+import numpy as np
+
+from rl_common.returns import discount_cumsum
+
+# synchronous A2C on the graph and losses of a script's own agent (Type A, B or C):
+# the N copies of a VecEnv are stepped in lockstep with one batched forward per step,
+# and every [N, T] rollout is one update through agent.train_fn
+#
+#   vec_env = make_vec_env(env_name, SYNC_NUM_ENVS, max_episode_steps=agent.ep_trial_step)
+#   trainer = SyncA2C(agent, vec_env, SYNC_N_STEPS)
+#   episodes, scores = trainer.run(start_time + agent.training_time, lambda avg_score: avg_score < 490)
+#
+# the agent provides the state / action / q_target placeholders, sampled_action, value,
+# train_fn(feed_dict) and numpy_policy (and optionally an AsyncCheckpointer as checkpointer);
+# q_target is the n-step return bootstrapped from V of the states after the rollout, an
+# episode cut by the time limit gets gamma * V(terminal observation) added to its last reward
+class SyncA2C(object):
+    def __init__(self, agent, vec_env, n_steps, discount_factor = None):
+        self.agent = agent
+        self.env = vec_env
+        self.num_envs = vec_env.num_envs
+        self.n_steps = n_steps
+        self.discount_factor = agent.discount_factor if discount_factor is None else discount_factor
+
+        state_size = vec_env.observation_size
+        self.states = np.zeros((self.num_envs, n_steps, state_size), dtype=np.float32)
+        self.actions = np.zeros((self.num_envs, n_steps), dtype=np.int32)
+        self.rewards = np.zeros((self.num_envs, n_steps), dtype=np.float64)
+        self.dones = np.zeros((self.num_envs, n_steps), dtype=bool)
+        self.ep_steps = np.zeros(self.num_envs, dtype=np.int64)
+
+        self.act_fn = agent.sess.make_callable([agent.sampled_action, agent.value], [agent.state])
+        self.value_fn = agent.sess.make_callable(agent.value, [agent.state])
+
+        self.obs = None
+        self.next_actions = None
+        self.episodes, self.scores = [], []
+        self.n_updates = 0
+
+    # actions and values of [N] states, one forward pass
+    def _act(self, states):
+        numpy_policy = self.agent.numpy_policy
+        if numpy_policy is not None:
+            return numpy_policy.sample(states, self.agent.random)[0], numpy_policy.value(states)[:, 0]
+        actions, values = self.act_fn(states)
+        return actions, values[:, 0]
+
+    def _value(self, states):
+        if self.agent.numpy_policy is not None:
+            return self.agent.numpy_policy.value(states)[:, 0]
+        return self.value_fn(states)[:, 0]
+
+    # T steps of all N environments, returns V of the states after the last one
+    # the forward pass on those states also samples the first actions of the next rollout
+    def rollout(self):
+        agent = self.agent
+        for t in range(self.n_steps):
+            self.states[:, t] = self.obs
+            self.actions[:, t] = self.next_actions
+            self.obs, rewards, dones, infos = self.env.step(self.next_actions)
+
+            truncated = infos['truncated']
+            if truncated.any():
+                rewards = rewards + self.discount_factor * truncated * self._value(infos['terminal_observation'])
+            self.rewards[:, t] = rewards
+            self.dones[:, t] = dones
+
+            agent.step += self.num_envs
+            self.ep_steps += 1
+            for index in np.flatnonzero(dones):
+                self._end_episode(self.ep_steps[index])
+                self.ep_steps[index] = 0
+
+            self.next_actions, values = self._act(self.obs)
+        return values
+
+    def _end_episode(self, ep_step):
+        agent = self.agent
+        agent.episode += 1
+        self.scores.append(ep_step)
+        self.episodes.append(agent.episode)
+        avg_score = np.mean(self.scores[-min(30, len(self.scores)):])
+
+        print('episode :{:>6,d}'.format(agent.episode),'/ ep step :{:>5,d}'.format(int(ep_step)), \
+              '/ time step :{:>8,d}'.format(agent.step),'/ last 30 avg :{:> 4.1f}'.format(avg_score) )
+
+    # one update on the whole [N, T] rollout
+    def update(self, last_values):
+        agent = self.agent
+        q_target = discount_cumsum(self.rewards, self.discount_factor, last_values, self.dones)
+
+        feed_dict={
+            agent.state: self.states.reshape(-1, self.states.shape[2]),
+            agent.action: self.actions.reshape(-1),
+            agent.q_target: q_target.reshape(-1, 1).astype(np.float32)
+        }
+        agent.train_fn(feed_dict)
+
+        if agent.numpy_policy is not None:
+            agent.numpy_policy.sync()
+        self.n_updates += 1
+        if getattr(agent, 'checkpointer', None) is not None:
+            agent.checkpointer.update()
+
+    # train until end_time, or until keep_training(avg of the last 30 scores) is False
+    def run(self, end_time, keep_training):
+        agent = self.agent
+        for name in ('step', 'episode'):
+            if not hasattr(agent, name):
+                setattr(agent, name, 0)
+
+        self.obs = self.env.reset()
+        self.ep_steps[:] = 0
+        self.next_actions = self._act(self.obs)[0]
+
+        while time.time() < end_time:
+            self.update(self.rollout())
+            if self.scores and not keep_training(np.mean(self.scores[-min(30, len(self.scores)):])):
+                break
+        return self.episodes, self.scores
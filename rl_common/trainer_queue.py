@@ -0,0 +1,164 @@
+import threading
+import queue
+import time
+
+import numpy as np
+
+# one (state, action, return) segment of a worker, and the policy version it acted with
+class _Segment(object):
+    def __init__(self, states, actions, q_target, policy_version):
+        self.states = np.array(states, dtype=np.float32)
+        self.actions = np.array(actions, dtype=np.int32)
+        self.q_target = np.array(q_target, dtype=np.float32).reshape(-1, 1)
+        self.policy_version = policy_version
+
+# GA3C style central learner for the A3C workers
+# the workers only put their segments into a bounded queue, this thread concatenates
+# them into batches of about batch_size samples and applies one update per batch,
+# so the backward pass runs once per batch instead of once per worker segment
+#
+#   trainer_queue = TrainerQueue(learner.update_global, learner.pull_global,
+#                                learner.state, learner.action, learner.q_target, TRAINER_BATCH_SIZE)
+#   trainer_queue.put(states, actions, q_target, policy_version)     # worker, blocks when full
+#   policy_version = trainer_queue.version                            # then pull_global
+#
+# version counts the updates; the policy lag of a sample is the number of updates
+# between the weights it was collected with and the update that trains on it
+# an exception of an update stops the thread: the next put of every worker raises a
+# RuntimeError (a worker blocked on the full queue too) instead of waiting for a trainer
+# that is gone, stop() does not
+class TrainerQueue(threading.Thread):
+    def __init__(self, update_fn, sync_fn, state, action, q_target, batch_size,
+                 max_queue_size = 12, max_wait = 0.005):
+        threading.Thread.__init__(self, name = type(self).__name__)
+        self.daemon = True
+
+        self.update_fn = update_fn  # feed_dict -> one update of the master network
+        self.sync_fn = sync_fn      # called after every update (the learner pulls the master), or None
+        self.state = state          # placeholders of the learner network
+        self.action = action
+        self.q_target = q_target
+        self.batch_size = batch_size
+        self.max_wait = max_wait    # seconds to wait for a batch to fill up
+
+        self.segments = queue.Queue(maxsize = max_queue_size)
+        self.stop_event = threading.Event()
+        self.version = 0
+        self.error = None           # of the update that failed, the thread ended with it
+
+        # statistics
+        self.n_segments = 0
+        self.n_samples = 0
+        self.n_batches = 0
+        self.depth_sum = 0
+        self.depth_max = 0
+        self.lag_sum = 0
+        self.lag_max = 0
+        self.n_blocked = 0
+        self.blocked_time = 0.
+        self.start_time = None
+        self.stop_time = None
+
+    # called by a worker thread, blocks while the queue is full (backpressure)
+    def put(self, states, actions, q_target, policy_version):
+        self._put(_Segment(states, actions, q_target, policy_version))
+
+    def _put(self, segment):
+        self._check()
+        try:
+            self.segments.put_nowait(segment)
+        except queue.Full:
+            start = time.time()
+            while True:
+                try:
+                    self.segments.put(segment, timeout=0.1)
+                    break
+                except queue.Full:
+                    self._check()
+            self.n_blocked += 1
+            self.blocked_time += time.time() - start
+
+    def _check(self):
+        if self.error is not None:
+            raise RuntimeError('the %s failed: %r' % (self.name, self.error))
+        if self.stop_event.is_set():
+            raise RuntimeError('the %s is stopped' % self.name)
+
+    def run(self):
+        self.start_time = time.time()
+        try:
+            self._run()
+        except Exception as error:
+            self.error = error
+        self.stop_time = time.time()
+
+    def _run(self):
+        while not self.stop_event.is_set():
+            try:
+                batch = [self.segments.get(timeout=0.1)]
+            except queue.Empty:
+                continue
+            depth = self.segments.qsize() + 1
+
+            n_samples = len(batch[0].actions)
+            deadline = time.time() + self.max_wait
+            while n_samples < self.batch_size:
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self.segments.get(timeout=remaining))
+                except queue.Empty:
+                    break
+                n_samples += len(batch[-1].actions)
+
+            self._train(batch, depth)
+
+    # the update of one batch of segments
+    def _feed_dict(self, batch):
+        return {
+            self.state: np.concatenate([segment.states for segment in batch]),
+            self.action: np.concatenate([segment.actions for segment in batch]),
+            self.q_target: np.concatenate([segment.q_target for segment in batch])
+        }
+
+    def _train(self, batch, depth):
+        feed_dict = self._feed_dict(batch)
+        self.update_fn(feed_dict)
+        if self.sync_fn is not None:
+            self.sync_fn()
+
+        for segment in batch:
+            lag = self.version - segment.policy_version
+            self.lag_sum += lag * len(segment.actions)
+            if lag > self.lag_max:
+                self.lag_max = lag
+        self.version += 1
+
+        self.n_segments += len(batch)
+        self.n_samples += len(feed_dict[self.action])
+        self.n_batches += 1
+        self.depth_sum += depth
+        if depth > self.depth_max:
+            self.depth_max = depth
+
+    # stop after the segments still in the queue are trained on (at once after a failure)
+    def stop(self):
+        while not self.segments.empty() and self.is_alive():
+            time.sleep(0.01)
+        self.stop_event.set()
+        if self.is_alive():
+            self.join()
+
+    def report(self):
+        n_batches = max(self.n_batches, 1)
+        elapsed = max((self.stop_time or time.time()) - (self.start_time or time.time()), 1e-9)
+
+        return ' trainer : {:,d} segments / {:,d} samples / {:,d} updates / avg batch {:.1f} samples'.format(
+                    self.n_segments, self.n_samples, self.n_batches, self.n_samples / float(n_batches)) + \
+               ' / queue depth avg {:.2f}, max {:d} / policy lag avg {:.2f}, max {:d} updates'.format(
+                    self.depth_sum / float(n_batches), self.depth_max,
+                    self.lag_sum / float(max(self.n_samples, 1)), self.lag_max) + \
+               ' / {:,d} blocked puts ({:.2f} s) / {:,.1f} updates/sec{}'.format(
+                    self.n_blocked, self.blocked_time, self.n_batches / elapsed,
+                    ' / failed: %r' % self.error if self.error is not None else '')
@@ -0,0 +1,205 @@
+import os
+import queue
+import re
+import shutil
+import threading
+import time
+
+import numpy as np
+
+# every transition of the rollout loops on disk, for analysis and offline training: a recorder
+# per loop (stream) copies each step into a preallocated chunk of columns, a full chunk goes to
+# the writer thread and the loop goes on in the next free buffer; the writer saves the chunk as
+# save_dir/<stream>/chunk-<n>/<column>.npy (temp dir + rename), np.load(mmap_mode='r') maps it
+#
+#   writer = TrajectoryWriter(model_path + '/trajectories')
+#   recorder = writer.recorder('main', state_size, RECORD_CHUNK_SIZE, RECORD_BUFFERS)     # one per thread
+#   ...
+#   next_state, reward, done, _ = env.step(action)
+#   recorder.append(state, action, reward, done, ep_step == ep_trial_step)
+#   ...
+#   recorder.close()        # the partial chunk
+#   writer.close()          # waits for the chunks in flight
+#   print(writer.report())
+#
+#   for path in chunk_paths(model_path + '/trajectories'):      # stream by stream, in order
+#       chunk = load_chunk(path)        # {'states': memmap [n, state_size], ...}
+#
+# columns: states float32 [n, state_size], actions int8, rewards float32, dones int8 (DONE_TERMINAL
+# when the env ended the episode, DONE_CUT when the loop did, e.g. at the step cap); the memory is
+# n_buffers chunks per stream, an append waits only while all of them are being written
+# a failed write stops the writer: the next append of every recorder raises a RuntimeError
+# (the loop stops instead of blocking on a buffer that never comes back), writer.close() does not
+#
+# USE_TRAJECTORY_RECORDER of the numbered scripts: save_dir is model_path/trajectories, chunks of
+# RECORD_CHUNK_SIZE steps and RECORD_BUFFERS of them per stream; the A3C scripts record one stream
+# per worker thread (threaded mode only), the PG / A2C scripts their own loop, not the USE_SYNC_A2C
+# rollouts
+COLUMNS = ('states', 'actions', 'rewards', 'dones')
+DONE_TERMINAL = 1
+DONE_CUT = 2
+
+def chunk_paths(save_dir):
+    paths = []
+    for stream in sorted(os.listdir(save_dir)):
+        stream_dir = os.path.join(save_dir, stream)
+        if os.path.isdir(stream_dir):
+            indices = sorted(int(match.group(1)) for match in
+                             (re.match(r'chunk-(\d+)$', name) for name in os.listdir(stream_dir)) if match)
+            paths.extend(os.path.join(stream_dir, 'chunk-%06d' % index) for index in indices)
+    return paths
+
+def load_chunk(path, mmap_mode = 'r'):
+    return dict((column, np.load(os.path.join(path, column + '.npy'), mmap_mode=mmap_mode)) for column in COLUMNS)
+
+class TrajectoryWriter(object):
+    def __init__(self, save_dir):
+        self.save_dir = save_dir
+        if not os.path.exists(save_dir):
+            os.makedirs(save_dir)
+        self.queue = queue.Queue()      # (recorder, buffer, n, index), at most the buffers of the recorders
+        self.recorders = []             # open ones, a recorder leaves on close()
+        self.next_index = {}            # per stream, after the chunks of an earlier run
+        self.lock = threading.Lock()
+
+        self.n_chunks = 0
+        self.n_steps = 0
+        self.nbytes = 0
+        self.write_time = 0.
+        self.blocked_time = 0.          # of the closed recorders
+        self.buffer_nbytes = 0          # of the open recorders
+        self.max_buffer_nbytes = 0
+        self.error = None               # of the write that failed, no chunk is written after it
+        self.start_time = time.time()
+
+        self.thread = threading.Thread(target=self._run, name=type(self).__name__)
+        self.thread.daemon = True
+        self.thread.start()
+
+    def recorder(self, stream, state_size, chunk_size = 16384, n_buffers = 2):
+        recorder = TrajectoryRecorder(self, stream, state_size, chunk_size, n_buffers)
+        with self.lock:
+            self.recorders.append(recorder)
+            self.buffer_nbytes += recorder.n_buffers * recorder.chunk_nbytes
+            self.max_buffer_nbytes = max(self.max_buffer_nbytes, self.buffer_nbytes)
+        return recorder
+
+    def _index(self, stream):
+        with self.lock:
+            if stream not in self.next_index:
+                stream_dir = os.path.join(self.save_dir, stream)
+                names = os.listdir(stream_dir) if os.path.isdir(stream_dir) else []
+                for name in names:
+                    if name.startswith('.tmp-'):    # a write cut by a crash
+                        shutil.rmtree(os.path.join(stream_dir, name), ignore_errors=True)
+                indices = [int(match.group(1)) for match in (re.match(r'chunk-(\d+)$', name) for name in names) if match]
+                self.next_index[stream] = max(indices) + 1 if indices else 0
+            index = self.next_index[stream]
+            self.next_index[stream] += 1
+            return index
+
+    def _closed(self, recorder):
+        with self.lock:
+            self.recorders.remove(recorder)
+            self.blocked_time += recorder.blocked_time
+            self.buffer_nbytes -= recorder.n_buffers * recorder.chunk_nbytes
+
+    def _run(self):
+        while True:
+            item = self.queue.get()
+            if item is None:
+                return
+            recorder, buffer, n, index = item
+            if self.error is None:
+                try:
+                    self._write(recorder.stream, buffer, n, index)
+                except Exception as error:
+                    self.error = error
+            recorder.free.put(buffer)       # also after a failure, the recorder raises it
+
+    def _write(self, stream, buffer, n, index):
+        start = time.time()
+        stream_dir = os.path.join(self.save_dir, stream)
+        name = 'chunk-%06d' % index
+        temp_dir = os.path.join(stream_dir, '.tmp-' + name)
+        os.makedirs(temp_dir)
+        nbytes = 0
+        for column in COLUMNS:
+            np.save(os.path.join(temp_dir, column + '.npy'), buffer[column][:n])
+            nbytes += buffer[column][:n].nbytes
+        os.rename(temp_dir, os.path.join(stream_dir, name))
+        self.write_time += time.time() - start
+        self.n_chunks += 1
+        self.n_steps += n
+        self.nbytes += nbytes
+
+    # closes the recorders still open, waits for every chunk to be written and stops the thread
+    def close(self):
+        with self.lock:
+            recorders = list(self.recorders)
+        for recorder in recorders:
+            recorder.close()
+        self.queue.put(None)
+        self.thread.join()
+
+    def report(self):
+        elapsed = max(time.time() - self.start_time, 1e-9)
+        with self.lock:
+            recorders = list(self.recorders)
+        blocked = self.blocked_time + sum(recorder.blocked_time for recorder in recorders)
+        return ' trajectories : {:,d} steps in {:,d} chunks, {:,.1f} MB in {} / write {:,.1f} MB/s in the background ({:.2f} s), {:,.0f} steps/sec recorded / loops blocked {:.3f} s / buffers {:,.1f} MB at most, {:d} recorders open{}'.format(
+                   self.n_steps, self.n_chunks, self.nbytes / 1e6, self.save_dir,
+                   self.nbytes / 1e6 / max(self.write_time, 1e-9), self.write_time, self.n_steps / elapsed, blocked,
+                   self.max_buffer_nbytes / 1e6, len(recorders), ' / write failed: %r' % self.error if self.error is not None else '')
+
+# one stream, appended to by one thread
+class TrajectoryRecorder(object):
+    def __init__(self, writer, stream, state_size, chunk_size, n_buffers):
+        self.writer = writer
+        self.stream = stream
+        self.chunk_size = chunk_size
+        self.n_buffers = n_buffers
+        self.free = queue.Queue()
+        for _ in range(n_buffers):
+            self.free.put({'states': np.zeros([chunk_size, state_size], np.float32),
+                           'actions': np.zeros([chunk_size], np.int8),
+                           'rewards': np.zeros([chunk_size], np.float32),
+                           'dones': np.zeros([chunk_size], np.int8)})
+        self.chunk_nbytes = chunk_size * (4 * state_size + 1 + 4 + 1)
+        self.buffer = self.free.get()
+        self.n = 0
+        self.blocked_time = 0.      # appends waiting for a free buffer
+
+    def append(self, state, action, reward, done, cut = False):
+        buffer, n = self.buffer, self.n
+        buffer['states'][n] = state
+        buffer['actions'][n] = action
+        buffer['rewards'][n] = reward
+        buffer['dones'][n] = DONE_TERMINAL if done else DONE_CUT if cut else 0
+        self.n = n + 1
+        if self.n == self.chunk_size:
+            self._check()
+            self._flush()
+            start = time.time()
+            self.buffer = self.free.get()
+            self.blocked_time += time.time() - start
+            self._check()
+
+    def _check(self):
+        if self.writer.error is not None:
+            raise RuntimeError('the trajectory writer of %s failed: %r' % (self.writer.save_dir, self.writer.error))
+
+    def _flush(self):
+        self.writer.queue.put((self, self.buffer, self.n, self.writer._index(self.stream)))
+        self.buffer, self.n = None, 0
+
+    # the partial chunk (dropped after a failed write); an episode still running is marked cut
+    def close(self):
+        if self.buffer is None:
+            return
+        if self.n > 0 and self.writer.error is None:
+            if not self.buffer['dones'][self.n - 1]:
+                self.buffer['dones'][self.n - 1] = DONE_CUT
+            self._flush()
+        self.buffer = None
+        self.writer._closed(self)
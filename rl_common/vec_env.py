@@ -0,0 +1,243 @@
+import math
+
+import numpy as np
+
+# array-backed reimplementations of the gym classic control tasks
+# N copies are stepped with one NumPy call, finished copies are reset automatically
+#
+#   obs = env.reset()                                   # [N, observation_size]
+#   obs, rewards, dones, infos = env.step(actions)      # actions: [N] int
+#
+# when a copy finishes, obs holds the first observation of its next episode and
+# infos['terminal_observation'] the last observation of the finished one
+class VecEnv(object):
+    observation_size = None
+    action_size = None
+
+    def __init__(self, num_envs, seed = None, max_episode_steps = None, auto_reset = True):
+        self.num_envs = num_envs
+        self.max_episode_steps = max_episode_steps
+        self.auto_reset = auto_reset
+        self.np_random = np.random.RandomState(seed)
+
+        self.state = None
+        self.episode_steps = np.zeros(num_envs, dtype=np.int64)
+        self.obs = np.zeros((num_envs, self.observation_size), dtype=np.float32)
+        self.terminal_obs = np.zeros((num_envs, self.observation_size), dtype=np.float32)
+
+    def seed(self, seed = None):
+        self.np_random = np.random.RandomState(seed)
+
+    def reset(self):
+        self.state = self._reset_state(self.num_envs)
+        self.episode_steps[:] = 0
+        self._get_obs(self.state, self.obs)
+        return self.obs.copy()
+
+    def step(self, actions):
+        actions = np.asarray(actions, dtype=np.int64).reshape(self.num_envs)
+        rewards, dones = self._step_state(actions)
+        self.episode_steps += 1
+
+        truncated = np.zeros(self.num_envs, dtype=bool)
+        if self.max_episode_steps is not None:
+            truncated = ~dones & (self.episode_steps >= self.max_episode_steps)
+            dones = dones | truncated
+
+        self._get_obs(self.state, self.obs)
+        self.terminal_obs[:] = self.obs
+
+        if self.auto_reset and dones.any():
+            index = np.flatnonzero(dones)
+            self.state[index] = self._reset_state(len(index))
+            self.episode_steps[index] = 0
+            self._get_obs(self.state, self.obs)
+
+        infos = {'terminal_observation': self.terminal_obs.copy(), 'truncated': truncated}
+        return self.obs.copy(), rewards, dones, infos
+
+    def _reset_state(self, n):
+        raise NotImplementedError
+
+    def _step_state(self, actions):
+        raise NotImplementedError
+
+    def _get_obs(self, state, out):
+        out[:] = state
+
+
+# CartPole-v1
+class CartPoleVecEnv(VecEnv):
+    observation_size = 4
+    action_size = 2
+
+    gravity = 9.8
+    masscart = 1.0
+    masspole = 0.1
+    total_mass = masspole + masscart
+    length = 0.5  # actually half the pole's length
+    polemass_length = masspole * length
+    force_mag = 10.0
+    tau = 0.02  # seconds between state updates
+
+    theta_threshold_radians = 12 * 2 * math.pi / 360
+    x_threshold = 2.4
+
+    def _reset_state(self, n):
+        return self.np_random.uniform(low=-0.05, high=0.05, size=(n, 4))
+
+    def _step_state(self, actions):
+        x, x_dot, theta, theta_dot = self.state.T
+        force = np.where(actions == 1, self.force_mag, -self.force_mag)
+        costheta = np.cos(theta)
+        sintheta = np.sin(theta)
+
+        temp = (force + self.polemass_length * theta_dot ** 2 * sintheta) / self.total_mass
+        thetaacc = (self.gravity * sintheta - costheta * temp) / (
+            self.length * (4.0 / 3.0 - self.masspole * costheta ** 2 / self.total_mass))
+        xacc = temp - self.polemass_length * thetaacc * costheta / self.total_mass
+
+        # euler
+        x = x + self.tau * x_dot
+        x_dot = x_dot + self.tau * xacc
+        theta = theta + self.tau * theta_dot
+        theta_dot = theta_dot + self.tau * thetaacc
+
+        self.state = np.stack([x, x_dot, theta, theta_dot], axis=1)
+
+        dones = (x < -self.x_threshold) | (x > self.x_threshold) | \
+                (theta < -self.theta_threshold_radians) | (theta > self.theta_threshold_radians)
+        rewards = np.ones(self.num_envs, dtype=np.float32)
+        return rewards, dones
+
+
+# MountainCar-v0
+class MountainCarVecEnv(VecEnv):
+    observation_size = 2
+    action_size = 3
+
+    min_position = -1.2
+    max_position = 0.6
+    max_speed = 0.07
+    goal_position = 0.5
+    goal_velocity = 0
+
+    force = 0.001
+    gravity = 0.0025
+
+    def _reset_state(self, n):
+        state = np.zeros((n, 2))
+        state[:, 0] = self.np_random.uniform(low=-0.6, high=-0.4, size=n)
+        return state
+
+    def _step_state(self, actions):
+        position, velocity = self.state.T
+        velocity = velocity + (actions - 1) * self.force + np.cos(3 * position) * (-self.gravity)
+        velocity = np.clip(velocity, -self.max_speed, self.max_speed)
+        position = position + velocity
+        position = np.clip(position, self.min_position, self.max_position)
+        velocity[(position == self.min_position) & (velocity < 0)] = 0
+
+        self.state = np.stack([position, velocity], axis=1)
+
+        dones = (position >= self.goal_position) & (velocity >= self.goal_velocity)
+        rewards = np.full(self.num_envs, -1.0, dtype=np.float32)
+        return rewards, dones
+
+
+# Acrobot-v1 ("book" dynamics, no torque noise)
+class AcrobotVecEnv(VecEnv):
+    observation_size = 6
+    action_size = 3
+
+    dt = 0.2
+
+    LINK_LENGTH_1 = 1.0  # [m]
+    LINK_LENGTH_2 = 1.0  # [m]
+    LINK_MASS_1 = 1.0  #: [kg] mass of link 1
+    LINK_MASS_2 = 1.0  #: [kg] mass of link 2
+    LINK_COM_POS_1 = 0.5  #: [m] position of the center of mass of link 1
+    LINK_COM_POS_2 = 0.5  #: [m] position of the center of mass of link 2
+    LINK_MOI = 1.0  #: moments of inertia for both links
+
+    MAX_VEL_1 = 4 * math.pi
+    MAX_VEL_2 = 9 * math.pi
+
+    AVAIL_TORQUE = np.array([-1.0, 0.0, +1])
+
+    def _reset_state(self, n):
+        # gym draws the initial state in float32
+        return self.np_random.uniform(low=-0.1, high=0.1, size=(n, 4)).astype(np.float32).astype(np.float64)
+
+    def _dsdt(self, s, a):
+        m1 = self.LINK_MASS_1
+        m2 = self.LINK_MASS_2
+        l1 = self.LINK_LENGTH_1
+        lc1 = self.LINK_COM_POS_1
+        lc2 = self.LINK_COM_POS_2
+        I1 = self.LINK_MOI
+        I2 = self.LINK_MOI
+        g = 9.8
+        theta1, theta2, dtheta1, dtheta2 = s.T
+
+        d1 = m1 * lc1 ** 2 + m2 * (l1 ** 2 + lc2 ** 2 + 2 * l1 * lc2 * np.cos(theta2)) + I1 + I2
+        d2 = m2 * (lc2 ** 2 + l1 * lc2 * np.cos(theta2)) + I2
+        phi2 = m2 * lc2 * g * np.cos(theta1 + theta2 - math.pi / 2.0)
+        phi1 = -m2 * l1 * lc2 * dtheta2 ** 2 * np.sin(theta2) \
+               - 2 * m2 * l1 * lc2 * dtheta2 * dtheta1 * np.sin(theta2) \
+               + (m1 * lc1 + m2 * l1) * g * np.cos(theta1 - math.pi / 2) + phi2
+        ddtheta2 = (a + d2 / d1 * phi1 - m2 * l1 * lc2 * dtheta1 ** 2 * np.sin(theta2) - phi2) / \
+                   (m2 * lc2 ** 2 + I2 - d2 ** 2 / d1)
+        ddtheta1 = -(d2 * ddtheta2 + phi1) / d1
+        return np.stack([dtheta1, dtheta2, ddtheta1, ddtheta2], axis=1)
+
+    @staticmethod
+    def _wrap(x, m, M):
+        diff = M - m
+        while (x > M).any():
+            x = np.where(x > M, x - diff, x)
+        while (x < m).any():
+            x = np.where(x < m, x + diff, x)
+        return x
+
+    def _step_state(self, actions):
+        torque = self.AVAIL_TORQUE[actions]
+
+        # one rk4 step over [0, dt]
+        s = self.state
+        dt, dt2 = self.dt, self.dt / 2.0
+        k1 = self._dsdt(s, torque)
+        k2 = self._dsdt(s + dt2 * k1, torque)
+        k3 = self._dsdt(s + dt2 * k2, torque)
+        k4 = self._dsdt(s + dt * k3, torque)
+        ns = s + dt / 6.0 * (k1 + 2 * k2 + 2 * k3 + k4)
+
+        ns[:, 0] = self._wrap(ns[:, 0], -math.pi, math.pi)
+        ns[:, 1] = self._wrap(ns[:, 1], -math.pi, math.pi)
+        ns[:, 2] = np.clip(ns[:, 2], -self.MAX_VEL_1, self.MAX_VEL_1)
+        ns[:, 3] = np.clip(ns[:, 3], -self.MAX_VEL_2, self.MAX_VEL_2)
+        self.state = ns
+
+        dones = -np.cos(ns[:, 0]) - np.cos(ns[:, 1] + ns[:, 0]) > 1.0
+        rewards = np.where(dones, 0.0, -1.0).astype(np.float32)
+        return rewards, dones
+
+    def _get_obs(self, state, out):
+        out[:, 0] = np.cos(state[:, 0])
+        out[:, 1] = np.sin(state[:, 0])
+        out[:, 2] = np.cos(state[:, 1])
+        out[:, 3] = np.sin(state[:, 1])
+        out[:, 4] = state[:, 2]
+        out[:, 5] = state[:, 3]
+
+
+VEC_ENVS = {
+    'CartPole-v1': CartPoleVecEnv,
+    'MountainCar-v0': MountainCarVecEnv,
+    'Acrobot-v1': AcrobotVecEnv,
+}
+
+def make_vec_env(env_name, num_envs, seed = None, max_episode_steps = None, auto_reset = True):
+    if env_name not in VEC_ENVS:
+        raise ValueError('no vectorized version of %s, available: %s' % (env_name, ', '.join(sorted(VEC_ENVS))))
+    return VEC_ENVS[env_name](num_envs, seed, max_episode_steps, auto_reset)
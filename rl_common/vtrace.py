@@ -0,0 +1,120 @@
+import numpy as np
+
+from rl_common.trainer_queue import TrainerQueue
+
+# V-trace targets of one trajectory (Espeholt et al. 2018, IMPALA)
+#   rho[t] = pi(a[t] | s[t]) / mu(a[t] | s[t])     target over behaviour policy
+#   vs[t] = V[t] + sum_k gamma^(k - t) (c[t] ... c[k - 1]) min(clip_rho, rho[k]) delta[k]
+#   delta[k] = r[k] + gamma * V[k + 1] - V[k],   c = min(1, rho)
+# computed backwards as vs[t] - V[t] = delta'[t] + gamma * c[t] * (vs[t + 1] - V[t + 1]),
+# the policy gradient advantage is min(clip_pg_rho, rho[t]) * (r[t] + gamma * vs[t + 1] - V[t])
+#
+#   vs, pg_advantages = vtrace(behaviour_log_probs, target_log_probs, rewards, values,
+#                              bootstrap_value, discount_factor)
+#
+# with rho = 1 (on-policy) vs is the n-step return and the advantage the n-step TD error
+def vtrace(behaviour_log_probs, target_log_probs, rewards, values, bootstrap_value, gamma,
+           clip_rho = 1.0, clip_pg_rho = 1.0):
+    rhos = np.exp(np.asarray(target_log_probs, np.float64) - np.asarray(behaviour_log_probs, np.float64))
+    rewards = np.asarray(rewards, np.float64)
+    values = np.asarray(values, np.float64)
+    values_next = np.append(values[1:], bootstrap_value)
+
+    deltas = np.minimum(clip_rho, rhos) * (rewards + gamma * values_next - values)
+    cs = gamma * np.minimum(1.0, rhos)
+    vs_minus_values = np.empty_like(values)
+    carry = 0.
+    for t in range(len(values) - 1, -1, -1):
+        carry = deltas[t] + cs[t] * carry
+        vs_minus_values[t] = carry
+    vs = values + vs_minus_values
+
+    vs_next = np.append(vs[1:], bootstrap_value)
+    pg_advantages = np.minimum(clip_pg_rho, rhos) * (rewards + gamma * vs_next - values)
+    return vs, pg_advantages
+
+# one trajectory of an actor: raw rewards and the log-probs of the weights it acted with
+class _Trajectory(object):
+    def __init__(self, states, actions, rewards, behaviour_log_probs, next_state, done, policy_version):
+        self.states = np.array(states, dtype=np.float32)
+        self.actions = np.array(actions, dtype=np.int32)
+        self.rewards = np.array(rewards, dtype=np.float32)
+        self.behaviour_log_probs = np.array(behaviour_log_probs, dtype=np.float32)
+        self.next_state = None if done else np.array(next_state, dtype=np.float32)
+        self.done = done
+        self.policy_version = policy_version
+
+# IMPALA style learner: the actors keep acting with their (possibly stale) snapshot and
+# put raw trajectories, the learner evaluates every batch with its current weights and
+# trains on V-trace targets, so the lag between acting and learning weights is corrected
+# instead of biasing the on-policy update
+#
+#   learner = VTraceLearner(agent.update_vtrace_fn, agent.pull_global, agent.evaluate_fn,
+#                           agent.state, agent.action, agent.q_target, agent.advantage,
+#                           discount_factor, TRAINER_BATCH_SIZE)
+#   learner.put_trajectory(states, actions, rewards, behaviour_log_probs, next_state, done, policy_version)
+#
+# evaluate_fn(states, actions) returns log pi(action | state) and V(state) [n, 1] of the
+# learner network, q_target is fed with vs and advantage with the policy gradient advantage
+# USE_VTRACE of the A3C scripts: the TRAINER_ settings size the batches and the queue, the
+# actors pull every ACTOR_PULL_INTERVAL segments and act with their own snapshot, so it runs
+# without USE_INFERENCE_SERVER (which acts for every worker with the master network)
+class VTraceLearner(TrainerQueue):
+    def __init__(self, update_fn, sync_fn, evaluate_fn, state, action, q_target, advantage,
+                 discount_factor, batch_size, max_queue_size = 12, max_wait = 0.005,
+                 clip_rho = 1.0, clip_pg_rho = 1.0):
+        TrainerQueue.__init__(self, update_fn, sync_fn, state, action, q_target, batch_size,
+                              max_queue_size, max_wait)
+        self.evaluate_fn = evaluate_fn
+        self.advantage = advantage
+        self.discount_factor = discount_factor
+        self.clip_rho = clip_rho
+        self.clip_pg_rho = clip_pg_rho
+
+        # importance weight statistics
+        self.rho_sum = 0.
+        self.n_clipped = 0
+
+    # called by an actor thread, blocks while the queue is full
+    def put_trajectory(self, states, actions, rewards, behaviour_log_probs, next_state, done, policy_version):
+        self._put(_Trajectory(states, actions, rewards, behaviour_log_probs, next_state, done, policy_version))
+
+    def _feed_dict(self, batch):
+        # one forward pass over all the states and the bootstrap states of the batch
+        bootstraps = [trajectory for trajectory in batch if not trajectory.done]
+        states = np.concatenate([trajectory.states for trajectory in batch] +
+                                [trajectory.next_state[np.newaxis, :] for trajectory in bootstraps])
+        actions = np.concatenate([trajectory.actions for trajectory in batch] +
+                                 [np.zeros(len(bootstraps), np.int32)])
+        target_log_probs, values = self.evaluate_fn(states, actions)
+        values = values[:, 0]
+
+        n_samples = sum(len(trajectory.actions) for trajectory in batch)
+        bootstrap_values = iter(values[n_samples:])
+        vs, pg_advantages = [], []
+        start = 0
+        for trajectory in batch:
+            end = start + len(trajectory.actions)
+            bootstrap_value = 0. if trajectory.done else next(bootstrap_values)
+            trajectory_vs, trajectory_advantages = vtrace(
+                trajectory.behaviour_log_probs, target_log_probs[start:end], trajectory.rewards,
+                values[start:end], bootstrap_value, self.discount_factor, self.clip_rho, self.clip_pg_rho)
+            vs.append(trajectory_vs)
+            pg_advantages.append(trajectory_advantages)
+            start = end
+
+        rhos = np.exp(target_log_probs[:n_samples] - np.concatenate([trajectory.behaviour_log_probs for trajectory in batch]))
+        self.rho_sum += rhos.sum()
+        self.n_clipped += int((rhos > self.clip_rho).sum())
+
+        return {
+            self.state: states[:n_samples],
+            self.action: actions[:n_samples],
+            self.q_target: np.concatenate(vs).astype(np.float32)[:, np.newaxis],
+            self.advantage: np.concatenate(pg_advantages).astype(np.float32)[:, np.newaxis]
+        }
+
+    def report(self):
+        n_samples = float(max(self.n_samples, 1))
+        return TrainerQueue.report(self).replace(' trainer :', ' learner :', 1) + \
+               ' / rho avg {:.3f}, clipped {:.1%}'.format(self.rho_sum / n_samples, self.n_clipped / n_samples)
@@ -0,0 +1,86 @@
+import json
+import os
+import struct
+
+import numpy as np
+
+from rl_common.numpy_policy import NumpyPolicy
+
+# the actor (and critic) weights of a trained agent as one small file for inference: no graph,
+# no optimizer slots, no per worker copies, loaded without TF in milliseconds
+#
+#   export_weights(model_path + '/' + WEIGHTS_FILE, sess, *agent.mlp_params, meta={'source': game_name})
+#   ...
+#   policy = load_policy(model_path + '/' + WEIGHTS_FILE)     # NumpyPolicy
+#   actions, _ = policy.sample(states, random, greedy=True)
+#
+# layout: MAGIC, the format version and the header size (uint32 little endian), a JSON header
+# (dtype, shape and offset of every kernel and bias, meta), then the float32 arrays, each at a
+# multiple of ALIGN; the loader maps the file read-only and the arrays are views of the map, so
+# processes that load the same file share its pages (a raw file: np.load does not map the
+# arrays of an .npz)
+MAGIC = b'RLWEIGHT'
+FORMAT_VERSION = 1
+ALIGN = 64
+WEIGHTS_FILE = 'policy.weights'
+
+def _aligned(offset):
+    return (offset + ALIGN - 1) // ALIGN * ALIGN
+
+# written to a temp file and renamed, a reader never sees a partial one; returns the file size
+def export_weights(path, sess, actor_params, critic_params = (), meta = None):
+    actor_params, critic_params = list(actor_params), list(critic_params)
+    values = [np.ascontiguousarray(value, '<f4') for value in sess.run(actor_params + critic_params)]
+    return write_weights(path, values[:len(actor_params)], values[len(actor_params):], meta)
+
+def write_weights(path, actor_values, critic_values = (), meta = None):
+    arrays = [('actor', np.ascontiguousarray(value, '<f4')) for value in actor_values] + \
+             [('critic', np.ascontiguousarray(value, '<f4')) for value in critic_values]
+    header = {'dtype': '<f4', 'actor': [], 'critic': [], 'meta': meta or {}}
+    prefix_size = len(MAGIC) + 8
+
+    # the offsets depend on the header size: grow the room for the header until it fits
+    room = ALIGN
+    while True:
+        offset = _aligned(prefix_size + room)
+        header['actor'], header['critic'] = [], []
+        for network, value in arrays:
+            header[network].append({'shape': list(value.shape), 'offset': offset})
+            offset = _aligned(offset + value.nbytes)
+        encoded = json.dumps(header, default=lambda value: value.item()).encode('utf-8')
+        if len(encoded) <= room:
+            break
+        room = _aligned(len(encoded))
+
+    temp_path = path + '.tmp'
+    directory = os.path.dirname(path)
+    if directory and not os.path.exists(directory):
+        os.makedirs(directory)
+    with open(temp_path, 'wb') as f:
+        f.write(MAGIC + struct.pack('<II', FORMAT_VERSION, room) + encoded.ljust(room))
+        for (_, value), entry in zip(arrays, header['actor'] + header['critic']):
+            f.write(b'\0' * (entry['offset'] - f.tell()))
+            f.write(value.tobytes())
+    os.replace(temp_path, path)
+    return os.path.getsize(path)
+
+# (actor arrays, critic arrays, meta), read-only views of one memory map of the file
+def load_weights(path):
+    buffer = np.memmap(path, np.uint8, mode='r')
+    prefix_size = len(MAGIC) + 8
+    if bytes(buffer[:len(MAGIC)]) != MAGIC:
+        raise ValueError('%s is not a weight file' % path)
+    version, room = struct.unpack('<II', bytes(buffer[len(MAGIC):prefix_size]))
+    if version > FORMAT_VERSION:
+        raise ValueError('%s has format version %d, this reader knows up to %d' % (path, version, FORMAT_VERSION))
+    header = json.loads(bytes(buffer[prefix_size:prefix_size + room]).decode('utf-8'))
+
+    dtype = np.dtype(header['dtype'])
+    def view(entry):
+        size = int(np.prod(entry['shape'])) * dtype.itemsize
+        return buffer[entry['offset']:entry['offset'] + size].view(dtype).reshape(entry['shape'])
+    return [view(entry) for entry in header['actor']], [view(entry) for entry in header['critic']], header['meta']
+
+def load_policy(path):
+    actor_values, critic_values, _ = load_weights(path)
+    return NumpyPolicy.from_values(actor_values, critic_values)
@@ -0,0 +1,196 @@
+import threading
+import time
+
+import tensorflow as tf
+
+from rl_common.flat_params import flat_params_initializer
+
+# the worker threads of the A3C master as an elastic pool: add() starts one more worker while
+# training runs, retire() stops the last one started (within one of its steps)
+# a new worker is built in a new W_<i> scope and only the variables created for it are
+# initialized, the master weights and the optimizer slots are not touched; a retired worker
+# keeps its network, the next add() restarts it instead of building another
+#
+#   pool = WorkerPool(sess, COORD, lambda name: Worker(env_fn(), name, COORD, global_agent), workers,
+#                     ('stats', 'inference_server'), next_index=N_WORKERS)
+#   for worker in workers:
+#       pool.start(worker)
+#   pool.add() / pool.retire()      # from any thread, e.g. the Autoscaler
+#   pool.join()     # until the coordinator stops the run
+#
+# the workers check worker.retired with their stop condition every step
+#
+# USE_AUTOSCALE of the A3C scripts drives the pool with the Autoscaler below, up to
+# AUTOSCALE_MAX_WORKERS workers; threads only, the process modes have a fixed N_WORKERS
+class WorkerPool(object):
+    def __init__(self, sess, coordinator, make_worker, workers, shared_attrs = (), next_index = None,
+                 on_add = None):
+        self.sess = sess
+        self.coordinator = coordinator
+        self.make_worker = make_worker      # make_worker(name) -> Worker, builds its network
+        self.template = workers[0]          # new workers share its shared_attrs (stats, queues, ...)
+        self.shared_attrs = shared_attrs
+        self.on_add = on_add                # on_add() before a worker added at runtime starts
+        self.next_index = len(workers) if next_index is None else next_index
+
+        self.workers = list(workers)        # all the workers ever built
+        self.active = []                    # (worker, thread), in start order
+        self.idle = []                      # retired workers
+        self.threads = []
+        self.lock = threading.Lock()
+        self.initialized = set(variable.name for variable in tf.global_variables())
+
+        self.n_built = 0
+        self.n_retired = 0
+        self.history = []       # (seconds since the pool started, active workers) at every change
+        self.start_time = time.time()
+
+    @property
+    def size(self):
+        return len(self.active)
+
+    def start(self, worker):
+        worker.retired = False
+        thread = threading.Thread(target=worker.work, name=worker.name)
+        thread.start()
+        self.active.append((worker, thread))
+        self.threads.append(thread)
+
+    def add(self):
+        with self.lock:
+            if self.coordinator.should_stop():
+                return None
+            if self.idle:
+                worker = self.idle.pop()
+            else:
+                worker = self._build()
+            if self.on_add is not None:
+                self.on_add()
+            self.start(worker)
+            self.history.append((time.time() - self.start_time, self.size))
+            return worker
+
+    def _build(self):
+        # graph construction is safe while the other workers run their session calls; the
+        # default graph is per thread, the caller may be another thread than the one that built it
+        with self.sess.graph.as_default():
+            worker = self.make_worker('W_%i' % self.next_index)
+            self.next_index += 1
+            for attr in self.shared_attrs:
+                setattr(worker, attr, getattr(self.template, attr))
+
+            new = [variable for variable in tf.global_variables() if variable.name not in self.initialized]
+            self.sess.run(tf.variables_initializer(new))
+            self.sess.run(flat_params_initializer(worker.name))
+        self.initialized.update(variable.name for variable in new)
+
+        self.workers.append(worker)
+        self.n_built += 1
+        return worker
+
+    # stops the most recently started worker, keeps at least one running
+    # the join is outside the lock: add() and the other calls do not wait for the worker's last step
+    def retire(self):
+        with self.lock:
+            if self.size <= 1:
+                return None
+            worker, thread = self.active.pop()
+            worker.retired = True
+            self.history.append((time.time() - self.start_time, self.size))
+        thread.join()
+        with self.lock:
+            self.idle.append(worker)
+            self.n_retired += 1
+        return worker
+
+    # until the run is stopped and every worker thread ended (re-raises a worker's exception)
+    def join(self):
+        self.coordinator.wait_for_stop()
+        with self.lock:
+            threads = list(self.threads)
+        self.coordinator.join(threads)
+
+    def report(self):
+        changes = ', '.join('{:.0f}s: {:d}'.format(seconds, size) for seconds, size in self.history)
+        return ' worker pool : {:d} active / {:d} built at runtime / {:d} retirements / workers over time {}'.format(
+                   self.size, self.n_built, self.n_retired, changes or '-')
+
+# hill climbing on the aggregate env steps/sec: every interval it adds a worker while the
+# rate keeps rising, once an added worker made it fall (contention) it retires that one again,
+# and it holds the pool size from the first move that did not help; after reprobe_intervals
+# held intervals it probes again, one worker less or more in turn, so the size follows a load
+# that changed since
+# the interval after the start and after every move is discarded, its rate is the warm-up of
+# the new thread (graph construction, the first run of every op), not the steady state
+#
+#   autoscaler = Autoscaler(pool, run_stats, AUTOSCALE_INTERVAL, AUTOSCALE_MAX_WORKERS)
+#   autoscaler.start()
+class Autoscaler(threading.Thread):
+    def __init__(self, pool, run_stats, interval = 10., max_workers = 16, min_workers = 1, tolerance = 0.05,
+                 reprobe_intervals = 6):
+        threading.Thread.__init__(self, name=type(self).__name__)
+        self.pool = pool
+        self.run_stats = run_stats
+        self.interval = interval
+        self.max_workers = max_workers
+        self.min_workers = min_workers
+        self.tolerance = tolerance      # relative change of the rate that counts as one
+        self.reprobe_intervals = reprobe_intervals
+
+        self.rate = None
+        self.move = 1       # last move: +1 added a worker, -1 retired one, 0 hold
+        self.probe = 1      # direction of the last probe, the next one goes the other way
+        self.n_held = 0     # intervals held since the last move
+        self.n_warmup = 0   # intervals discarded
+        self.decisions = []     # (workers, steps/sec, move)
+
+    def _steps(self):
+        return sum(worker.steps for worker in list(self.run_stats.workers))
+
+    def decide(self, rate):
+        previous, self.rate = self.rate, rate
+        if previous is None:
+            return self.move
+        if not self.move:
+            self.n_held += 1
+            if self.n_held < self.reprobe_intervals:
+                return 0
+            self.n_held = 0
+            self.probe = self.move = -self.probe
+            return self.move
+        if rate > previous * (1. + self.tolerance):
+            return self.move        # that helped, one more in the same direction
+        move = -self.move if rate < previous * (1. - self.tolerance) else 0
+        self.move = 0               # it hurt (take it back) or did nothing: hold from now on
+        return move
+
+    def run(self):
+        steps, start = self._steps(), time.time()
+        warmup = True
+        while not self.pool.coordinator.wait_for_stop(self.interval):
+            now_steps, now = self._steps(), time.time()
+            rate = (now_steps - steps) / max(now - start, 1e-9)
+            if warmup:
+                warmup = False
+                self.n_warmup += 1
+                steps, start = now_steps, now
+                continue
+
+            move = self.decide(rate)
+            size = self.pool.size
+            if move > 0 and size >= self.max_workers or move < 0 and size <= self.min_workers:
+                move = self.move = 0
+            if move > 0:
+                self.pool.add()
+            elif move < 0:
+                self.pool.retire()
+            self.decisions.append((size, rate, move))
+            if move:
+                print(' autoscale : {:,.0f} steps/sec with {:d} workers -> {:d}'.format(rate, size, self.pool.size))
+                warmup = True
+            steps, start = self._steps(), time.time()
+
+    def report(self):
+        return ' autoscaler : ' + ', '.join('{:d} workers {:,.0f} steps/sec'.format(size, rate)
+                                            for size, rate, _ in self.decisions) + \
+               ' / {:d} warm-up intervals discarded'.format(self.n_warmup)
@@ -0,0 +1,21 @@
+import importlib.util
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# one of the numbered scripts as a module (its __main__ block does not run), imported from a
+# temporary working directory so the save_model / save_graph dirs it makes land there
+@pytest.fixture
+def load_script(tmp_path, monkeypatch):
+    def load(path):
+        monkeypatch.chdir(tmp_path)
+        monkeypatch.setattr(sys, 'argv', [os.path.basename(path)])
+        spec = importlib.util.spec_from_file_location(os.path.basename(path)[:-3], os.path.join(ROOT, path))
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        return module
+    return load
@@ -0,0 +1,102 @@
+import numpy as np
+import pytest
+import tensorflow as tf
+
+from rl_common.rollout_buffer import RolloutBuffer
+
+# the V-trace actor ships the log-probs of the weights that sampled the segment: a pull of new
+# master weights between acting and shipping must not change them
+TYPE_A = '01_Type_A_TF_cartpole_discrete/05_TF_type_a1_cartpole_discrete_a3c_GREEN.py'
+TYPE_B = '02_Type_B_TF_cartpole_discrete/05_TF_type_b1_cartpole_discrete_a3c_GREEN.py'
+
+class Learner(object):
+    version = 0
+
+    def put_trajectory(self, states, actions, rewards, behaviour_log_probs, next_state, done, policy_version):
+        self.actions = np.array(actions)
+        self.behaviour_log_probs = np.array(behaviour_log_probs)
+
+def make_worker(script, numpy_policy):
+    script.USE_NUMPY_POLICY = numpy_policy
+    sess = tf.Session()
+    master = script.A3CAgent(sess, 'master')
+    worker = script.Worker(script.gym.make(script.env_name).unwrapped, sess, 'W_0', tf.train.Coordinator(), master)
+    worker.vtrace_learner = Learner()
+    sess.run(tf.global_variables_initializer())
+    worker.agent.pull_global()
+    return worker
+
+def act(worker, state, n_steps):
+    log_probs = []
+    for _ in range(n_steps):
+        action, log_prob = worker.agent.get_action(state)
+        next_state, reward, done, _ = worker.env.step(action)
+        worker.append_sample(state, action, reward, log_prob)
+        log_probs.append(log_prob)
+        state = next_state
+    return state, np.array(log_probs, np.float32)
+
+# new master weights, pulled by the next pull_global of every local
+def move_master(worker):
+    master = worker.master_agent
+    variables = tf.get_collection(tf.GraphKeys.TRAINABLE_VARIABLES, scope='master/')
+    worker.sess.run([variable.assign_add(tf.random_normal(variable.shape, stddev=0.5)) for variable in variables])
+    master.params_version.bump()
+
+def current_log_probs(worker, states, actions):
+    return worker.agent.evaluate_fn(states, actions)[0]
+
+@pytest.mark.parametrize('numpy_policy', [False, True])
+def test_pull_keeps_shipped_log_probs_type_a(load_script, numpy_policy):
+    script = load_script(TYPE_A)
+    with tf.Graph().as_default():
+        worker = make_worker(script, numpy_policy)
+        _, acted = act(worker, worker.env.reset(), 20)
+        states, actions = worker.buffer.states.copy(), worker.buffer.actions.copy()
+
+        move_master(worker)
+        worker.agent.pull_global()
+        worker.train_model()
+
+        np.testing.assert_allclose(worker.vtrace_learner.behaviour_log_probs, acted, rtol=1e-5)
+        assert not np.allclose(current_log_probs(worker, states, actions), acted, atol=1e-3)
+
+@pytest.mark.parametrize('numpy_policy', [False, True])
+def test_pull_keeps_shipped_log_probs_type_b(load_script, numpy_policy):
+    script = load_script(TYPE_B)
+    with tf.Graph().as_default():
+        worker = make_worker(script, numpy_policy)
+        next_state, acted = act(worker, worker.env.reset(), 10)
+        states, actions = worker.buffer.states.copy(), worker.buffer.actions.copy()
+
+        move_master(worker)
+        worker.agent.pull_global()
+        worker.train_model(next_state, False)
+
+        np.testing.assert_allclose(worker.vtrace_learner.behaviour_log_probs, acted, rtol=1e-5)
+        assert not np.allclose(current_log_probs(worker, states, actions), acted, atol=1e-3)
+
+# the bootstrap is V(next_state) of the weights that train, the step after it acts with the pulled ones
+@pytest.mark.parametrize('numpy_policy', [False, True])
+def test_bootstrap_value_and_next_step_use_current_weights(load_script, numpy_policy):
+    script = load_script(TYPE_B)
+    with tf.Graph().as_default():
+        worker = make_worker(script, numpy_policy)
+        next_state, _ = act(worker, worker.env.reset(), 10)
+        expected = worker.sess.run(worker.agent.value, {worker.agent.state: next_state[np.newaxis, :]})[0, 0]
+        np.testing.assert_allclose(worker.agent.bootstrap_value(next_state), expected, rtol=1e-5)
+
+        move_master(worker)
+        worker.train_model(next_state, False)      # pulls the changed master
+        _, acted = act(worker, next_state, 10)
+        np.testing.assert_allclose(acted, current_log_probs(worker, worker.buffer.states, worker.buffer.actions),
+                                   rtol=1e-4, atol=1e-5)
+
+def test_rollout_buffer_log_probs_survive_growth():
+    buffer = RolloutBuffer(2, 3)
+    for index in range(5):
+        buffer.append(np.full(3, index), index, 1., -0.1 * index)
+    np.testing.assert_allclose(buffer.log_probs, -0.1 * np.arange(5), rtol=1e-6)
+    buffer.clear()
+    buffer.append(np.zeros(3), 0, 0.)
+    assert buffer.log_probs.tolist() == [0.]
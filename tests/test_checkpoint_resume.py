@@ -0,0 +1,114 @@
+import os
+
+import numpy as np
+import tensorflow as tf
+
+from rl_common.checkpoint import AsyncCheckpointer
+from rl_common.hogwild import SharedAdam, SharedParams
+from rl_common.param_sync import ParamsVersion, VersionedPull
+from rl_common.resume import Resume, hogwild_run_state, latest_checkpoint, run_state, save_run_state, RUN_STATE_FILE
+from rl_common.run_stats import RunStats
+
+# the smallest A3C layout: a master with its optimizer, one local network that pulls it
+class Agent(object):
+    def __init__(self, sess, versioned_pull, seed):
+        self.sess = sess
+        self.versioned_pull = versioned_pull
+        self.random = np.random.RandomState(seed)
+
+class Worker(object):
+    def __init__(self, name, agent):
+        self.name = name
+        self.agent = agent
+
+def build():
+    with tf.variable_scope('master'):
+        master = tf.get_variable('w', [3, 2], initializer=tf.random_normal_initializer(seed=1))
+    with tf.variable_scope('W_0'):
+        local = tf.get_variable('w', [3, 2], initializer=tf.zeros_initializer())
+    train_op = tf.train.AdamOptimizer(0.1).minimize(tf.reduce_sum(tf.square(master - 1.)), var_list=[master])
+    sess = tf.Session()
+    version = ParamsVersion()
+    worker = Worker('W_0', Agent(sess, VersionedPull(sess, [local], [master], version), seed=0))
+    return sess, train_op, version, worker, master, local
+
+def shared_values(sess):
+    variables = [variable for variable in tf.global_variables()
+                 if not variable.op.name.startswith(('W_0/', 'checkpoint_snapshot'))]
+    return dict(zip([variable.op.name for variable in variables], sess.run(variables)))
+
+def test_checkpoint_then_resume_round_trip(tmp_path):
+    save_dir = str(tmp_path / 'model')
+    with tf.Graph().as_default():
+        sess, train_op, version, worker, _, _ = build()
+        sess.run(tf.global_variables_initializer())
+        stats = RunStats(training_time=100.)
+        worker_stats = stats.worker(worker.name)
+        for episode in range(5):
+            for _ in range(3):
+                worker_stats.step()
+                sess.run(train_op)
+                version.bump()
+            worker_stats.end_episode(10. + episode)
+        worker.agent.random.rand(7)
+
+        states = []     # the run state pickled with the snapshot
+        def state_fn():
+            states.append(run_state(stats, [worker]))
+            return states[-1]
+        checkpointer = AsyncCheckpointer(sess, save_dir, every_updates=1, state_fn=state_fn, state_file=RUN_STATE_FILE)
+        assert checkpointer.update()
+        saved, saved_state = shared_values(sess), states[0]
+        next_draw = worker.agent.random.rand()
+        sess.run(train_op)      # after the snapshot, not in the checkpoint
+        checkpointer.close()
+        assert checkpointer.n_written == 1
+        assert not [name for name in os.listdir(save_dir) if name.startswith('.tmp-')]
+
+    with tf.Graph().as_default():
+        sess, _, _, worker, master, local = build()
+        resume = Resume(sess, tf.train.latest_checkpoint(save_dir), [worker.agent])
+        stats = RunStats(training_time=100.)
+        resume.apply(stats, [worker])
+
+        restored = shared_values(sess)
+        assert sorted(restored) == sorted(saved) and any('Adam' in name for name in saved)
+        for name, value in saved.items():
+            np.testing.assert_array_equal(restored[name], value, err_msg=name)
+        np.testing.assert_array_equal(sess.run(local), sess.run(master))
+
+        state = stats.state()
+        for key in ('steps', 'episodes', 'scores', 'avg_score'):
+            assert state[key] == saved_state['run_stats'][key], key
+        assert state['training_time'] >= saved_state['run_stats']['training_time']
+        assert stats.deadline == stats.start_time + 100. - saved_state['run_stats']['training_time']
+        assert worker.agent.random.rand() == next_draw
+
+def test_hogwild_resume_goes_on_with_the_optimizer_slots(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    save_dir = 'model'      # relative as the scripts' model_path, saved as the final save
+    gradients = [[np.full((3, 2), g, np.float32)] for g in (0.5, -0.2, 0.3)]
+
+    uninterrupted = SharedParams([np.ones((3, 2), np.float32)], SharedAdam(0.1))
+    for grads in gradients:
+        uninterrupted.apply_gradients(grads)
+
+    with tf.Graph().as_default():
+        sess, _, _, _, master, _ = build()
+        sess.run(tf.global_variables_initializer())
+        shared = SharedParams([np.ones((3, 2), np.float32)], SharedAdam(0.1))
+        for grads in gradients[:2]:
+            shared.apply_gradients(grads)
+        shared.load(sess, [master])
+        tf.train.Saver().save(sess, save_dir + '/')
+        save_run_state(save_dir, hogwild_run_state([shared]))
+
+    with tf.Graph().as_default():
+        sess, _, _, _, master, _ = build()
+        resume = Resume(sess, latest_checkpoint(save_dir))
+        shared = SharedParams(sess.run([master]), SharedAdam(0.1))
+        resume.apply_hogwild([shared])
+        assert shared.t == 2 and 'at update 2' in resume.report()
+        shared.apply_gradients(gradients[2])
+
+    np.testing.assert_allclose(shared.flat, uninterrupted.flat, rtol=1e-6)
@@ -0,0 +1,55 @@
+import os
+import time
+
+import pytest
+import tensorflow as tf
+
+from rl_common.cluster import ClusterTask, local_cluster, run_cluster
+
+def build_task(cluster, index):
+    graph = tf.Graph()
+    with graph.as_default():
+        task = ClusterTask(cluster, index)
+        with tf.device(task.shared_device):
+            with tf.variable_scope('master'):
+                tf.get_variable('w', [2], initializer=tf.zeros_initializer())
+        task.initialize('master', 'W_%i' % index)
+    return task
+
+# the ps task and two worker tasks in this process, each worker task with its own graph
+@pytest.fixture
+def tasks():
+    cluster = local_cluster(2)
+    ps = tf.train.Server(tf.train.ClusterSpec(cluster), 'ps', 0)
+    chief = build_task(cluster, 0)
+    other = build_task(cluster, 1)
+    yield chief, other
+    chief.sess.close()
+    other.sess.close()
+
+def test_stop_is_shared_by_the_tasks(tasks):
+    chief, other = tasks
+    assert not chief.coordinator.should_stop() and not other.coordinator.should_stop()
+    other.coordinator.request_stop()        # e.g. the target score of its episodes
+    time.sleep(chief.coordinator.poll_interval)
+    assert chief.coordinator.should_stop()
+
+def test_finish_gives_up_on_a_lost_task(tasks):
+    chief, other = tasks
+    with pytest.raises(RuntimeError, match='1 of 2'):
+        chief.finish(timeout=0.5)
+    assert other.coordinator.should_stop()     # the chief asked the others to stop
+
+    other.finish()
+    assert chief.finish(timeout=0.5)
+
+def crashing_task(cluster, index):
+    if index == 1:
+        os._exit(3)
+    time.sleep(600.)
+
+def test_run_cluster_stops_when_a_task_dies():
+    start = time.time()
+    with pytest.raises(RuntimeError, match='worker_1'):
+        run_cluster(crashing_task, local_cluster(2), poll_interval=0.1)
+    assert time.time() - start < 60.
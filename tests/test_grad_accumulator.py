@@ -0,0 +1,61 @@
+import threading
+
+import numpy as np
+import tensorflow as tf
+
+from rl_common.grad_accumulator import GradientAccumulator
+
+def build(sess, **kwargs):
+    param = tf.Variable([0., 0.])
+    gradient = tf.placeholder(tf.float32, [2])
+    accumulator = GradientAccumulator(sess, [(tf.train.GradientDescentOptimizer(1.), [param])], **kwargs)
+    add_op = accumulator.add_op([[gradient]])
+    sess.run(tf.global_variables_initializer())
+    add_fn = lambda feed_dict: sess.run(add_op, feed_dict)
+    return accumulator, param, gradient, add_fn
+
+def start_add(accumulator, add_fn, feed_dict, results):
+    thread = threading.Thread(target=lambda: results.append(accumulator.add(add_fn, feed_dict)))
+    thread.daemon = True
+    thread.start()
+    return thread
+
+def test_barrier_releases_after_every_party_contributed():
+    with tf.Graph().as_default(), tf.Session() as sess:
+        accumulator, param, gradient, add_fn = build(sess, sync=True, parties=3)
+        results = []
+        threads = [start_add(accumulator, add_fn, {gradient: [value, 1.]}, results) for value in (1., 2.)]
+        for thread in threads:
+            thread.join(0.5)
+        assert all(thread.is_alive() for thread in threads), 'the barrier released before the last party'
+        assert accumulator.n_applies == 0 and results == []
+
+        results.append(accumulator.add(add_fn, {gradient: [3., 1.]}))
+        for thread in threads:
+            thread.join(10.)
+        assert not any(thread.is_alive() for thread in threads)
+
+        assert sorted(results) == [False, False, True]
+        assert accumulator.n_applies == 1 and accumulator.pending == 0
+        np.testing.assert_allclose(sess.run(param), [-2., -1.])   # minus the mean of the three
+
+def test_leave_releases_the_waiting_parties():
+    with tf.Graph().as_default(), tf.Session() as sess:
+        accumulator, param, gradient, add_fn = build(sess, sync=True, parties=2)
+        results = []
+        thread = start_add(accumulator, add_fn, {gradient: [4., 2.]}, results)
+        thread.join(0.5)
+        assert thread.is_alive()
+
+        accumulator.leave()
+        thread.join(10.)
+        assert not thread.is_alive() and accumulator.n_applies == 1
+        np.testing.assert_allclose(sess.run(param), [-4., -2.])
+
+def test_every_applies_the_mean_once_per_n_contributions():
+    with tf.Graph().as_default(), tf.Session() as sess:
+        accumulator, param, gradient, add_fn = build(sess, every=2)
+        assert not accumulator.add(add_fn, {gradient: [1., 0.]})
+        np.testing.assert_allclose(sess.run(param), [0., 0.])
+        assert accumulator.add(add_fn, {gradient: [3., 2.]})
+        np.testing.assert_allclose(sess.run(param), [-2., -1.])
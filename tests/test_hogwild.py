@@ -0,0 +1,62 @@
+import numpy as np
+import pytest
+import tensorflow as tf
+
+from rl_common.hogwild import SharedAdam, SharedParams, SharedRMSProp
+
+VALUES = [np.array([[0.5, -1.], [2., 0.]], dtype=np.float32), np.array([0.1, -0.3], dtype=np.float32)]
+GRADIENTS = [[np.array([[0.2, -0.1], [0.4, 1.]]), np.array([-0.5, 0.3])],
+             [np.array([[-0.3, 0.2], [0.1, 0.]]), np.array([0.2, 0.1])],
+             [np.array([[0.05, 0.5], [-0.2, 0.3]]), np.array([0., -0.4])]]
+
+def numpy_rmsprop(param, grads, lr, decay, epsilon):
+    ms = np.ones_like(param)
+    for grad in grads:
+        ms = decay * ms + (1. - decay) * grad ** 2
+        param = param - lr * grad / np.sqrt(ms + epsilon)
+    return param
+
+def numpy_adam(param, grads, lr, beta1, beta2, epsilon):
+    m, v = np.zeros_like(param), np.zeros_like(param)
+    for t, grad in enumerate(grads, 1):
+        m = beta1 * m + (1. - beta1) * grad
+        v = beta2 * v + (1. - beta2) * grad ** 2
+        m_hat, v_hat = m / (1. - beta1 ** t), v / (1. - beta2 ** t)
+        param = param - lr * m_hat / (np.sqrt(v_hat) + epsilon * np.sqrt(1. - beta2 ** t))
+    return param
+
+def flat(arrays):
+    return np.concatenate([np.ravel(array) for array in arrays])
+
+@pytest.mark.parametrize('optimizer, reference', [
+    (SharedRMSProp(0.01, decay=0.9, epsilon=1e-10), lambda p, g: numpy_rmsprop(p, g, 0.01, 0.9, 1e-10)),
+    (SharedAdam(0.01, beta1=0.9, beta2=0.999, epsilon=1e-8), lambda p, g: numpy_adam(p, g, 0.01, 0.9, 0.999, 1e-8)),
+])
+def test_update_matches_the_numpy_reference(optimizer, reference):
+    shared = SharedParams(VALUES, optimizer)
+    for gradients in GRADIENTS:
+        shared.apply_gradients(gradients)
+
+    expected = reference(flat(VALUES).astype(np.float64), [flat(gradients) for gradients in GRADIENTS])
+    assert shared.t == len(GRADIENTS)
+    np.testing.assert_allclose(shared.flat, expected, rtol=1e-5, atol=1e-6)
+    np.testing.assert_allclose(shared.params[0], expected[:4].reshape(2, 2), rtol=1e-5, atol=1e-6)
+
+@pytest.mark.parametrize('optimizer, tf_optimizer', [
+    (SharedRMSProp(0.01), tf.train.RMSPropOptimizer(0.01)),
+    (SharedAdam(0.01), tf.train.AdamOptimizer(0.01)),
+])
+def test_update_matches_tf_train(optimizer, tf_optimizer):
+    shared = SharedParams(VALUES, optimizer)
+    with tf.Graph().as_default(), tf.Session() as sess:
+        variables = [tf.Variable(value) for value in VALUES]
+        placeholders = [tf.placeholder(tf.float32, value.shape) for value in VALUES]
+        train_op = tf_optimizer.apply_gradients(list(zip(placeholders, variables)))
+        sess.run(tf.global_variables_initializer())
+        for gradients in GRADIENTS:
+            shared.apply_gradients(gradients)
+            sess.run(train_op, dict(zip(placeholders, gradients)))
+        expected = sess.run(variables)
+
+    for param, value in zip(shared.params, expected):
+        np.testing.assert_allclose(param, value, rtol=1e-5, atol=1e-6)
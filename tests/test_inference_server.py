@@ -0,0 +1,59 @@
+import threading
+
+import numpy as np
+import tensorflow as tf
+
+from rl_common.inference_server import InferenceServer
+
+def make_server(sess):
+    state = tf.placeholder(tf.float32, [None, 4])
+    policy = tf.nn.softmax(tf.layers.dense(state, 2))
+    sess.run(tf.global_variables_initializer())
+    return InferenceServer(sess, state, policy, 4, seed=1)
+
+def act_all(server, n_workers):
+    errors = []
+    def loop():
+        try:
+            for _ in range(10):
+                server.act(np.zeros(4, np.float32))
+        except RuntimeError as error:
+            errors.append(error)
+    threads = [threading.Thread(target=loop) for _ in range(n_workers)]
+    for thread in threads:
+        thread.daemon = True
+        thread.start()
+    for thread in threads:
+        thread.join(10.)
+    assert not any(thread.is_alive() for thread in threads), 'act blocked on the server'
+    return errors
+
+def test_act_serves_a_batch():
+    with tf.Graph().as_default(), tf.Session() as sess:
+        server = make_server(sess)
+        server.start()
+        assert act_all(server, 3) == []
+        action, log_prob = server.act(np.zeros(4, np.float32))
+        assert action in (0, 1) and log_prob <= 0.
+        server.stop()
+        assert server.n_requests == 31
+
+def test_failing_policy_raises_in_act():
+    def act_fn(states):
+        raise ValueError('NaN in the logits')
+    with tf.Graph().as_default(), tf.Session() as sess:
+        server = make_server(sess)
+        server.act_fn = act_fn
+        server.start()
+        errors = act_all(server, 3)
+        assert len(errors) == 3 and all('NaN in the logits' in str(error) for error in errors)
+        server.stop()
+        assert 'failed' in server.report()
+
+def test_act_after_stop_raises():
+    with tf.Graph().as_default(), tf.Session() as sess:
+        server = make_server(sess)
+        server.start()
+        server.stop()
+        errors = act_all(server, 1)
+        assert len(errors) == 1 and 'stopped' in str(errors[0])
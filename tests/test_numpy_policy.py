@@ -0,0 +1,46 @@
+import numpy as np
+import tensorflow as tf
+
+from rl_common.numpy_policy import NumpyPolicy
+from rl_common.sampling import action_log_prob
+
+def build(state_size, action_size):
+    state = tf.placeholder(tf.float32, [None, state_size])
+    w_init, b_init = tf.random_normal_initializer(.0, .3, seed=1), tf.constant_initializer(0.1)
+    with tf.variable_scope('actor'):
+        hidden = tf.layers.dense(state, 16, tf.nn.tanh, kernel_initializer=w_init, bias_initializer=b_init)
+        logits = tf.layers.dense(hidden, action_size, kernel_initializer=w_init, bias_initializer=b_init)
+    with tf.variable_scope('critic'):
+        hidden = tf.layers.dense(state, 16, tf.nn.tanh, kernel_initializer=w_init, bias_initializer=b_init)
+        value = tf.layers.dense(hidden, 1, kernel_initializer=w_init, bias_initializer=b_init)
+    return state, logits, value
+
+# the NumPy forward pass of fixed weights against the graph's, the log-probs against rl_common.sampling
+def test_matches_the_graph():
+    states = np.random.RandomState(0).randn(32, 4).astype(np.float32)
+    with tf.Graph().as_default(), tf.Session() as sess:
+        state, logits, value = build(4, 3)
+        action = tf.placeholder(tf.int32, [None])
+        sess.run(tf.global_variables_initializer())
+        policy = NumpyPolicy(sess, tf.trainable_variables('actor'), tf.trainable_variables('critic'))
+
+        expected_policy, expected_value = sess.run([tf.nn.softmax(logits), value], {state: states})
+        np.testing.assert_allclose(policy.policy(states), expected_policy, rtol=1e-5, atol=1e-6)
+        np.testing.assert_allclose(policy.value(states), expected_value, rtol=1e-5, atol=1e-6)
+
+        greedy, _ = policy.sample(states, np.random.RandomState(1), greedy=True)
+        np.testing.assert_array_equal(greedy, expected_policy.argmax(axis=1))
+        sampled, log_probs = policy.sample(states, np.random.RandomState(1))
+        np.testing.assert_allclose(log_probs, sess.run(action_log_prob(logits, action), {state: states, action: sampled}),
+                                   rtol=1e-5, atol=1e-6)
+
+class ZeroRandom(object):
+    def rand(self, *shape):
+        return np.zeros(shape)
+
+# a draw of 0 picks the first action even when its probability underflowed to 0, its log-prob stays finite
+def test_log_prob_is_clipped():
+    policy = NumpyPolicy.from_values([np.zeros((2, 2), np.float32), np.array([-1000., 0.], np.float32)])
+    actions, log_probs = policy.sample(np.zeros((1, 2)), ZeroRandom())
+    assert actions[0] == 0
+    np.testing.assert_allclose(log_probs, np.log(1e-10))
@@ -0,0 +1,44 @@
+import os
+
+import numpy as np
+
+from rl_common.offline_pretrain import TrajectoryDataset
+from rl_common.returns import discount_cumsum
+from rl_common.trajectory_recorder import TrajectoryWriter
+
+def record(save_dir, n_steps, chunk_size, random):
+    writer = TrajectoryWriter(save_dir)
+    recorder = writer.recorder('main', 2, chunk_size)
+    episodes, rewards = [], []
+    for step in range(n_steps):
+        done = random.rand() < 0.1
+        rewards.append(random.randn())
+        recorder.append(np.full(2, step), step % 3, rewards[-1], done)
+        if done:
+            episodes.append(rewards)
+            rewards = []
+    writer.close()
+    return episodes + ([rewards] if rewards else [])
+
+def listing(save_dir):
+    return sorted((root, sorted(files), [os.path.getmtime(os.path.join(root, name)) for name in sorted(files)])
+                  for root, _, files in os.walk(save_dir))
+
+# episodes cross the chunk boundaries, the returns of the kept episodes match a pass over each
+# whole episode, and the chunk dirs are left as they were
+def test_returns_across_chunks_without_writing(tmp_path):
+    save_dir = str(tmp_path / 'trajectories')
+    episodes = record(save_dir, 300, 7, np.random.RandomState(0))
+    before = listing(save_dir)
+
+    dataset = TrajectoryDataset(save_dir, 0.9, min_episode_return=0.)
+
+    assert listing(save_dir) == before
+    kept = [episode for episode in episodes if sum(episode) >= 0.]
+    expected = np.concatenate([discount_cumsum(np.array(episode), 0.9) for episode in kept])
+    np.testing.assert_allclose(np.concatenate(dataset.returns), expected, rtol=1e-5, atol=1e-5)
+    assert len(dataset) == sum(len(episode) for episode in kept) and dataset.n_steps == 300
+
+    batches = list(dataset.minibatches(16, np.random.RandomState(0), shuffle_chunks=3))
+    assert sum(len(actions) for _, actions, _ in batches) == len(dataset)
+    assert sorted(np.concatenate([returns[:, 0] for _, _, returns in batches])) == sorted(np.concatenate(dataset.returns))
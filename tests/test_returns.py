@@ -0,0 +1,44 @@
+import numpy as np
+import pytest
+
+from rl_common.returns import discount_cumsum, bootstrap_returns, normalize
+
+# R[t] = r[t] + gamma * (1 - done[t]) * R[t + 1],   R[T] = bootstrap
+def reference(rewards, gamma, bootstrap = 0., dones = None):
+    returns = np.zeros(len(rewards))
+    carry = bootstrap
+    for t in range(len(rewards) - 1, -1, -1):
+        if dones is not None and dones[t]:
+            carry = 0.
+        carry = rewards[t] + gamma * carry
+        returns[t] = carry
+    return returns
+
+# shorter than one chunk, a whole chunk, and several chunks with a partial one
+@pytest.mark.parametrize('length', [1, 5, 64, 300])
+def test_discount_cumsum(length):
+    random = np.random.RandomState(length)
+    rewards = random.randn(length)
+    np.testing.assert_allclose(discount_cumsum(rewards, 0.99), reference(rewards, 0.99), rtol=1e-10)
+    np.testing.assert_allclose(discount_cumsum(rewards, 0.9, 2.5), reference(rewards, 0.9, 2.5), rtol=1e-10)
+
+@pytest.mark.parametrize('length', [1, 7, 64, 300])
+def test_discount_cumsum_with_dones(length):
+    random = np.random.RandomState(length)
+    rewards = random.randn(3, length)
+    dones = random.rand(3, length) < 0.1
+    dones[0, -1] = True         # the bootstrap value does not reach an ended episode
+    dones[1, 0] = True
+    last_values = np.array([5., -1., 0.5])
+    expected = np.array([reference(rewards[i], 0.95, last_values[i], dones[i]) for i in range(3)])
+    np.testing.assert_allclose(discount_cumsum(rewards, 0.95, last_values, dones), expected, rtol=1e-10)
+    np.testing.assert_allclose(discount_cumsum(rewards[2], 0.95, 0.5, dones[2]), expected[2], rtol=1e-10)
+
+def test_bootstrap_returns_and_normalize():
+    rewards = np.array([1., 0., 2.])
+    np.testing.assert_allclose(bootstrap_returns(rewards, 0.5, 4.), reference(rewards, 0.5, 4.)[:, np.newaxis])
+    assert bootstrap_returns(rewards, 0.5, 4.).shape == (3, 1)
+
+    normalized = normalize(np.array([1., 2., 3., 4.]))
+    assert abs(normalized.mean()) < 1e-12 and abs(normalized.std() - 1.) < 1e-12
+    np.testing.assert_array_equal(normalize(np.full(4, 3.)), np.zeros(4))      # constant: centered, no NaN
@@ -0,0 +1,30 @@
+import numpy as np
+
+from rl_common.rollout_buffer import RolloutBuffer
+
+def test_append_and_clear():
+    buffer = RolloutBuffer(4, 2)
+    buffer.append([1., 2.], 1, 0.5)
+    buffer.append([3., 4.], 0, 1.5, -0.7)
+
+    assert len(buffer) == 2
+    np.testing.assert_array_equal(buffer.states, [[1., 2.], [3., 4.]])
+    np.testing.assert_array_equal(buffer.actions, [1, 0])
+    np.testing.assert_array_equal(buffer.rewards, [0.5, 1.5])
+    np.testing.assert_allclose(buffer.log_probs, [0., -0.7])
+    assert buffer.states.dtype == np.float32 and buffer.actions.dtype == np.int32
+
+    buffer.clear()
+    assert len(buffer) == 0 and buffer.states.shape == (0, 2)
+    buffer.append([5., 6.], 1, 2.)
+    np.testing.assert_array_equal(buffer.states, [[5., 6.]])
+
+def test_append_past_the_capacity_grows():
+    buffer = RolloutBuffer(2, 1)
+    for step in range(5):
+        buffer.append([step], step % 2, step)
+
+    assert len(buffer) == 5 and buffer.capacity == 8
+    np.testing.assert_array_equal(buffer.states[:, 0], np.arange(5))
+    np.testing.assert_array_equal(buffer.actions, [0, 1, 0, 1, 0])
+    np.testing.assert_array_equal(buffer.rewards, np.arange(5))
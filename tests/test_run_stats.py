@@ -0,0 +1,38 @@
+from rl_common.hogwild import hogwild_context, run_hogwild
+from rl_common.run_stats import RunStats, SharedRunStats
+
+# a process that plays episodes until the run is stopped, by itself or by another one
+def play(index, shared_stats, score):
+    stats = RunStats(None, None, 10., window=4, shared=shared_stats)
+    worker_stats = stats.worker('W_%i' % index)
+    while not stats.should_stop():
+        worker_stats.step()
+        worker_stats.end_episode(score)
+
+def test_counters_and_window_are_shared():
+    shared_stats = SharedRunStats(hogwild_context(), window=4)
+    first = RunStats(None, None, 10., shared=shared_stats).worker('W_0')
+    second = RunStats(None, None, 10., shared=shared_stats).worker('W_1')
+
+    assert [first.step(), second.step(), first.step()] == [1, 2, 3]
+    assert first.end_episode(4.) == (1, 4.)
+    assert second.end_episode(8.) == (2, 6.)
+
+def test_target_in_one_process_stops_the_others():
+    shared_stats = SharedRunStats(hogwild_context(), window=4)
+    run_hogwild(play, 3, (shared_stats, 20.))
+
+    assert shared_stats.stop.is_set()
+    assert shared_stats.stop_reason() == 'target score'
+    assert shared_stats.episodes.value.value >= 4
+    assert shared_stats.steps.value.value == shared_stats.episodes.value.value
+
+def test_stop_is_seen_by_every_run_stats():
+    shared_stats = SharedRunStats(hogwild_context())
+    first = RunStats(None, None, None, shared=shared_stats)
+    second = RunStats(None, None, None, shared=shared_stats)
+
+    first.request_stop('training time')
+    assert second.should_stop()
+    assert second.stop_reason == 'training time'
+    assert second.coordinator.should_stop()
@@ -0,0 +1,23 @@
+import numpy as np
+import tensorflow as tf
+
+from rl_common.sampling import action_log_prob, sample_action
+
+def test_greedy_action_is_the_argmax():
+    logits_value = np.array([[0.1, 2., -1.], [3., 0., 0.5], [-2., -3., -1.]], dtype=np.float32)
+    with tf.Graph().as_default(), tf.Session() as sess:
+        logits = tf.placeholder(tf.float32, [None, 3])
+        sampled_action, greedy_action = sample_action(logits, seed=1)
+        sampled, greedy = sess.run([sampled_action, greedy_action], {logits: logits_value})
+
+    np.testing.assert_array_equal(greedy, [1, 0, 2])
+    assert greedy.dtype == np.int32 and sampled.dtype == np.int32
+    assert sampled.shape == (3,) and np.all((sampled >= 0) & (sampled < 3))
+
+def test_action_log_prob_is_the_log_softmax():
+    logits_value = np.array([[0.1, 2., -1.], [3., 0., 0.5]], dtype=np.float32)
+    with tf.Graph().as_default(), tf.Session() as sess:
+        log_prob = sess.run(action_log_prob(tf.constant(logits_value), tf.constant([2, 0])))
+
+    log_softmax = logits_value - np.log(np.exp(logits_value).sum(axis=1, keepdims=True))
+    np.testing.assert_allclose(log_prob, [log_softmax[0, 2], log_softmax[1, 0]], rtol=1e-5)
@@ -0,0 +1,32 @@
+import numpy as np
+import pytest
+import tensorflow as tf
+
+from rl_common.param_sync import ParamsVersion
+from rl_common.shared_template import TemplateWeights
+
+def build(use_resource):
+    state = tf.placeholder(tf.float32, [None, 2])
+    with tf.variable_scope('template'):
+        template = tf.get_variable('w', [2, 1], initializer=tf.ones_initializer(), use_resource=use_resource)
+    with tf.variable_scope('master'):
+        master = tf.get_variable('w', [2, 1], initializer=tf.constant_initializer(3.))
+    return state, template, master
+
+def test_view_acts_with_the_master_weights():
+    with tf.Graph().as_default(), tf.Session() as sess:
+        state, template, master = build(use_resource=False)
+        value = tf.matmul(state, template)
+        sess.run(tf.global_variables_initializer())
+
+        weights = TemplateWeights(sess, [template], [master], ParamsVersion())
+        act_fn = weights.make_callable(value, [state])
+
+        np.testing.assert_allclose(act_fn(np.ones((1, 2))), [[6.]])
+        np.testing.assert_allclose(sess.run(value, {state: np.ones((1, 2))}), [[2.]])
+
+def test_resource_template_is_refused():
+    with tf.Graph().as_default(), tf.Session() as sess:
+        state, template, master = build(use_resource=True)
+        with pytest.raises(ValueError, match='use_resource=False'):
+            TemplateWeights(sess, [template], [master], ParamsVersion())
@@ -0,0 +1,34 @@
+import gym
+import numpy as np
+
+from rl_common.subproc_vec_env import SubprocVecEnv
+
+# the children step seeded CartPoles like gym.make + seed(seed + i) in this process
+def test_step_and_reset_round_trip():
+    vec_env = SubprocVecEnv('CartPole-v1', 2, seed=1, unwrapped=False)
+    try:
+        envs = [gym.make('CartPole-v1') for _ in range(2)]
+        for index, env in enumerate(envs):
+            env.seed(1 + index)
+        np.testing.assert_allclose(vec_env.reset(), [env.reset() for env in envs], rtol=1e-6)
+
+        for _ in range(30):
+            obs, rewards, dones, infos = vec_env.step(np.array([0, 1]))
+            expected = [env.step(action) for env, action in zip(envs, [0, 1])]
+            np.testing.assert_allclose(infos['terminal_observation'], [step[0] for step in expected], rtol=1e-6)
+            np.testing.assert_array_equal(rewards, [step[1] for step in expected])
+            np.testing.assert_array_equal(dones, [step[2] for step in expected])
+            for index, (env, step) in enumerate(zip(envs, expected)):
+                if step[2]:     # the child reset itself
+                    np.testing.assert_allclose(obs[index], env.reset(), rtol=1e-6)
+                else:
+                    np.testing.assert_allclose(obs[index], step[0], rtol=1e-6)
+
+        env = vec_env.get_env(1)
+        state = env.reset()
+        np.testing.assert_allclose(state, envs[1].reset(), rtol=1e-6)
+        next_state, reward, done, _ = env.step(0)
+        np.testing.assert_allclose(next_state, envs[1].step(0)[0], rtol=1e-6)
+    finally:
+        vec_env.close()
+    assert not any(process.is_alive() for process in vec_env.processes)
@@ -0,0 +1,52 @@
+import numpy as np
+
+from rl_common.sync_a2c import SyncA2C
+from rl_common.vec_env import VecEnv
+
+# the observation counts the steps of the episode, reward 1 per step; copy 0 terminates after 2
+# steps, copy 1 never does and is cut by max_episode_steps = 3
+class CounterVecEnv(VecEnv):
+    observation_size = 1
+    action_size = 2
+
+    def _reset_state(self, n):
+        return np.zeros((n, 1))
+
+    def _step_state(self, actions):
+        self.state = self.state + 1.
+        dones = (np.arange(self.num_envs) == 0) & (self.state[:, 0] >= 2)
+        return np.ones(self.num_envs, dtype=np.float32), dones
+
+# V(s) = s, every action 0
+class CounterSession(object):
+    def make_callable(self, fetches, feed_list):
+        if isinstance(fetches, list):
+            return lambda states: [np.zeros(len(states), dtype=np.int32), np.asarray(states, np.float64)]
+        return lambda states: np.asarray(states, np.float64)
+
+class CounterAgent(object):
+    state, action, q_target, sampled_action, value = 'state', 'action', 'q_target', 'sampled_action', 'value'
+    discount_factor = 0.5
+    numpy_policy = None
+
+    def __init__(self):
+        self.sess = CounterSession()
+        self.feed_dicts = []
+
+    def train_fn(self, feed_dict):
+        self.feed_dicts.append(feed_dict)
+
+# n-step targets of one [2, 4] rollout: an episode end stops the sum, the cut one gets
+# gamma * V(terminal observation) on its last reward, the rollout ends bootstrapped from V
+def test_n_step_targets_with_termination_and_truncation():
+    agent = CounterAgent()
+    trainer = SyncA2C(agent, CounterVecEnv(2, max_episode_steps=3), 4)
+    trainer.run(float('inf'), lambda avg_score: False)
+
+    feed_dict, = agent.feed_dicts
+    np.testing.assert_array_equal(feed_dict['state'][:, 0], [0, 1, 0, 1,
+                                                             0, 1, 2, 0])
+    np.testing.assert_allclose(feed_dict['q_target'][:, 0], [1.5, 1., 1.5, 1.,             # V(0) after the rollout
+                                                             2.125, 2.25, 2.5, 1.5])        # cut at 3, V(1) after
+    assert feed_dict['q_target'].dtype == np.float32 and feed_dict['action'].shape == (8,)
+    assert trainer.scores == [2, 3, 2] and agent.episode == 3 and agent.step == 8
@@ -0,0 +1,33 @@
+import threading
+
+import numpy as np
+
+from rl_common.trainer_queue import TrainerQueue
+
+def failing_update(feed_dict):
+    raise ValueError('NaN in the loss')
+
+def put_segments(put, n_segments):
+    errors = []
+    def loop():
+        try:
+            for _ in range(n_segments):
+                put()
+        except RuntimeError as error:
+            errors.append(error)
+    thread = threading.Thread(target=loop)
+    thread.daemon = True
+    thread.start()
+    thread.join(10.)
+    assert not thread.is_alive(), 'put blocked on the failed trainer'
+    return errors
+
+def test_failed_update_raises_in_put():
+    trainer = TrainerQueue(failing_update, None, 'state', 'action', 'q_target', 8, max_queue_size=2)
+    trainer.start()
+    errors = put_segments(lambda: trainer.put(np.zeros((4, 2)), np.zeros(4), np.zeros(4), 0), 100)
+
+    assert len(errors) == 1 and 'NaN in the loss' in str(errors[0])
+    trainer.stop()
+    assert not trainer.is_alive()
+    assert 'failed' in trainer.report()
@@ -0,0 +1,50 @@
+import os
+import threading
+
+import numpy as np
+
+from rl_common.trajectory_recorder import TrajectoryWriter, chunk_paths, load_chunk, DONE_CUT
+
+def append_steps(recorder, n_steps):
+    for step in range(n_steps):
+        recorder.append(np.full(3, step), step % 2, 1., False)
+
+def test_closed_recorders_leave_the_writer(tmp_path):
+    writer = TrajectoryWriter(str(tmp_path))
+    first = writer.recorder('W_1', 3, 4)
+    append_steps(first, 6)
+    first.close()       # a retired worker
+    assert writer.recorders == []
+
+    second = writer.recorder('W_1', 3, 4)      # the worker is added again
+    append_steps(second, 4)
+    assert writer.recorders == [second]
+    writer.close()
+
+    assert writer.recorders == []
+    assert writer.max_buffer_nbytes == 2 * 4 * (4 * 3 + 1 + 4 + 1)     # one recorder open at a time
+    paths = chunk_paths(str(tmp_path))
+    assert [os.path.basename(path) for path in paths] == ['chunk-000000', 'chunk-000001', 'chunk-000002']
+    assert [len(load_chunk(path)['actions']) for path in paths] == [4, 2, 4]
+    assert load_chunk(paths[1])['dones'][-1] == DONE_CUT
+
+def test_failed_write_raises_in_append(tmp_path):
+    writer = TrajectoryWriter(str(tmp_path))
+    open(os.path.join(str(tmp_path), 'main'), 'w').close()     # the stream dir cannot be made
+    recorder = writer.recorder('main', 3, 4, n_buffers=2)
+
+    errors = []
+    def loop():
+        try:
+            append_steps(recorder, 1000)
+        except RuntimeError as error:
+            errors.append(error)
+    thread = threading.Thread(target=loop)
+    thread.daemon = True
+    thread.start()
+    thread.join(10.)
+
+    assert not thread.is_alive(), 'append blocked on the failed writer'
+    assert len(errors) == 1 and 'failed' in str(errors[0])
+    writer.close()
+    assert 'write failed' in writer.report()
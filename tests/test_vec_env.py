@@ -0,0 +1,58 @@
+import gym
+import numpy as np
+import pytest
+
+from rl_common.vec_env import make_vec_env
+
+# the vectorized envs against gym, copy by copy across several automatic resets: every step
+# starts the gym copy from the vectorized state (chaotic dynamics would otherwise amplify float
+# rounding), then obs, reward, done, truncation and the terminal observation must match
+N_STEPS = 1500
+
+# copy 0 drives the episodes to the env's own end, copy 1 acts at random or idles into the step cap
+def pumping_actions(env_name, state, random):
+    if env_name == 'CartPole-v1':
+        return [random.randint(2), random.randint(2)]
+    if env_name == 'MountainCar-v0':
+        return [2 if state[0, 1] >= 0 else 0, 1]
+    return [2 if state[0, 3] >= 0 else 0, random.randint(3)]
+
+@pytest.mark.parametrize('env_name, max_episode_steps', [('CartPole-v1', 20), ('MountainCar-v0', 200),
+                                                        ('Acrobot-v1', 500)])
+def test_matches_gym_across_resets(env_name, max_episode_steps):
+    vec_env = make_vec_env(env_name, 2, seed=0, max_episode_steps=max_episode_steps)
+    envs = [gym.wrappers.TimeLimit(gym.make(env_name).unwrapped, max_episode_steps) for _ in range(2)]
+    obs = vec_env.reset()
+    for env in envs:
+        env.reset()
+    random = np.random.RandomState(0)
+
+    n_terminated, n_truncated = np.zeros(2, int), np.zeros(2, int)
+    previous = None
+    for _ in range(N_STEPS):
+        for index, env in enumerate(envs):
+            env.unwrapped.state = vec_env.state[index].copy()
+            if env_name == 'CartPole-v1':
+                env.unwrapped.steps_beyond_done = None
+        actions = pumping_actions(env_name, vec_env.state, random)
+        obs, rewards, dones, infos = vec_env.step(actions)
+
+        for index, env in enumerate(envs):
+            next_state, reward, done, info = env.step(int(actions[index]))
+            truncated = info.get('TimeLimit.truncated', False)
+            np.testing.assert_allclose(infos['terminal_observation'][index], next_state, rtol=1e-6, atol=1e-6)
+            assert (rewards[index], dones[index], infos['truncated'][index]) == (reward, done, truncated)
+            if done:
+                n_truncated[index] += truncated
+                n_terminated[index] += not truncated
+                env.reset()
+                assert not np.allclose(obs[index], next_state)      # the first observation of the next episode
+            else:
+                np.testing.assert_array_equal(obs[index], infos['terminal_observation'][index])
+
+        # the infos of the previous step are not overwritten by this one
+        if previous is not None:
+            np.testing.assert_array_equal(previous[0]['terminal_observation'], previous[1])
+        previous = infos, infos['terminal_observation'].copy()
+
+    assert n_terminated[0] >= 2 and n_truncated[1] >= 2
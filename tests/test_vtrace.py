@@ -0,0 +1,96 @@
+import threading
+
+import numpy as np
+import pytest
+
+from rl_common.returns import discount_cumsum
+from rl_common.vtrace import vtrace, VTraceLearner
+
+# the definition of IMPALA, no backward recursion:
+#   vs[t] = V[t] + sum_{k >= t} gamma^(k - t) (c[t] ... c[k - 1]) min(clip_rho, rho[k]) delta[k]
+def reference(behaviour_log_probs, target_log_probs, rewards, values, bootstrap_value, gamma,
+              clip_rho = 1.0, clip_pg_rho = 1.0):
+    rhos = np.exp(np.array(target_log_probs) - np.array(behaviour_log_probs))
+    values_next = np.append(values[1:], bootstrap_value)
+    deltas = np.minimum(clip_rho, rhos) * (rewards + gamma * values_next - values)
+    cs = np.minimum(1.0, rhos)
+    length = len(rewards)
+    vs = np.zeros(length)
+    for t in range(length):
+        total = 0.
+        for k in range(t, length):
+            total += gamma ** (k - t) * np.prod(cs[t:k]) * deltas[k]
+        vs[t] = values[t] + total
+    vs_next = np.append(vs[1:], bootstrap_value)
+    return vs, np.minimum(clip_pg_rho, rhos) * (rewards + gamma * vs_next - values)
+
+def segment(length, seed):
+    random = np.random.RandomState(seed)
+    behaviour = np.log(random.uniform(0.1, 1., length))
+    target = behaviour + random.randn(length) * 0.5       # rhos on both sides of the clips
+    return behaviour, target, random.randn(length), random.randn(length), random.randn()
+
+@pytest.mark.parametrize('clip_rho, clip_pg_rho', [(1.0, 1.0), (2.0, 0.5), (np.inf, np.inf)])
+def test_vtrace_matches_the_definition(clip_rho, clip_pg_rho):
+    behaviour, target, rewards, values, bootstrap_value = segment(12, 0)
+    vs, advantages = vtrace(behaviour, target, rewards, values, bootstrap_value, 0.9, clip_rho, clip_pg_rho)
+    expected_vs, expected_advantages = reference(behaviour, target, rewards, values, bootstrap_value, 0.9,
+                                                 clip_rho, clip_pg_rho)
+    np.testing.assert_allclose(vs, expected_vs, rtol=1e-10)
+    np.testing.assert_allclose(advantages, expected_advantages, rtol=1e-10)
+
+# on-policy vs is the n-step return and the advantage the n-step TD error
+def test_vtrace_on_policy():
+    behaviour, _, rewards, values, bootstrap_value = segment(9, 1)
+    vs, advantages = vtrace(behaviour, behaviour, rewards, values, bootstrap_value, 0.9)
+    returns = discount_cumsum(rewards, 0.9, bootstrap_value)
+    np.testing.assert_allclose(vs, returns, rtol=1e-10)
+    np.testing.assert_allclose(advantages, rewards + 0.9 * np.append(returns[1:], bootstrap_value) - values,
+                               rtol=1e-10)
+
+# a batch of one ended and one cut trajectory: each gets its own bootstrap value from one evaluation
+def test_learner_feed_dict():
+    random = np.random.RandomState(2)
+    target_log_probs, values = np.log(random.uniform(0.1, 1., 9)), random.randn(9, 1)   # 4 + 4 steps, 1 bootstrap
+    learner = VTraceLearner(None, None, lambda states, actions: (target_log_probs, values),
+                            'state', 'action', 'q_target', 'advantage', 0.9, 8)
+    trajectories = [(random.randn(4, 2), random.randint(2, size=4), random.randn(4), np.log(random.uniform(0.1, 1., 4)),
+                     None, True), (random.randn(4, 2), random.randint(2, size=4), random.randn(4),
+                                   np.log(random.uniform(0.1, 1., 4)), random.randn(2), False)]
+    for states, actions, rewards, behaviour, next_state, done in trajectories:
+        learner.put_trajectory(states, actions, rewards, behaviour, next_state, done, 0)
+    batch = [learner.segments.get_nowait() for _ in range(2)]
+
+    feed_dict = learner._feed_dict(batch)
+    expected = [reference(trajectories[0][3], target_log_probs[:4], trajectories[0][2], values[:4, 0], 0., 0.9),
+                reference(trajectories[1][3], target_log_probs[4:8], trajectories[1][2], values[4:8, 0], values[8, 0], 0.9)]
+    np.testing.assert_allclose(feed_dict['q_target'][:, 0], np.concatenate([vs for vs, _ in expected]), rtol=1e-5)
+    np.testing.assert_allclose(feed_dict['advantage'][:, 0], np.concatenate([adv for _, adv in expected]),
+                               rtol=1e-5, atol=1e-6)
+    assert feed_dict['state'].shape == (8, 2)
+
+# a V-trace learner whose evaluation fails stops the actors instead of blocking them
+def test_failed_learner_raises_in_put_trajectory():
+    def evaluate_fn(states, actions):
+        raise ValueError('shape mismatch')
+    learner = VTraceLearner(None, None, evaluate_fn, 'state', 'action', 'q_target', 'advantage', 0.9, 8,
+                            max_queue_size=2)
+    learner.start()
+    random = np.random.RandomState(3)
+    errors = []
+    def loop():
+        try:
+            for _ in range(100):
+                learner.put_trajectory(random.randn(4, 2), random.randint(2, size=4), random.randn(4),
+                                       np.log(random.uniform(0.1, 1., 4)), None, True, 0)
+        except RuntimeError as error:
+            errors.append(error)
+    thread = threading.Thread(target=loop)
+    thread.daemon = True
+    thread.start()
+    thread.join(10.)
+
+    assert not thread.is_alive(), 'put_trajectory blocked on the failed learner'
+    assert len(errors) == 1 and 'shape mismatch' in str(errors[0])
+    learner.stop()
+    assert 'failed' in learner.report()
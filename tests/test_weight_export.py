@@ -0,0 +1,46 @@
+import numpy as np
+import pytest
+import tensorflow as tf
+
+from rl_common.weight_export import ALIGN, export_weights, load_policy, load_weights
+
+def build(state_size, action_size):
+    state = tf.placeholder(tf.float32, [None, state_size])
+    w_init, b_init = tf.random_normal_initializer(.0, .3, seed=1), tf.constant_initializer(0.1)
+    with tf.variable_scope('actor'):
+        hidden = tf.layers.dense(state, 16, tf.nn.tanh, kernel_initializer=w_init, bias_initializer=b_init)
+        logits = tf.layers.dense(hidden, action_size, kernel_initializer=w_init, bias_initializer=b_init)
+    with tf.variable_scope('critic'):
+        hidden = tf.layers.dense(state, 16, tf.nn.tanh, kernel_initializer=w_init, bias_initializer=b_init)
+        value = tf.layers.dense(hidden, 1, kernel_initializer=w_init, bias_initializer=b_init)
+    return state, logits, value
+
+# export -> load_policy gives the graph's policy and values, without TF
+def test_round_trip(tmp_path):
+    path = str(tmp_path / 'model' / 'policy.weights')
+    states = np.random.RandomState(0).randn(16, 4).astype(np.float32)
+    with tf.Graph().as_default(), tf.Session() as sess:
+        state, logits, value = build(4, 3)
+        sess.run(tf.global_variables_initializer())
+        actor_params, critic_params = tf.trainable_variables('actor'), tf.trainable_variables('critic')
+        size = export_weights(path, sess, actor_params, critic_params, meta={'source': 'test', 'step': np.int64(7)})
+        expected_values = sess.run(actor_params + critic_params)
+        expected_policy, expected_value = sess.run([tf.nn.softmax(logits), value], {state: states})
+
+    actor_values, critic_values, meta = load_weights(path)
+    assert meta == {'source': 'test', 'step': 7}
+    assert size == (tmp_path / 'model' / 'policy.weights').stat().st_size
+    for loaded, expected in zip(actor_values + critic_values, expected_values):
+        assert loaded.dtype == np.float32 and not loaded.flags.writeable
+        assert loaded.ctypes.data % ALIGN == 0
+        np.testing.assert_array_equal(loaded, expected)
+
+    policy = load_policy(path)
+    np.testing.assert_allclose(policy.policy(states), expected_policy, rtol=1e-5, atol=1e-6)
+    np.testing.assert_allclose(policy.value(states), expected_value, rtol=1e-5, atol=1e-6)
+
+def test_not_a_weight_file(tmp_path):
+    path = tmp_path / 'checkpoint'
+    path.write_bytes(b'not the magic bytes at all')
+    with pytest.raises(ValueError, match='not a weight file'):
+        load_weights(str(path))
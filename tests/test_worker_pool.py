@@ -0,0 +1,44 @@
+import threading
+import time
+
+import tensorflow as tf
+
+from rl_common.worker_pool import WorkerPool, Autoscaler
+
+class Worker(object):
+    def __init__(self, name, stop_delay = 0.):
+        self.name = name
+        self.retired = False
+        self.stop_delay = stop_delay    # seconds of the step that sees retired
+
+    def work(self):
+        while not self.retired:
+            time.sleep(0.001)
+        time.sleep(self.stop_delay)
+
+def test_retire_joins_outside_the_lock():
+    workers = [Worker('W_0'), Worker('W_1', stop_delay=0.5)]
+    pool = WorkerPool(None, tf.train.Coordinator(), Worker, workers)
+    for worker in workers:
+        pool.start(worker)
+
+    retiring = threading.Thread(target=pool.retire)
+    retiring.start()
+    time.sleep(0.1)
+    assert pool.lock.acquire(timeout=0.1)       # while the retired worker finishes its step
+    pool.lock.release()
+    assert pool.size == 1
+    retiring.join()
+    assert pool.idle == [workers[1]] and pool.n_retired == 1
+
+    workers[0].retired = True
+
+def test_autoscaler_holds_then_reprobes():
+    autoscaler = Autoscaler(None, None, reprobe_intervals=3)
+    assert autoscaler.decide(100.) == 1         # first steady interval: one worker more
+    assert autoscaler.decide(150.) == 1         # it helped
+    assert autoscaler.decide(120.) == -1        # it hurt: take it back
+    assert [autoscaler.decide(150.) for _ in range(3)] == [0, 0, -1]     # held, then a probe with one less
+    assert autoscaler.decide(150.) == 0         # no change: hold at the smaller size
+    assert [autoscaler.decide(150.) for _ in range(3)] == [0, 0, 1]      # the next probe goes the other way
+    assert autoscaler.decide(200.) == 1         # it helped, climb on